@@ -0,0 +1,263 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metriques
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Configuration des API amont (ORS, OpenDataSoft, ChargeTrip) –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Valeurs par défaut, surchargeables par variable d'environnement :
+#   UPSTREAM_<NOM>_CONNECT_TIMEOUT, UPSTREAM_<NOM>_READ_TIMEOUT, UPSTREAM_<NOM>_RETRIES, UPSTREAM_<NOM>_BUDGET
+CONFIG_DEFAUT = {
+    "ors": {"connect_timeout": 3.05, "read_timeout": 10.0, "retries": 2, "budget": 15.0},
+    "opendatasoft": {"connect_timeout": 3.05, "read_timeout": 5.0, "retries": 1, "budget": 8.0},
+    "chargetrip": {"connect_timeout": 3.05, "read_timeout": 8.0, "retries": 2, "budget": 12.0},
+}
+
+# Adresses de base des API (surchargeables, par exemple vers le serveur bouchon de bench/).
+# ChargeTrip a déjà son adresse complète dans CHARGETRIP_URL.
+ORS_BASE_URL = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org").rstrip("/")
+OPENDATASOFT_BASE_URL = os.getenv(
+    "OPENDATASOFT_BASE_URL", "https://odre.opendatasoft.com"
+).rstrip("/")
+
+# Taille des pools de connexions (une session poolée par hôte amont)
+POOL_CONNECTIONS = int(os.getenv("UPSTREAM_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "16"))
+
+# Attente de base entre deux tentatives (backoff exponentiel avec jitter)
+BACKOFF_BASE_S = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.2"))
+
+# Temps minimal restant dans le budget pour qu'une nouvelle tentative vaille la peine
+TENTATIVE_MIN_S = float(os.getenv("UPSTREAM_MIN_ATTEMPT", "1.0"))
+
+# Disjoncteur : nombre d'échecs consécutifs avant ouverture, et durée d'ouverture
+DISJONCTEUR_ECHECS = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+DISJONCTEUR_PAUSE_S = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+CODES_REESSAYABLES = {429, 502, 503, 504}
+
+
+def _config(nom):
+    """Configuration d'une API amont (valeurs par défaut + environnement)."""
+    config = dict(CONFIG_DEFAUT.get(nom, CONFIG_DEFAUT["ors"]))
+    prefixe = f"UPSTREAM_{nom.upper()}_"
+
+    for cle, valeur in config.items():
+        surcharge = os.getenv(prefixe + cle.upper())
+        if surcharge is not None:
+            config[cle] = type(valeur)(surcharge)
+
+    return config
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Disjoncteur –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class CircuitOuvert(requests.exceptions.RequestException):
+    """Levée quand une API amont est coupée par le disjoncteur (trop d'échecs récents)."""
+
+
+class Disjoncteur:
+    """
+    Disjoncteur simple : après DISJONCTEUR_ECHECS échecs consécutifs, l'API amont est coupée
+    pendant DISJONCTEUR_PAUSE_S secondes. Ensuite une seule requête d'essai est autorisée :
+    si elle réussit le circuit se referme, sinon il se rouvre.
+    """
+
+    def __init__(self, nom):
+        self.nom = nom
+        self.echecs = 0
+        self.ouvert_jusqua = 0.0
+        self.essai_en_cours = False
+        self._verrou = threading.Lock()
+
+    def autoriser(self):
+        with self._verrou:
+            if self.echecs < DISJONCTEUR_ECHECS:
+                return
+
+            if time.monotonic() < self.ouvert_jusqua or self.essai_en_cours:
+                raise CircuitOuvert(f"API {self.nom} temporairement indisponible")
+
+            # Demi-ouvert : on laisse passer une requête d'essai
+            self.essai_en_cours = True
+
+    def ouvert(self):
+        """Vrai tant que le circuit est coupé (utilisé pour ne pas insister en arrière-plan)."""
+        with self._verrou:
+            return self.echecs >= DISJONCTEUR_ECHECS and time.monotonic() < self.ouvert_jusqua
+
+    def succes(self):
+        with self._verrou:
+            self.echecs = 0
+            self.essai_en_cours = False
+
+    def echec(self):
+        with self._verrou:
+            self.echecs += 1
+            self.essai_en_cours = False
+            if self.echecs >= DISJONCTEUR_ECHECS:
+                self.ouvert_jusqua = time.monotonic() + DISJONCTEUR_PAUSE_S
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Client partagé ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class ClientAmont:
+    """
+    Point de passage unique des appels HTTP sortants vers une API amont :
+    session poolée (keep-alive) par hôte, timeouts connect/read, tentatives bornées
+    avec backoff exponentiel + jitter dans un budget de temps, et disjoncteur.
+    """
+
+    def __init__(self, nom):
+        self.nom = nom
+        self.config = _config(nom)
+        self.disjoncteur = Disjoncteur(nom)
+        self._sessions = {}
+        self._verrou = threading.Lock()
+
+    def session(self, url):
+        """Session poolée associée à l'hôte de l'URL (créée à la première utilisation)."""
+        hote = urlsplit(url).netloc
+
+        with self._verrou:
+            session = self._sessions.get(hote)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[hote] = session
+
+        return session
+
+    def requete(self, methode, url, **kwargs):
+        """
+        Envoie la requête avec tentatives bornées. Retourne la dernière réponse obtenue.
+        Chaque tentative a des timeouts ramenés au temps restant du budget.
+        """
+        timeout = kwargs.pop(
+            "timeout", (self.config["connect_timeout"], self.config["read_timeout"])
+        )
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        session = self.session(url)
+        # Étiquette "appel" : chemin de l'URL (fixe par type d'appel, cardinalité bornée)
+        appel = urlsplit(url).path or "/"
+        echeance = time.monotonic() + self.config["budget"]
+        tentatives = self.config["retries"] + 1
+
+        for tentative in range(tentatives):
+            if tentative:
+                metriques.nouvelles_tentatives.ajouter((self.nom,))
+            try:
+                self.disjoncteur.autoriser()
+            except CircuitOuvert:
+                metriques.appels_amont.observer((self.nom, appel, "circuit_ouvert"), 0.0)
+                raise
+
+            restant = echeance - time.monotonic()
+            debut = time.perf_counter()
+            try:
+                r = session.request(
+                    methode,
+                    url,
+                    timeout=(min(connect_timeout, restant), min(read_timeout, restant)),
+                    **kwargs,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                statut = "timeout" if isinstance(e, requests.Timeout) else "connexion"
+                metriques.appels_amont.observer(
+                    (self.nom, appel, statut), time.perf_counter() - debut
+                )
+                self.disjoncteur.echec()
+                if not self._attendre(tentative, tentatives, echeance):
+                    raise
+                continue
+            except Exception:
+                metriques.appels_amont.observer(
+                    (self.nom, appel, "erreur"), time.perf_counter() - debut
+                )
+                self.disjoncteur.echec()
+                raise
+
+            metriques.appels_amont.observer(
+                (self.nom, appel, str(r.status_code)), time.perf_counter() - debut
+            )
+
+            if r.status_code in CODES_REESSAYABLES or r.status_code >= 500:
+                self.disjoncteur.echec()
+                if r.status_code in CODES_REESSAYABLES and self._attendre(
+                    tentative, tentatives, echeance
+                ):
+                    continue
+                return r
+
+            self.disjoncteur.succes()
+            return r
+
+    def _attendre(self, tentative, tentatives, echeance):
+        """
+        Attend avant la tentative suivante si le nombre de tentatives et le budget le permettent
+        (il doit rester au moins TENTATIVE_MIN_S après l'attente).
+        """
+        if tentative + 1 >= tentatives:
+            return False
+
+        # "Full jitter" : attente aléatoire entre 0 et base * 2^tentative
+        attente = random.uniform(0, BACKOFF_BASE_S * (2**tentative))
+        if time.monotonic() + attente + TENTATIVE_MIN_S > echeance:
+            return False
+
+        time.sleep(attente)
+        return True
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Accès simplifié –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+_clients = {}
+_pid_clients = None
+_verrou_clients = threading.Lock()
+
+
+def client(nom):
+    """Client partagé (un par processus) pour l'API amont nommée."""
+    global _pid_clients
+
+    with _verrou_clients:
+        # Après un fork (gunicorn preload_app), on ne partage pas les sockets du maître
+        if _pid_clients != os.getpid():
+            _clients.clear()
+            _pid_clients = os.getpid()
+        if nom not in _clients:
+            _clients[nom] = ClientAmont(nom)
+        return _clients[nom]
+
+
+def get(nom, url, **kwargs):
+    """Équivalent de requests.get via le client partagé de l'API amont `nom`."""
+    return client(nom).requete("GET", url, **kwargs)
+
+
+def post(nom, url, **kwargs):
+    """Équivalent de requests.post via le client partagé de l'API amont `nom`."""
+    return client(nom).requete("POST", url, **kwargs)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -9,23 +9,58 @@ from flask import (
     jsonify,
     Response,
     session,
+    stream_with_context,
 )
 
 # Le service SOAP (que l'on intégre directement dans le app.py pour fonctionnement correct sur le Cloud)
-from service_projet import wsgi_app as soap_app
-from service_projet import get_stations_proche
-from zeep import Client
+# spyne / lxml / zeep ne sont importés qu'au premier appel qui en a besoin (voir WsgiDiffere)
+from cache_http import ne_pas_garder, reponse_en_cache
+from cache_stations import get_stations_proche_cached, get_stations_proche_lot
+from irve_index import RAYON_MAX_M, get_index
+from tuiles_irve import (
+    LATITUDE_MAX_MERCATOR,
+    TUILES_MAX_PAR_REQUETE,
+    ZOOM_MAX,
+    get_agregats,
+    tuiles_bbox,
+)
+from planification import (
+    RAYON_RECHERCHE_M,
+    choisir_bornes_optimal,
+    iterer_bornes,
+    recherche_couloir,
+)
+from couloir import LARGEUR_DEFAUT_M, LARGEUR_MAX_M, CouloirTropGrand, stations_couloir
+from geometrie import decoder_polyline, depuis_geojson
+from routage import BackendLocal, get_backend
+from transport import compresser, format_demande, geometrie_json, reponse_route
 
 # Monter plusieurs apps WSGI
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
 # Divers librairies
+import hashlib
+import hmac
 import json
-import requests
-import openrouteservice as ors
+import math
+import numpy as np
+import amont
+import cache_http
+import metriques
+import importlib
+import passerelle
+import prechauffage
+from cache import CACHE_DIR, CACHES, CachePersistant
+from catalogue_vehicules import CatalogueVehicules
+from vol_unique import VOLS, VolUnique
 import pprint
+import requests
 import os
-from functools import lru_cache
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
 
 # Partie sécurité. On envoie pas les clés sur Git et le Cloud
 secret_flask = os.getenv("secret_flask")
@@ -53,16 +88,55 @@ if missing:
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
 
-# ––– Recherche des stations en cache (performance) –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-@lru_cache(maxsize=128)
-def get_stations_proche_cached(lat, lon, rayon):
-    """
-    Cache mémoire des stations proches
-    Clé = (lat, lon, rayon)
-    """
-    return get_stations_proche(lat, lon, rayon)
+# ––– Chargement différé ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class WsgiDiffere:
+    """Application WSGI importée au premier appel (module, attribut) : le démarrage n'importe pas spyne."""
+
+    def __init__(self, module, attribut):
+        self.module = module
+        self.attribut = attribut
+        self._app = None
+        self._verrou = threading.Lock()
+
+    def charger(self):
+        with self._verrou:
+            if self._app is None:
+                self._app = getattr(importlib.import_module(self.module), self.attribut)
+            return self._app
+
+    def __call__(self, environ, start_response):
+        return (self._app or self.charger())(environ, start_response)
 
 
+class JetonRequis:
+    """Application WSGI accessible seulement avec l'en-tête X-Soap-Jeton égal au jeton configuré."""
+
+    def __init__(self, app, jeton):
+        self.app = app
+        self.jeton = jeton.encode("utf-8")
+
+    def charger(self):
+        return self.app.charger()
+
+    def __call__(self, environ, start_response):
+        fourni = environ.get("HTTP_X_SOAP_JETON", "").encode("utf-8")
+        if not hmac.compare_digest(fourni, self.jeton):
+            start_response("403 Forbidden", [("Content-Type", "text/plain; charset=utf-8")])
+            return [b"Jeton X-Soap-Jeton requis"]
+        return self.app(environ, start_response)
+
+
+soap_app = WsgiDiffere("service_projet", "wsgi_app")
+
+# /soap/interne (sans validation du schéma) n'est monté que si un jeton est configuré : les
+# appelants internes du même processus passent déjà par calculer_trajet (SOAP_DIRECT)
+SOAP_INTERNE_JETON = os.getenv("SOAP_INTERNE_JETON")
+soap_app_interne = (
+    JetonRequis(WsgiDiffere("service_projet", "wsgi_app_interne"), SOAP_INTERNE_JETON)
+    if SOAP_INTERNE_JETON
+    else None
+)
+
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
 
@@ -71,7 +145,32 @@ app = Flask(__name__)
 app.secret_key = secret_flask
 
 # Le service SOAP sera accessible via /soap. L’application Flask principale reste active
-app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/soap": soap_app})
+# /soap/interne expose le même service sans validation lxml, pour les appelants de confiance
+# (seulement avec SOAP_INTERNE_JETON, et l'en-tête X-Soap-Jeton correspondant).
+montages = {"/soap": soap_app}
+if soap_app_interne is not None:
+    montages["/soap/interne"] = soap_app_interne
+app.wsgi_app = DispatcherMiddleware(app.wsgi_app, montages)
+
+# Durée des requêtes pour /metrics. after_request s'exécute dans l'ordre inverse d'enregistrement :
+# fin_requete, enregistré avant compresser, mesure aussi la compression.
+app.before_request(metriques.debut_requete)
+app.after_request(metriques.fin_requete)
+
+# Variantes compressées des réponses en cache (cache_http) : enregistré avant compresser, pour
+# s'exécuter après lui et garder sa sortie
+app.after_request(cache_http.memoriser_variante)
+
+# Threads du worker : préchauffage des caches (un seul travaille à la fois sur la machine) et
+# publication des métriques. Sous gunicorn, post_worker_init (gunicorn.conf.py) les lance dans
+# chaque worker, après le fork : le maître (GUNICORN_PRELOAD=1) n'en démarre pas. Ailleurs
+# (flask run...), ils partent avec l'application.
+if not os.getenv("SERVER_SOFTWARE", "").startswith("gunicorn/"):
+    prechauffage.demarrer()
+    metriques.demarrer_publication()
+
+# Compression gzip / brotli des réponses JSON
+app.after_request(compresser)
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
 
@@ -81,14 +180,82 @@ SOAP_WSDL = os.environ.get(
     "SOAP_WSDL", "https://USMB-ETRS013-Mathieu-ribiollet.azurewebsites.net/soap?wsdl"
 )
 
+# Par défaut /calcul appelle le service dans le processus (pas d'aller-retour HTTP ni de XML).
+# SOAP_DIRECT=0 repasse par le client zeep et SOAP_WSDL (service SOAP déployé ailleurs).
+SOAP_DIRECT = os.environ.get("SOAP_DIRECT", "1") != "0"
+
+# WSDL du client zeep : fichier fourni (SOAP_WSDL_FILE), sinon généré depuis l'application spyne locale.
+# SOAP_WSDL_SOURCE=remote retrouve l'ancien comportement (téléchargement de SOAP_WSDL).
+SOAP_WSDL_FILE = os.environ.get("SOAP_WSDL_FILE")
+SOAP_WSDL_SOURCE = os.environ.get("SOAP_WSDL_SOURCE", "local").lower()
+
 _soap_client = None
+_soap_pid = None
+_soap_verrou = threading.Lock()
+
+
+def source_wsdl():
+    """Chemin ou URL du WSDL donné à zeep, sans passer par le réseau sauf en mode remote."""
+    if SOAP_WSDL_FILE:
+        return SOAP_WSDL_FILE
+    if SOAP_WSDL_SOURCE == "remote":
+        return SOAP_WSDL
+
+    from service_projet import document_wsdl
+
+    adresse = SOAP_WSDL.split("?", 1)[0]
+    chemin = os.path.join(CACHE_DIR, "service.wsdl")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Écriture atomique : plusieurs workers peuvent démarrer en même temps
+    temporaire = f"{chemin}.{os.getpid()}"
+    with open(temporaire, "wb") as f:
+        f.write(document_wsdl(adresse))
+    os.replace(temporaire, chemin)
+    return chemin
 
 
 def get_soap_client():
-    global _soap_client
-    if _soap_client is None:
-        _soap_client = Client(SOAP_WSDL)
-    return _soap_client
+    """
+    Client zeep partagé, construit une fois par processus.
+    Les documents téléchargés (schémas importés, WSDL distant) sont mis en cache dans CACHE_DIR.
+    Avec preload_app le client est construit dans le maître et partagé par les workers :
+    seule la session HTTP est recréée après le fork.
+    """
+    global _soap_client, _soap_pid
+
+    with _soap_verrou:
+        if _soap_client is None:
+            from zeep import Client
+            from zeep.cache import SqliteCache
+            from zeep.transports import Transport
+
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            cache = SqliteCache(path=os.path.join(CACHE_DIR, "zeep.sqlite3"), timeout=86400)
+            _soap_client = Client(source_wsdl(), transport=Transport(cache=cache))
+            _soap_pid = os.getpid()
+
+        elif _soap_pid != os.getpid():
+            _soap_client.transport.session = requests.Session()
+            _soap_pid = os.getpid()
+
+        return _soap_client
+
+
+def prechauffer():
+    """
+    Charge à l'avance ce qui est sinon différé (spyne, client zeep, index IRVE).
+    Appelé par gunicorn dans le maître avec preload_app : les workers héritent de tout par
+    copy-on-write au lieu de le reconstruire chacun à leur première requête.
+    """
+    soap_app.charger()
+    if soap_app_interne is not None:
+        soap_app_interne.charger()
+    if not SOAP_DIRECT:
+        get_soap_client()
+    get_index()
+    get_agregats()
+    if isinstance(routeur, BackendLocal):
+        routeur.graphe()
 
 
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -108,10 +275,25 @@ def calcul():
     autonomie = float(request.form["autonomie"])
     recharge = float(request.form["recharge"])
 
-    client = get_soap_client()
-    client.service.calcul_temps_trajet(distance, autonomie, recharge)
+    # Nombre de recharges : fourni par le formulaire, sinon déduit de l'autonomie
+    nb_recharges = request.form.get("nb_recharges", type=int)
+    if nb_recharges is None:
+        nb_recharges = max(math.ceil(distance / autonomie) - 1, 0) if autonomie > 0 else 0
 
-    session["resultat"] = round(resultat, 2)
+    try:
+        if SOAP_DIRECT:
+            from service_projet import calculer_trajet
+
+            trajet = calculer_trajet(distance, autonomie, recharge, nb_recharges)
+        else:
+            client = get_soap_client()
+            trajet = client.service.calcul_temps_trajet(
+                distance, autonomie, recharge, nb_recharges
+            )
+    except Exception as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+
+    session["resultat"] = round(trajet.total_h, 2)
 
     return redirect(url_for("resultat_page"))
 
@@ -143,7 +325,12 @@ def api_calcul_trajet():
 
 
 # ––– POINT 2 | Bornes de recharge proche –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Durée de validité côté client / proxy des réponses GET en cache (voir cache_http)
+STATION_CACHE_MAX_AGE_S = int(os.getenv("STATION_CACHE_MAX_AGE", "300"))
+
+
 @app.route("/station")
+@reponse_en_cache(STATION_CACHE_MAX_AGE_S)
 def station():
     """Retourne les stations de recharge proches d’une position GPS."""
     lat = request.args.get("lat")
@@ -157,26 +344,152 @@ def station():
             status=400,
         )
 
+    # Rayon borné : au-delà, la recherche parcourrait une grande partie de l'index (ou de l'API)
+    if rayon is not None:
+        try:
+            rayon_m = float(rayon)
+        except ValueError:
+            rayon_m = math.nan
+        if not 0 < rayon_m <= RAYON_MAX_M:
+            return Response(
+                json.dumps(
+                    {"error": True, "message": f"rayon invalide (0 à {RAYON_MAX_M:.0f} m)"},
+                    ensure_ascii=False,
+                ),
+                mimetype="application/json; charset=utf-8",
+                status=400,
+            )
+
     # data contient les données brut retournées par l'API
     data = get_stations_proche_cached(lat, lon, rayon)
+    if data.get("error"):
+        ne_pas_garder()
 
     return Response(
         json.dumps(data, ensure_ascii=False), mimetype="application/json; charset=utf-8"
     )
 
 
+# Les agrégats ne changent qu'au rechargement de l'export IRVE : revalidation par ETag au-delà
+TUILES_CACHE_MAX_AGE_S = int(os.getenv("TUILES_CACHE_MAX_AGE", "300"))
+
+
+@app.route("/stations/tiles")
+def api_stations_tiles():
+    """
+    Bornes de la fenêtre de carte regroupées par cellule, pour un niveau de zoom
+    (?bbox=lon_min,lat_min,lon_max,lat_max&zoom=z, comme Leaflet toBBoxString / getZoom).
+
+    Réponse par tuile Web Mercator, lue dans les agrégats précalculés de l'index IRVE local
+    (nombre de bornes, puissance maximale et position moyenne par cellule ; détail de la borne
+    quand elle est seule). ETag faible + If-None-Match : 304 tant que les données n'ont pas changé.
+    """
+    agregats = get_agregats()
+    if agregats is None:
+        return (
+            jsonify({"error": True, "message": "Index IRVE local non configuré (IRVE_DATASET)"}),
+            503,
+        )
+
+    try:
+        lon_min, lat_min, lon_max, lat_max = (
+            float(v) for v in request.args["bbox"].split(",")
+        )
+        zoom = int(request.args["zoom"])
+    except (KeyError, ValueError):
+        return (
+            jsonify(
+                {"error": True, "message": "bbox=lon_min,lat_min,lon_max,lat_max et zoom requis"}
+            ),
+            400,
+        )
+
+    # NaN et infinis passent les comparaisons : on les écarte explicitement
+    if (
+        not all(math.isfinite(v) for v in (lon_min, lat_min, lon_max, lat_max))
+        or not -LATITUDE_MAX_MERCATOR <= lat_min <= lat_max <= LATITUDE_MAX_MERCATOR
+        or not -180 <= lon_min <= lon_max <= 180
+        or zoom < 0
+    ):
+        return jsonify({"error": True, "message": "bbox ou zoom invalide"}), 400
+
+    # Au-delà du zoom maximal des agrégats, les cellules sont déjà quasi des bornes individuelles
+    zoom = min(zoom, ZOOM_MAX)
+    tuiles = tuiles_bbox(lat_min, lon_min, lat_max, lon_max, zoom, TUILES_MAX_PAR_REQUETE)
+    if tuiles is None:
+        return (
+            jsonify({"error": True, "message": "Fenêtre trop grande pour ce niveau de zoom"}),
+            400,
+        )
+
+    etag = agregats.etag(zoom, tuiles)
+    if request.if_none_match.contains_weak(etag):
+        reponse = Response(status=304)
+    else:
+        contenu = []
+        for x, y in tuiles:
+            groupes = agregats.tuile(zoom, x, y)
+            if groupes:
+                contenu.append({"x": x, "y": y, "groupes": groupes})
+        reponse = jsonify({"error": False, "zoom": zoom, "tuiles": contenu})
+
+    reponse.set_etag(etag, weak=True)
+    reponse.cache_control.public = True
+    reponse.cache_control.max_age = TUILES_CACHE_MAX_AGE_S
+    return reponse
+
+
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
 
-# ––– POINT 3 | Géocodage et itinéaire –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ––– POINT 3 | Géocodage et itinéaire ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Cache du géocodage : les utilisateurs tapent toute la journée les mêmes villes
+GEOCODE_CACHE_TTL_S = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+cache_geocodage = CachePersistant("geocodage", GEOCODE_CACHE_TTL_S, taille_memoire=2048)
+vol_geocodage = VolUnique("geocodage", entre_workers=True)
+
+
+def normaliser_ville(city):
+    """Clé de cache d'un nom de ville : sans casse, sans accents, espaces et tirets unifiés."""
+    texte = unicodedata.normalize("NFKD", city)
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    texte = texte.casefold().replace("-", " ").replace("'", " ").replace("’", " ")
+    return " ".join(texte.split())
+
+
 def geocode_city(city):
+    """Coordonnées GPS d'une ville, depuis le cache ou via OpenRouteService."""
+    cle = normaliser_ville(city)
+    prechauffage.noter("ville", cle, [city])
+
+    coords = cache_geocodage.get(cle)
+    if coords is not None:
+        return tuple(coords)
+
+    # Plusieurs requêtes pour la même ville en même temps : un seul appel ORS
+    return vol_geocodage.executer(cle, _geocoder, cle, city)
+
+
+def _geocoder(cle, city, forcer=False):
+    """Appel ORS puis mise en cache, sauf si un autre worker vient de géocoder la ville."""
+    if not forcer:
+        coords = cache_geocodage.get(cle)
+        if coords is not None:
+            return tuple(coords)
+
+    lat, lon = geocode_city_ors(city)
+    cache_geocodage.set(cle, [lat, lon])
+    return lat, lon
+
+
+def geocode_city_ors(city):
     """Transforme un nom de ville en coordonnées GPS via OpenRouteService."""
-    url = "https://api.openrouteservice.org/geocode/search"
+    url = f"{amont.ORS_BASE_URL}/geocode/search"
 
     headers = {"Authorization": ORS_API_KEY}
     params = {"text": city}
 
-    r = requests.get(url, headers=headers, params=params)
+    r = amont.get("ors", url, headers=headers, params=params)
     r.raise_for_status()
     data = r.json()
 
@@ -190,64 +503,244 @@ def geocode_city(city):
     return lat, lon
 
 
-def get_route(start_coords, end_coords):
-    """Calcule un itinéraire voiture entre deux points GPS."""
-    directions_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-
-    body = {
-        "coordinates": [
-            [start_coords[1], start_coords[0]],
-            [end_coords[1], end_coords[0]],
-        ]
-    }
+def rafraichir_ville(cle, city):
+    """Géocodage forcé par le préchauffage, avant l'expiration de l'entrée."""
+    return vol_geocodage.executer(cle, _geocoder, cle, city, True)
 
-    headers = {
-        "Authorization": f"Bearer {ORS_API_KEY}",
-        "Content-Type": "application/json",
-    }
 
-    r = requests.post(directions_url, json=body, headers=headers, timeout=8)
-    data = r.json()
+prechauffage.enregistrer("ville", cache_geocodage, rafraichir_ville, amont="ors")
+
+
+# Cache des itinéraires : clé = points de passage arrondis à ROUTE_CACHE_PRECISION décimales
+# (3 décimales ≈ 100 m), géométrie déjà décodée stockée en float32 compact.
+ROUTE_CACHE_PRECISION = int(os.getenv("ROUTE_CACHE_PRECISION", "3"))
+ROUTE_CACHE_TTL_S = int(os.getenv("ROUTE_CACHE_TTL", str(7 * 24 * 3600)))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "5000"))
+
+
+def cle_route(points):
+    """Clé de cache d'un itinéraire passant par les points [[lat, lon], ...]."""
+    p = ROUTE_CACHE_PRECISION
+    return ";".join(f"{float(lat):.{p}f},{float(lon):.{p}f}" for lat, lon in points)
+
+
+def serialiser_route(route):
+    """distance + durée (2 float64) suivies des coordonnées [lon, lat] en float32."""
+    entete = struct.pack("<dd", route["distance_m"], route["duration_s"])
+    return entete + route["coords"].astype("<f4").tobytes()
+
+
+def deserialiser_route(data):
+    distance_m, duration_s = struct.unpack_from("<dd", data)
+    coords = np.frombuffer(data, dtype="<f4", offset=16).reshape(-1, 2)
+    return {"distance_m": distance_m, "duration_s": duration_s, "coords": coords}
+
+
+# Backend de routage (ROUTAGE_BACKEND) : ORS par défaut, ou graphe routier local
+routeur = get_backend(ORS_API_KEY)
+
+cache_routes = CachePersistant(
+    "routes",
+    ROUTE_CACHE_TTL_S,
+    taille_memoire=256,
+    taille_disque=ROUTE_CACHE_MAX_ENTRIES,
+    serialiser=serialiser_route,
+    deserialiser=deserialiser_route,
+)
+vol_routes = VolUnique("routes", entre_workers=True)
 
-    if "routes" not in data or len(data["routes"]) == 0:
-        return {"error": True, "message": "ORS n’a retourné aucune route."}
 
-    route = data["routes"][0]
-    # On reconvertit la chaîne pour pouvoir l'exploiter en Front-End.
-    decoded = ors.convert.decode_polyline(route["geometry"])
+def identifiant_route(backend, points):
+    """route_id : clé de l'itinéraire dans le cache, réutilisable par /stations/corridor."""
+    cle = backend.cle_cache(cle_route(points))
+    return hashlib.sha1(cle.encode("utf-8")).hexdigest()[:20]
 
-    # print(f"Infos retournées du backend (calcul trajet) :\nDistance_m: {route['summary']['distance']}\nDuration_s: {route['summary']['duration']}\nGeometry: {decoded}")
 
+def route_depuis_cache(cle, route):
+    """Itinéraire au format de réponse, depuis une entrée de cache_routes."""
     return {
-        "distance_m": route["summary"]["distance"],
-        "duration_s": route["summary"]["duration"],
-        "geometry": decoded,
+        "distance_m": route["distance_m"],
+        "duration_s": route["duration_s"],
+        "geometry": {
+            "type": "LineString",
+            "coordinates": np.round(route["coords"].astype(float), 5).tolist(),
+        },
+        "route_id": cle,
     }
 
 
+def route_en_cache(points, backend):
+    """Itinéraire depuis le cache, sinon calculé par le backend de routage puis mis en cache."""
+    cle = identifiant_route(backend, points)
+    if backend is routeur:
+        prechauffage.noter("route", cle, [[[float(lat), float(lon)] for lat, lon in points]])
+
+    route = cache_routes.get(cle)
+    if route is not None:
+        return route_depuis_cache(cle, route)
+
+    # Même itinéraire demandé en même temps : un seul calcul, partagé
+    return vol_routes.executer(cle, _calculer_route, cle, points, backend)
+
+
+def _calculer_route(cle, points, backend, forcer=False):
+    """Calcul par le backend puis mise en cache, sauf si un autre worker vient de le faire."""
+    if not forcer:
+        route = cache_routes.get(cle)
+        if route is not None:
+            return route_depuis_cache(cle, route)
+
+    resultat = backend.itineraire(points)
+    if not resultat.get("error"):
+        resultat["route_id"] = cle
+        cache_routes.set(
+            cle,
+            {
+                "distance_m": resultat["distance_m"],
+                "duration_s": resultat["duration_s"],
+                "coords": np.asarray(
+                    resultat["geometry"]["coordinates"], dtype=np.float32
+                ).reshape(-1, 2),
+            },
+        )
+
+    return resultat
+
+
+def rafraichir_route(cle, points):
+    """Itinéraire recalculé par le préchauffage, avant l'expiration de l'entrée."""
+    return vol_routes.executer(cle, _calculer_route, cle, points, routeur, True)
+
+
+prechauffage.enregistrer(
+    "route", cache_routes, rafraichir_route, amont="ors" if routeur.nom == "ors" else None
+)
+
+
+def get_route(start_coords, end_coords):
+    """Calcule un itinéraire voiture entre deux points GPS (avec cache)."""
+    return route_en_cache([start_coords, end_coords], routeur)
+
+
+ROUTE_CACHE_MAX_AGE_S = int(os.getenv("ROUTE_CACHE_MAX_AGE", "3600"))
+
+
 @app.route("/route")
+@reponse_en_cache(ROUTE_CACHE_MAX_AGE_S, vary=("Accept",))
 def api_route():
     """API REST : calcule un itinéraire entre deux villes."""
     start = request.args.get("start")
     end = request.args.get("end")
 
+    # Erreurs au format historique (statut 200) : jamais gardées par cache_http
     if not start or not end:
+        ne_pas_garder()
         return jsonify(
             {"error": True, "message": "Départ et Arrivée a remplir obligatoirement !"}
         )
 
     try:
-        start_coords = geocode_city(start)
-        end_coords = geocode_city(end)
+        # Les deux géocodages sont indépendants : en mode threaded ils partent ensemble
+        start_coords, end_coords = passerelle.executer(
+            (geocode_city, start), (geocode_city, end)
+        )
 
         route = get_route(start_coords, end_coords)
+        if route.get("error"):
+            ne_pas_garder()
+            return jsonify(route)
 
-        return jsonify(route)
+        # Géométrie dans le format demandé (?format= / Accept)
+        return reponse_route(route)
 
     except Exception as e:
+        ne_pas_garder()
         return jsonify({"error": True, "message": str(e)})
 
 
+@app.route("/stations/corridor", methods=["GET", "POST"])
+def api_stations_corridor():
+    """
+    Toutes les bornes à moins de largeur_m d'un itinéraire, triées par position le long de celui-ci.
+    L'itinéraire est donné par route_id (retourné par /route, /route_multi, /plan), par une
+    LineString GeoJSON (geometry) ou par une polyligne encodée (polyline, precision).
+    """
+    data = request.get_json(silent=True) or request.args
+
+    try:
+        largeur_m = float(data.get("largeur_m", LARGEUR_DEFAUT_M))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+    if not 0 < largeur_m <= LARGEUR_MAX_M:
+        return (
+            jsonify(
+                {"error": True, "message": f"largeur_m doit être entre 0 et {LARGEUR_MAX_M}"}
+            ),
+            400,
+        )
+
+    try:
+        if data.get("route_id"):
+            route = cache_routes.get(data["route_id"])
+            if route is None:
+                return jsonify({"error": True, "message": "Itinéraire inconnu ou expiré"}), 404
+            latlngs = route["coords"].astype(float)[:, ::-1]
+        elif data.get("geometry"):
+            latlngs = depuis_geojson(data["geometry"])
+        elif data.get("polyline"):
+            latlngs = decoder_polyline(data["polyline"], int(data.get("precision", 5)))
+        else:
+            return (
+                jsonify({"error": True, "message": "route_id, geometry ou polyline requis"}),
+                400,
+            )
+    except Exception as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+
+    try:
+        stations = stations_couloir(latlngs, largeur_m)
+    except CouloirTropGrand as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": True, "message": str(e)}), 502
+
+    return jsonify(
+        {"error": False, "largeur_m": largeur_m, "count": len(stations), "stations": stations}
+    )
+
+
+@app.route("/cache/stats")
+def api_cache_stats():
+    """Compteurs hits / misses des caches (propres au worker qui répond)."""
+    stats = {nom: c.stats() for nom, c in CACHES.items()}
+    # Appels amont regroupés (single-flight) : "partages" = appels servis sans requête de plus
+    stats["vols"] = {nom: v.stats() for nom, v in VOLS.items()}
+    if prechauffage.prechauffeur is not None:
+        stats["prechauffage"] = prechauffage.prechauffeur.stats()
+    return jsonify(stats)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Métriques (Prometheus) ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@app.route("/metrics")
+def api_metrics():
+    """Métriques au format Prometheus, additionnées sur tous les workers de la machine."""
+    return Response(
+        metriques.format_prometheus(metriques.agreger()),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+@app.route("/metrics/profils")
+def api_metrics_profils():
+    """Piles les plus fréquentes des dernières requêtes lentes (PROFILER_SEUIL_MS, worker qui répond)."""
+    if metriques.profileur is None:
+        return jsonify({"error": True, "message": "Profileur désactivé (PROFILER_SEUIL_MS)"}), 404
+    return jsonify({"error": False, "profils": list(metriques.profileur.profils)})
+
+
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
 
@@ -263,12 +756,18 @@ def debug_print(title, data):
     print("==============================\n")
 
 
-@app.route("/vehicules")
-def api_vehicules():
-    """Liste paginée des véhicules électriques."""
-    page = int(request.args.get("page", 0))
-    size = int(request.args.get("size", 20))
+# Requêtes ChargeTrip identiques en même temps : une seule part (résultats non mis en cache,
+# donc regroupement dans le worker seulement)
+vol_chargetrip = VolUnique("chargetrip")
+
+
+def get_vehicules_page(page, size):
+    """Une page de la liste des véhicules ChargeTrip (réponse GraphQL brute)."""
+    return vol_chargetrip.executer(f"page:{page}:{size}", _get_vehicules_page, page, size)
 
+
+def _get_vehicules_page(page, size):
+    """Interroge ChargeTrip pour une page de la liste des véhicules (réponse GraphQL brute)."""
     # On vient récupérer l'ensemble des informations voulues
     query = f"""
     query {{
@@ -303,9 +802,92 @@ def api_vehicules():
         "Content-Type": "application/json",
     }
 
+    r = amont.post("chargetrip", CHARGETRIP_URL, json={"query": query}, headers=headers)
+    return r.json()
+
+
+# Miroir local du catalogue : /vehicules et /vehicule/<id> n'interrogent plus ChargeTrip une fois chargé
+catalogue = CatalogueVehicules(get_vehicules_page)
+
+
+def estimer_recharge(veh):
+    """Estimation du temps de recharge (min) sur borne rapide (le seul possible sans premium)."""
+    usable = (veh.get("battery") or {}).get("usable_kwh") or 50  # kWh
+    FAST_POWER = 150  # kW
+    return int((usable / FAST_POWER) * 60)  # minutes
+
+
+# Pages préchargées en mode threaded : (page, size) -> (horodatage, réponse ChargeTrip), LRU
+# écrit par les threads du pool de la passerelle et lu par les requêtes
+_pages_prechargees = OrderedDict()
+_verrou_pages = threading.Lock()
+PAGES_PRECHARGEES_TTL_S = 300
+PAGES_PRECHARGEES_MAX = 32
+
+
+def page_prechargee(page, size):
+    """Réponse ChargeTrip préchargée encore fraîche pour (page, size), sinon None."""
+    with _verrou_pages:
+        horodatage, resp_json = _pages_prechargees.get((page, size), (0, None))
+        if resp_json is None or time.monotonic() - horodatage > PAGES_PRECHARGEES_TTL_S:
+            return None
+        _pages_prechargees.move_to_end((page, size))
+        return resp_json
+
+
+def precharger_page_vehicules(page, size):
+    """Récupère une page en tâche de fond pour que le clic suivant n'attende pas ChargeTrip."""
+    try:
+        resp_json = get_vehicules_page(page, size)
+    except Exception:
+        return
+
+    if "vehicleList" in (resp_json.get("data") or {}):
+        with _verrou_pages:
+            _pages_prechargees[(page, size)] = (time.monotonic(), resp_json)
+            _pages_prechargees.move_to_end((page, size))
+            while len(_pages_prechargees) > PAGES_PRECHARGEES_MAX:
+                _pages_prechargees.popitem(last=False)
+
+
+VEHICULES_CACHE_MAX_AGE_S = int(os.getenv("VEHICULES_CACHE_MAX_AGE", "600"))
+
+
+@app.route("/vehicules")
+@reponse_en_cache(VEHICULES_CACHE_MAX_AGE_S)
+def api_vehicules():
+    """Liste paginée des véhicules électriques."""
+    try:
+        page = int(request.args.get("page", 0))
+        size = int(request.args.get("size", 20))
+        if page < 0 or size < 1:
+            raise ValueError("page doit être positive et size au moins 1")
+    except ValueError as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+
+    recherche = request.args.get("q", "").strip()
+
+    if catalogue.pret():
+        if recherche:
+            vehicules = catalogue.rechercher(recherche, page, size)
+        else:
+            vehicules = catalogue.page(page, size)
+        return jsonify({"error": False, "vehicules": vehicules})
+
+    # Miroir pas encore chargé : on interroge ChargeTrip directement
+    if recherche:
+        return (
+            jsonify({"error": True, "message": "Catalogue en cours de chargement"}),
+            503,
+        )
+
     try:
-        r = requests.post(CHARGETRIP_URL, json={"query": query}, headers=headers)
-        resp_json = r.json()
+        resp_json = page_prechargee(page, size)
+        if resp_json is None:
+            resp_json = get_vehicules_page(page, size)
+
+        # En mode threaded, la page suivante part déjà en tâche de fond
+        passerelle.en_arriere_plan(precharger_page_vehicules, page + 1, size)
 
         # debug_print("DEBUG", resp_json)
 
@@ -323,12 +905,13 @@ def api_vehicules():
         return jsonify({"error": True, "message": str(e)}), 500
 
 
-@app.route("/vehicule/<id>")
-def api_vehicule(id):
-    """
-    Détail d'un véhicule + estimation du temps de recharge
-    (car Chargetrip ne fournit pas charging/charge_time dans ce plan)
-    """
+def get_vehicule_chargetrip(id):
+    """Détail d'un véhicule ChargeTrip (réponse GraphQL brute), regroupé avec les requêtes concurrentes."""
+    return vol_chargetrip.executer(f"vehicule:{id}", _get_vehicule_chargetrip, id)
+
+
+def _get_vehicule_chargetrip(id):
+    """Interroge ChargeTrip pour le détail d'un véhicule."""
     query = f"""
     query {{
       vehicle(id: "{id}") {{
@@ -362,9 +945,25 @@ def api_vehicule(id):
         "Content-Type": "application/json",
     }
 
+    r = amont.post("chargetrip", CHARGETRIP_URL, json={"query": query}, headers=headers)
+    return r.json()
+
+
+@app.route("/vehicule/<id>")
+@reponse_en_cache(VEHICULES_CACHE_MAX_AGE_S)
+def api_vehicule(id):
+    """
+    Détail d'un véhicule + estimation du temps de recharge
+    (car Chargetrip ne fournit pas charging/charge_time dans ce plan)
+    """
+    veh = catalogue.vehicule(id) if catalogue.pret() else None
+    if veh is not None:
+        return jsonify(
+            {"error": False, "vehicule": dict(veh, recharge_estimee=estimer_recharge(veh))}
+        )
+
     try:
-        r = requests.post(CHARGETRIP_URL, json={"query": query}, headers=headers)
-        resp = r.json()
+        resp = get_vehicule_chargetrip(id)
 
         # print("\n=== DEBUG VEHICULE ===")
         # pprint.pprint(resp)
@@ -379,11 +978,8 @@ def api_vehicule(id):
             )
 
         # ---- ESTIMATION recharge (le seul possible sans premium) ----
-        usable = veh.get("battery", {}).get("usable_kwh") or 50  # kWh
-        FAST_POWER = 150  # kW
-        recharge_estimee = int((usable / FAST_POWER) * 60)  # minutes
-
-        veh["recharge_estimee"] = recharge_estimee
+        # (copie : la réponse peut être partagée avec d'autres requêtes en cours)
+        veh = dict(veh, recharge_estimee=estimer_recharge(veh))
 
         return jsonify({"error": False, "vehicule": veh})
 
@@ -395,29 +991,398 @@ def api_vehicule(id):
 
 
 # ––– POINT 5 | Itinéaire multi-bornes ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def get_route_multi(coords):
+    """Calcule un itinéraire voiture passant par une liste de points [[lat, lon], ...] (avec cache)."""
+    return route_en_cache(coords, routeur)
+
+
 @app.route("/route_multi", methods=["POST"])
 def api_route_multi():
     """Calcule un itinéraire passant par plusieurs bornes de recharges"""
     data = request.json
     coords = data.get("coords")
 
-    body = {"coordinates": [[lon, lat] for lat, lon in coords]}
+    route = get_route_multi(coords)
+    if route.get("error"):
+        return jsonify(route)
 
-    headers = {
-        "Authorization": f"Bearer {ORS_API_KEY}",
-        "Content-Type": "application/json",
+    return reponse_route(
+        {
+            "distance_m": route["distance_m"],
+            "geometry": route["geometry"],
+            "route_id": route["route_id"],
+        }
+    )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– POINT 6 | Planification des recharges (côté serveur) ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def parametres_plan(data):
+    """
+    Paramètres d'une planification (corps JSON de /plan et /plan/stream).
+    Retourne (paramètres, None) ou (None, (réponse d'erreur, code HTTP)).
+    """
+    start = data.get("start")
+    end = data.get("end")
+    if not start or not end:
+        return None, (
+            {"error": True, "message": "Départ et Arrivée a remplir obligatoirement !"},
+            200,
+        )
+
+    try:
+        autonomie = float(data["autonomie"])
+        capacite_kwh = float(data.get("capacite_kwh") or 50)
+        seuil_pourcent = float(data.get("seuil", 20)) / 100
+    except Exception as e:
+        return None, ({"error": True, "message": str(e)}, 400)
+
+    # "optimal" (défaut) : temps total minimal ; "glouton" : ancienne règle du Front-End
+    strategie = data.get("strategie", "optimal")
+    if strategie not in ("optimal", "glouton"):
+        return None, ({"error": True, "message": f"Stratégie inconnue : {strategie}"}, 400)
+
+    # La réponse porte aussi les bornes : seuls les formats JSON sont possibles ici
+    fmt = format_demande()
+    if fmt == "f32":
+        return None, ({"error": True, "message": "Format f32 non disponible pour /plan"}, 406)
+
+    return (start, end, autonomie, capacite_kwh, seuil_pourcent, strategie, fmt), None
+
+
+def iterer_bornes_trajet(route, autonomie, capacite_kwh, seuil_pourcent, strategie):
+    """Bornes retenues sur l'itinéraire brut, produites une par une."""
+    latlngs = depuis_geojson(route["geometry"])
+
+    bornes = None
+    if strategie == "optimal":
+        try:
+            with metriques.chrono("planification_optimale"):
+                bornes = choisir_bornes_optimal(
+                    latlngs,
+                    route["duration_s"],
+                    autonomie,
+                    capacite_kwh,
+                    seuil_pourcent,
+                    stations_couloir,
+                )
+        except (requests.RequestException, CouloirTropGrand):
+            # API des bornes indisponible (disjoncteur ouvert compris) ou itinéraire hors budget
+            # du couloir : repli prévu
+            bornes = None
+        except Exception as e:
+            app.logger.exception("Planification optimale en échec, repli sur la règle gloutonne")
+            metriques.erreurs_planification.ajouter((type(e).__name__,))
+            bornes = None
+
+    if bornes is not None:
+        yield from bornes
+        return
+
+    # Sans solution optimale (None : bornes trop espacées ; API indisponible ; erreur), on garde la
+    # règle gloutonne. Ses candidates viennent d'une seule requête de couloir (tuiles en parallèle
+    # et en cache) ; à défaut, d'une recherche par arrêt.
+    try:
+        chercher_lot = recherche_couloir(stations_couloir(latlngs, RAYON_RECHERCHE_M))
+    except (requests.RequestException, CouloirTropGrand):
+        chercher_lot = get_stations_proche_lot
+
+    yield from iterer_bornes(latlngs, autonomie, capacite_kwh, seuil_pourcent, chercher_lot)
+
+
+def etapes_plan(start, end, autonomie, capacite_kwh, seuil_pourcent, strategie, fmt):
+    """
+    Étapes d'une planification, produites dès qu'elles sont connues :
+    - {"type": "route"} : itinéraire brut (distance, durée, géométrie)
+    - {"type": "borne"} : un arrêt recharge, dans l'ordre du trajet
+    - {"type": "final"} : itinéraire final passant par les bornes
+    ou {"type": "erreur", "error": True, "message": ...} à la place de la suite.
+    """
+    # Les deux géocodages sont indépendants : en mode threaded ils partent ensemble
+    start_coords, end_coords = passerelle.executer(
+        (geocode_city, start), (geocode_city, end)
+    )
+
+    route = get_route(start_coords, end_coords)
+    if route.get("error"):
+        yield dict(route, type="erreur")
+        return
+
+    yield {
+        "type": "route",
+        "distance_m": route["distance_m"],
+        "duration_s": route["duration_s"],
+        "geometry": geometrie_json(route["geometry"], fmt),
+        "route_id": route["route_id"],
+    }
+
+    latlngs = depuis_geojson(route["geometry"])
+    coords = [latlngs[0].tolist()]
+    temps_recharge_total_min = 0
+
+    for borne in iterer_bornes_trajet(
+        route, autonomie, capacite_kwh, seuil_pourcent, strategie
+    ):
+        yield {"type": "borne", "index": len(coords) - 1, "borne": borne}
+        coords.append([borne["latitude"], borne["longitude"]])
+        temps_recharge_total_min += borne["temps_recharge_min"]
+
+    coords.append(latlngs[-1].tolist())
+    final = get_route_multi(coords)
+    if final.get("error"):
+        yield dict(final, type="erreur")
+        return
+
+    yield {
+        "type": "final",
+        "distance_m": final["distance_m"],
+        "duration_s": final["duration_s"],
+        "geometry": geometrie_json(final["geometry"], fmt),
+        "route_id": final["route_id"],
+        "temps_recharge_total_min": temps_recharge_total_min,
     }
 
-    r = requests.post(
-        "https://api.openrouteservice.org/v2/directions/driving-car",
-        json=body,
-        headers=headers,
+
+@app.route("/plan", methods=["POST"])
+def api_plan():
+    """
+    Planifie un trajet complet en une seule requête :
+    itinéraire brut, choix des bornes, puis itinéraire final passant par les bornes.
+    """
+    parametres, erreur = parametres_plan(request.json or {})
+    if erreur:
+        return jsonify(erreur[0]), erreur[1]
+
+    try:
+        bornes = []
+        for etape in etapes_plan(*parametres):
+            if etape["type"] == "erreur":
+                etape.pop("type")
+                return jsonify(etape)
+            if etape["type"] == "borne":
+                bornes.append(etape["borne"])
+            elif etape["type"] == "final":
+                final = etape
+
+        return jsonify(
+            {
+                "error": False,
+                "distance_m": final["distance_m"],
+                "duration_s": final["duration_s"],
+                "geometry": final["geometry"],
+                "route_id": final["route_id"],
+                "bornes": bornes,
+                "temps_recharge_total_min": final["temps_recharge_total_min"],
+            }
+        )
+
+    except Exception as e:
+        return jsonify({"error": True, "message": str(e)})
+
+
+@app.route("/plan/stream", methods=["POST"])
+def api_plan_stream():
+    """
+    Même planification que /plan, envoyée étape par étape (voir etapes_plan) :
+    l'itinéraire brut s'affiche avant que les bornes et l'itinéraire final soient calculés.
+    NDJSON (une étape JSON par ligne) par défaut, Server-Sent Events avec ?mode=sse
+    ou Accept: text/event-stream.
+    """
+    parametres, erreur = parametres_plan(request.json or {})
+    if erreur:
+        return jsonify(erreur[0]), erreur[1]
+
+    sse = (
+        request.args.get("mode") == "sse"
+        or request.accept_mimetypes.best == "text/event-stream"
     )
 
-    route = r.json()["routes"][0]
-    decoded = ors.convert.decode_polyline(route["geometry"])
+    def flux():
+        try:
+            for etape in etapes_plan(*parametres):
+                yield json.dumps(etape, separators=(",", ":"))
+        except Exception as e:
+            yield json.dumps({"type": "erreur", "error": True, "message": str(e)})
+
+    if sse:
+        corps = (f"event: etape\ndata: {ligne}\n\n" for ligne in flux())
+        mimetype = "text/event-stream"
+    else:
+        corps = (f"{ligne}\n" for ligne in flux())
+        mimetype = "application/x-ndjson"
+
+    reponse = Response(stream_with_context(corps), mimetype=mimetype)
+    reponse.headers["Cache-Control"] = "no-cache"
+    # Pas de mise en tampon par un éventuel proxy (nginx) : chaque étape part tout de suite
+    reponse.headers["X-Accel-Buffering"] = "no"
+    return reponse
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– POINT 7 | Matrice distances / durées (flottes) ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Taille maximale d'une matrice (origines x destinations)
+MATRIX_MAX_ELEMENTS = int(os.getenv("MATRIX_MAX_ELEMENTS", "2500"))
+
+# Cache des couples : [distance_m, duration_s] (None sans itinéraire), même clé que les itinéraires
+cache_matrice = CachePersistant(
+    "matrice", ROUTE_CACHE_TTL_S, taille_memoire=4096, taille_disque=ROUTE_CACHE_MAX_ENTRIES * 10
+)
+
+
+def coordonnees_lieu(lieu):
+    """Lieu d'une matrice : [lat, lon] tel quel, ou nom de ville géocodé (avec cache)."""
+    if isinstance(lieu, (list, tuple)):
+        lat, lon = float(lieu[0]), float(lieu[1])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Coordonnées invalides : {lieu}")
+        return lat, lon
+
+    try:
+        return geocode_city(str(lieu))
+    except Exception:
+        raise ValueError(f"Lieu introuvable : {lieu}")
+
 
-    return jsonify({"distance_m": route["summary"]["distance"], "geometry": decoded})
+def geocoder_lieux(lieux):
+    """Coordonnées de chaque lieu ; chaque ville distincte n'est géocodée qu'une fois."""
+    uniques = {}
+    for lieu in lieux:
+        cle = normaliser_ville(lieu) if isinstance(lieu, str) else tuple(lieu)
+        uniques.setdefault(cle, lieu)
+
+    cles = list(uniques)
+    coords = passerelle.executer(*[(coordonnees_lieu, uniques[cle]) for cle in cles])
+    par_cle = dict(zip(cles, coords))
+
+    return [
+        par_cle[normaliser_ville(lieu) if isinstance(lieu, str) else tuple(lieu)]
+        for lieu in lieux
+    ]
+
+
+def matrice_en_cache(sources, destinations):
+    """
+    Distances (m) et durées (s) source x destination : les couples déjà en cache sont relus,
+    les autres calculés en un seul appel au backend (le rectangle des lignes et colonnes
+    incomplètes) puis mis en cache.
+    """
+    n, m = len(sources), len(destinations)
+    distances = np.full((n, m), np.nan)
+    durees = np.full((n, m), np.nan)
+    cles = [
+        [routeur.cle_cache(cle_route([source, destination])) for destination in destinations]
+        for source in sources
+    ]
+
+    manquants = np.zeros((n, m), dtype=bool)
+    for i in range(n):
+        for j in range(m):
+            valeur = cache_matrice.get(cles[i][j])
+            if valeur is None:
+                manquants[i, j] = True
+            elif valeur[0] is not None:
+                distances[i, j], durees[i, j] = valeur
+
+    lignes = np.flatnonzero(manquants.any(axis=1))
+    colonnes = np.flatnonzero(manquants.any(axis=0))
+    if lignes.size:
+        d, t = routeur.matrice(
+            [sources[i] for i in lignes], [destinations[j] for j in colonnes]
+        )
+        distances[np.ix_(lignes, colonnes)] = d
+        durees[np.ix_(lignes, colonnes)] = t
+
+        for a, i in enumerate(lignes):
+            for b, j in enumerate(colonnes):
+                if manquants[i, j]:
+                    couple = [None, None] if np.isnan(d[a, b]) else [float(d[a, b]), float(t[a, b])]
+                    cache_matrice.set(cles[i][j], couple)
+
+    return distances, durees
+
+
+def tableau_json(tableau, decimales):
+    """Tableau numpy en listes JSON (entiers sans décimales), NaN (pas d'itinéraire) -> null."""
+    arrondi = np.round(tableau, decimales)
+    conversion = int if decimales == 0 else float
+    return [
+        [None if math.isnan(v) else conversion(v) for v in ligne] for ligne in arrondi.tolist()
+    ]
+
+
+@app.route("/matrix", methods=["POST"])
+def api_matrix():
+    """
+    Comparaison de trajets N x M (dépôts x destinations) en une requête :
+    distance, durée de conduite et temps total recharges comprises pour chaque couple.
+
+    Corps JSON : origines et destinations (noms de villes ou [lat, lon]), autonomie,
+    temps_recharge (minutes par recharge), nb_recharges (optionnel, déduit de l'autonomie sinon).
+    """
+    data = request.json or {}
+    origines = data.get("origines") or []
+    destinations = data.get("destinations") or []
+
+    if not origines or not destinations:
+        return jsonify(
+            {"error": True, "message": "Origines et Destinations a remplir obligatoirement !"}
+        ), 400
+    if len(origines) * len(destinations) > MATRIX_MAX_ELEMENTS:
+        return jsonify(
+            {
+                "error": True,
+                "message": f"Matrice trop grande (maximum {MATRIX_MAX_ELEMENTS} couples)",
+            }
+        ), 400
+
+    try:
+        autonomie = float(data["autonomie"])
+        temps_recharge = float(data.get("temps_recharge") or 0)
+        nb_recharges = data.get("nb_recharges")
+        nb_recharges = None if nb_recharges is None else int(nb_recharges)
+
+        coords = geocoder_lieux(list(origines) + list(destinations))
+    except Exception as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+
+    sources, cibles = coords[: len(origines)], coords[len(origines) :]
+
+    try:
+        distances_m, durees_s = matrice_en_cache(sources, cibles)
+    except Exception as e:
+        return jsonify({"error": True, "message": f"Erreur du service de routage : {e}"}), 502
+
+    # Formule de calcul_temps_trajet sur toute la matrice d'un coup, avec les durées de conduite
+    # du routage à la place de la vitesse moyenne fixe : total_h >= duree_conduite_h
+    from service_projet import calculer_trajets
+
+    try:
+        trajets = calculer_trajets(
+            distances_m / 1000,
+            autonomie,
+            temps_recharge,
+            nb_recharges,
+            duree_conduite_h=durees_s / 3600,
+        )
+    except ValueError as e:
+        return jsonify({"error": True, "message": str(e)}), 400
+
+    return jsonify(
+        {
+            "error": False,
+            "origines": [list(c) for c in sources],
+            "destinations": [list(c) for c in cibles],
+            "distance_km": tableau_json(distances_m / 1000, 2),
+            "duree_conduite_h": tableau_json(durees_s / 3600, 2),
+            "total_h": tableau_json(trajets["total_h"], 2),
+            "nb_recharges": tableau_json(trajets["nb_recharges"], 0),
+            "recharge_min_total": tableau_json(trajets["recharge_min_total"], 1),
+        }
+    )
 
 
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
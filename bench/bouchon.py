@@ -0,0 +1,285 @@
+# ––– Serveur bouchon des API amont (ORS, OpenDataSoft, ChargeTrip) –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Rejoue les réponses enregistrées de bench/fixtures avec une latence injectée, et compte les appels
+# reçus par API. L'application y est branchée par les variables d'environnement :
+#   ORS_BASE_URL=http://hote:port/ors
+#   OPENDATASOFT_BASE_URL=http://hote:port/opendatasoft
+#   CHARGETRIP_URL=http://hote:port/chargetrip
+#
+# Lancement seul :       python bench/bouchon.py --port 8089 --latence ors=120,opendatasoft=60,chargetrip=200
+# Enregistrement :       python bench/bouchon.py --enregistrer   (relaie vers les vraies API et écrit les fixtures)
+# Compteurs :            GET /__stats   (POST /__reset pour les remettre à zéro)
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DOSSIER_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Adresses réelles, utilisées seulement en mode enregistrement
+VRAIES_API = {
+    "ors": "https://api.openrouteservice.org",
+    "opendatasoft": "https://odre.opendatasoft.com",
+    "chargetrip": os.getenv("CHARGETRIP_URL_REELLE", "https://api.chargetrip.io/graphql"),
+}
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Fixtures ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def lire_fixture(nom):
+    with open(os.path.join(DOSSIER_FIXTURES, f"{nom}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ecrire_fixture(nom, donnees):
+    chemin = os.path.join(DOSSIER_FIXTURES, f"{nom}.json")
+    with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(donnees, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    os.replace(chemin + ".tmp", chemin)
+
+
+def fixture_requete(api, chemin, params, corps):
+    """
+    (nom de fixture, clé dans la fixture ou None) correspondant à une requête reçue.
+    Le géocodage est enregistré par ville (clé = texte en minuscules, "*" par défaut).
+    """
+    if api == "ors" and chemin.endswith("/geocode/search"):
+        return "ors_geocode", (params.get("text", [""])[0]).casefold()
+    if api == "ors" and "/v2/directions/" in chemin:
+        return "ors_directions", None
+    if api == "ors" and "/v2/matrix/" in chemin:
+        return "ors_matrix", None
+    if api == "opendatasoft":
+        return "opendatasoft_records", None
+    if api == "chargetrip":
+        requete = (corps or {}).get("query", "")
+        if "vehicleList" in requete:
+            return "chargetrip_vehicleList", None
+        return "chargetrip_vehicle", None
+    return None, None
+
+
+def matrice_synthetique(corps):
+    """
+    Réponse /v2/matrix calculée depuis les lieux demandés (sa taille dépend de la requête) :
+    distance à vol d'oiseau x 1,3, à 90 km/h.
+    """
+    lieux = corps["locations"]
+    distances, durees = [], []
+    for s in corps["sources"]:
+        ligne_d, ligne_t = [], []
+        for d in corps["destinations"]:
+            (lon1, lat1), (lon2, lat2) = lieux[s], lieux[d]
+            a = (
+                math.sin(math.radians(lat2 - lat1) / 2) ** 2
+                + math.cos(math.radians(lat1))
+                * math.cos(math.radians(lat2))
+                * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+            )
+            metres = 1.3 * 2 * 6371000 * math.asin(math.sqrt(a))
+            ligne_d.append(round(metres, 1))
+            ligne_t.append(round(metres / 25, 1))
+        distances.append(ligne_d)
+        durees.append(ligne_t)
+    return {"distances": distances, "durations": durees}
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Serveur –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class Bouchon:
+    """
+    Serveur HTTP threadé qui rejoue les fixtures. latences : {api: millisecondes}, avec une
+    gigue uniforme de ±gigue (fraction). Les fixtures sont lues une fois au démarrage.
+    """
+
+    def __init__(self, hote="127.0.0.1", port=0, latences=None, gigue=0.2, enregistrer=False):
+        self.latences = latences or {}
+        self.gigue = gigue
+        self.enregistrer = enregistrer
+
+        self.compteurs = {api: 0 for api in VRAIES_API}
+        self._verrou = threading.Lock()
+
+        self.fixtures = {}
+        for nom in os.listdir(DOSSIER_FIXTURES):
+            if nom.endswith(".json"):
+                self.fixtures[nom[:-5]] = lire_fixture(nom[:-5])
+
+        bouchon = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                bouchon.repondre(self, None)
+
+            def do_POST(self):
+                longueur = int(self.headers.get("Content-Length") or 0)
+                bouchon.repondre(self, self.rfile.read(longueur))
+
+        self.serveur = ThreadingHTTPServer((hote, port), Gestionnaire)
+        self.serveur.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        hote, port = self.serveur.server_address[:2]
+        return f"http://{hote}:{port}"
+
+    def environnement(self):
+        """Variables d'environnement qui branchent l'application sur ce bouchon."""
+        return {
+            "ORS_BASE_URL": f"{self.url}/ors",
+            "OPENDATASOFT_BASE_URL": f"{self.url}/opendatasoft",
+            "CHARGETRIP_URL": f"{self.url}/chargetrip",
+        }
+
+    def demarrer(self):
+        self._thread = threading.Thread(target=self.serveur.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def arreter(self):
+        self.serveur.shutdown()
+        self.serveur.server_close()
+
+    def stats(self):
+        with self._verrou:
+            return dict(self.compteurs)
+
+    def reset(self):
+        with self._verrou:
+            for api in self.compteurs:
+                self.compteurs[api] = 0
+
+    # Traitement d'une requête
+    def repondre(self, gestionnaire, corps_brut):
+        morceaux = urlsplit(gestionnaire.path)
+        chemin = morceaux.path
+
+        if chemin == "/__stats":
+            return self._envoyer(gestionnaire, 200, self.stats())
+        if chemin == "/__reset":
+            self.reset()
+            return self._envoyer(gestionnaire, 200, {"ok": True})
+
+        api, _, reste = chemin.lstrip("/").partition("/")
+        if api not in self.compteurs:
+            return self._envoyer(gestionnaire, 404, {"error": f"API inconnue : {api}"})
+
+        with self._verrou:
+            self.compteurs[api] += 1
+
+        params = parse_qs(morceaux.query)
+        try:
+            corps = json.loads(corps_brut) if corps_brut else None
+        except ValueError:
+            corps = None
+        nom, cle = fixture_requete(api, "/" + reste, params, corps)
+        if nom is None:
+            return self._envoyer(gestionnaire, 404, {"error": f"Pas de fixture pour {chemin}"})
+
+        if self.enregistrer:
+            return self._relayer(gestionnaire, api, reste, morceaux.query, corps_brut, nom, cle)
+
+        latence_ms = self.latences.get(api, 0)
+        if latence_ms:
+            time.sleep(latence_ms * random.uniform(1 - self.gigue, 1 + self.gigue) / 1000)
+
+        if nom == "ors_matrix":
+            return self._envoyer(gestionnaire, 200, matrice_synthetique(corps))
+
+        donnees = self.fixtures[nom]
+        if cle is not None:
+            donnees = donnees.get(cle, donnees["*"])
+        return self._envoyer(gestionnaire, 200, donnees)
+
+    def _relayer(self, gestionnaire, api, reste, query, corps_brut, nom, cle):
+        """Mode enregistrement : requête relayée vers la vraie API, réponse écrite dans la fixture."""
+        base = VRAIES_API[api]
+        url = f"{base}/{reste}" if reste else base
+        if query:
+            url += "?" + query
+
+        entetes = {
+            k: v
+            for k, v in gestionnaire.headers.items()
+            if k.lower() in ("authorization", "content-type", "x-client-id", "x-app-id")
+        }
+        try:
+            with urllib.request.urlopen(
+                urllib.request.Request(url, data=corps_brut, headers=entetes), timeout=30
+            ) as r:
+                statut, donnees = r.status, json.load(r)
+        except urllib.error.HTTPError as e:
+            return self._envoyer(gestionnaire, e.code, {"error": str(e)})
+
+        with self._verrou:
+            if cle is None:
+                self.fixtures[nom] = donnees
+            else:
+                self.fixtures.setdefault(nom, {}).setdefault("*", donnees)
+                self.fixtures[nom][cle] = donnees
+            ecrire_fixture(nom, self.fixtures[nom])
+        return self._envoyer(gestionnaire, statut, donnees)
+
+    @staticmethod
+    def _envoyer(gestionnaire, statut, donnees):
+        corps = json.dumps(donnees, ensure_ascii=False).encode("utf-8")
+        gestionnaire.send_response(statut)
+        gestionnaire.send_header("Content-Type", "application/json; charset=utf-8")
+        gestionnaire.send_header("Content-Length", str(len(corps)))
+        gestionnaire.end_headers()
+        gestionnaire.wfile.write(corps)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Ligne de commande –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def lire_latences(texte):
+    """"ors=120,opendatasoft=60" -> {"ors": 120.0, ...} ; un nombre seul s'applique à toutes les API."""
+    if not texte:
+        return {}
+    if "=" not in texte:
+        return {api: float(texte) for api in VRAIES_API}
+    latences = {}
+    for morceau in texte.split(","):
+        api, _, valeur = morceau.partition("=")
+        latences[api.strip()] = float(valeur)
+    return latences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur bouchon des API amont")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latence", default="", help="ms, ex. ors=120,opendatasoft=60,chargetrip=200")
+    parser.add_argument("--gigue", type=float, default=0.2, help="gigue relative de la latence")
+    parser.add_argument("--enregistrer", action="store_true", help="relaie vers les vraies API")
+    args = parser.parse_args()
+
+    bouchon = Bouchon(
+        args.hote, args.port, lire_latences(args.latence), args.gigue, args.enregistrer
+    )
+    for cle, valeur in bouchon.environnement().items():
+        print(f"export {cle}={valeur}")
+    try:
+        bouchon.serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
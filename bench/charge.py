@@ -0,0 +1,377 @@
+# ––– Banc de charge : débit et latence des endpoints, sans appeler les API payantes ––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Lance le serveur bouchon (bench/bouchon.py), démarre l'application sous gunicorn branchée dessus,
+# envoie les requêtes de chaque scénario à concurrence fixe puis écrit un rapport JSON comparable
+# d'un déploiement à l'autre : p50 / p95 / p99, requêtes par seconde et appels amont par endpoint.
+#
+#   python bench/charge.py --workers 2 --concurrence 16 --requetes 400 --latence ors=120 --sortie avant.json
+#   python bench/charge.py ... --sortie apres.json --reference avant.json --tolerance 0.15
+#
+# Avec --url, l'application déjà lancée est utilisée telle quelle (on peut lui donner --bouchon pour
+# les compteurs d'appels amont). Code de sortie 1 si une régression dépasse la tolérance.
+import argparse
+import datetime
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from bouchon import Bouchon, lire_latences
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Version du format du rapport (à incrémenter si les champs changent)
+VERSION_RAPPORT = 1
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Scénarios –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+VILLES = [
+    "Paris", "Lyon", "Marseille", "Grenoble", "Chambéry", "Annecy", "Toulouse", "Bordeaux",
+    "Lille", "Nantes", "Strasbourg", "Nice", "Dijon", "Clermont-Ferrand", "Montpellier", "Rennes",
+]
+
+ENVELOPPE_SOAP = """<?xml version="1.0" encoding="utf-8"?>
+<soap11env:Envelope xmlns:soap11env="http://schemas.xmlsoap.org/soap/envelope/" xmlns:tns="spyne.trajet.service">
+  <soap11env:Body>
+    <tns:calcul_temps_trajet>
+      <tns:distance_km>{distance}</tns:distance_km>
+      <tns:autonomie_km>{autonomie}</tns:autonomie_km>
+      <tns:temps_recharge_min>{recharge}</tns:temps_recharge_min>
+      <tns:nb_recharges>{nb}</tns:nb_recharges>
+    </tns:calcul_temps_trajet>
+  </soap11env:Body>
+</soap11env:Envelope>"""
+
+
+def _variantes_route():
+    for depart, arrivee in itertools.permutations(VILLES, 2):
+        yield {"params": {"start": depart, "end": arrivee}}
+
+
+def _variantes_station():
+    # Points répartis autour de Grenoble : cellules de cache différentes
+    for i in range(8):
+        for j in range(8):
+            yield {"params": {"lat": 45.15 + i * 0.011, "lon": 5.68 + j * 0.013, "rayon": 5000}}
+
+
+def _variantes_vehicules():
+    for page in range(5):
+        yield {"params": {"page": page, "size": 20}}
+
+
+def _variantes_calcul():
+    for distance in range(100, 1000, 50):
+        yield {"data": {"distance": distance, "autonomie": 350, "recharge": 40}}
+
+
+def _variantes_soap():
+    for distance in range(100, 1000, 50):
+        yield {
+            "data": ENVELOPPE_SOAP.format(distance=distance, autonomie=350, recharge=40, nb=2),
+            "headers": {"Content-Type": "text/xml; charset=utf-8"},
+        }
+
+
+def _variantes_matrix():
+    # 4 dépôts vers 12 destinations, fenêtre glissante sur la liste des villes
+    for k in range(len(VILLES)):
+        villes = VILLES[k:] + VILLES[:k]
+        yield {
+            "json": {
+                "origines": villes[:4],
+                "destinations": villes[4:],
+                "autonomie": 350,
+                "temps_recharge": 40,
+            }
+        }
+
+
+# nom : (méthode, chemin, variantes de requête rejouées en boucle)
+SCENARIOS = {
+    "route": ("GET", "/route", _variantes_route),
+    "station": ("GET", "/station", _variantes_station),
+    "vehicules": ("GET", "/vehicules", _variantes_vehicules),
+    "calcul": ("POST", "/calcul", _variantes_calcul),
+    "soap": ("POST", "/soap", _variantes_soap),
+    "matrix": ("POST", "/matrix", _variantes_matrix),
+}
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Application sous test –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def lancer_application(port, workers, mode, environnement, cache_dir):
+    """Démarre gunicorn sur l'application, branchée sur le bouchon, avec un cache vide."""
+    env = dict(os.environ)
+    env.update(environnement)
+    env.update(
+        {
+            "CACHE_DIR": cache_dir,
+            "GATEWAY_MODE": mode,
+            "ORS_API_KEY": env.get("ORS_API_KEY", "bench"),
+            "CHARGETRIP_CLIENT_ID": env.get("CHARGETRIP_CLIENT_ID", "bench"),
+            "CHARGETRIP_APP_ID": env.get("CHARGETRIP_APP_ID", "bench"),
+            "secret_flask": env.get("secret_flask", "bench"),
+        }
+    )
+    commande = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--log-level", "warning",
+    ]
+    return subprocess.Popen(commande, cwd=RACINE, env=env)
+
+
+def attendre_application(url, processus, delai_s=60):
+    fin = time.monotonic() + delai_s
+    while time.monotonic() < fin:
+        if processus is not None and processus.poll() is not None:
+            raise RuntimeError("L'application s'est arrêtée au démarrage")
+        try:
+            requests.get(f"{url}/cache/stats", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"L'application ne répond pas sur {url}")
+
+
+def port_libre():
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Mesure ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _en_erreur(reponse):
+    """Erreur HTTP, ou réponse JSON 200 portant "error": true (convention de l'application)."""
+    if reponse.status_code >= 400:
+        return True
+    if reponse.headers.get("Content-Type", "").startswith("application/json"):
+        try:
+            corps = reponse.json()
+        except ValueError:
+            return True
+        return isinstance(corps, dict) and corps.get("error") is True
+    return False
+
+
+def executer_scenario(url, nom, nb_requetes, concurrence, compter_amont, echauffement=0):
+    """
+    Rejoue nb_requetes requêtes du scénario à la concurrence donnée ; retourne ses mesures.
+    Les `echauffement` premières requêtes (chargements paresseux, connexions) ne sont pas mesurées.
+    """
+    methode, chemin, variantes = SCENARIOS[nom]
+    requetes = list(
+        itertools.islice(itertools.cycle(variantes()), echauffement + nb_requetes)
+    )
+
+    locales = threading.local()
+
+    def envoyer(requete):
+        # Une session (keep-alive) par thread client
+        session = getattr(locales, "session", None)
+        if session is None:
+            session = locales.session = requests.Session()
+        debut = time.perf_counter()
+        try:
+            r = session.request(
+                methode, url + chemin, allow_redirects=False, timeout=60, **requete
+            )
+            erreur = _en_erreur(r)
+        except requests.RequestException:
+            erreur = True
+        return time.perf_counter() - debut, erreur
+
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        list(executor.map(envoyer, requetes[:echauffement]))
+
+        avant = compter_amont()
+        debut = time.perf_counter()
+        resultats = list(executor.map(envoyer, requetes[echauffement:]))
+    duree = time.perf_counter() - debut
+    apres = compter_amont()
+
+    latences = np.array([r[0] for r in resultats]) * 1000
+    p50, p95, p99 = np.percentile(latences, [50, 95, 99])
+    return {
+        "methode": methode,
+        "chemin": chemin,
+        "requetes": len(resultats),
+        "erreurs": sum(1 for r in resultats if r[1]),
+        "duree_s": round(duree, 3),
+        "req_par_s": round(len(resultats) / duree, 1),
+        "latence_ms": {
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(latences.max()), 2),
+        },
+        "appels_amont": (
+            {api: apres[api] - avant.get(api, 0) for api in apres} if apres is not None else None
+        ),
+    }
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Comparaison avec un rapport de référence ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def comparer(rapport, reference, tolerance):
+    """
+    Affiche l'écart de chaque endpoint avec la référence et retourne la liste des régressions :
+    p95 plus lent, débit plus faible au-delà de la tolérance, ou plus d'appels amont.
+    """
+    regressions = []
+    print(f"{'endpoint':<12}{'p95 (ms)':>22}{'req/s':>22}{'appels amont':>18}")
+    for nom, mesure in rapport["endpoints"].items():
+        ref = reference.get("endpoints", {}).get(nom)
+        if ref is None:
+            continue
+
+        p95, p95_ref = mesure["latence_ms"]["p95"], ref["latence_ms"]["p95"]
+        rps, rps_ref = mesure["req_par_s"], ref["req_par_s"]
+        amont = sum((mesure["appels_amont"] or {}).values())
+        amont_ref = sum((ref["appels_amont"] or {}).values())
+        print(
+            f"{nom:<12}{p95_ref:>10.1f} -> {p95:<9.1f}{rps_ref:>10.1f} -> {rps:<9.1f}"
+            f"{amont_ref:>8} -> {amont}"
+        )
+
+        if p95 > p95_ref * (1 + tolerance):
+            regressions.append(f"{nom} : p95 {p95_ref} -> {p95} ms")
+        if rps < rps_ref * (1 - tolerance):
+            regressions.append(f"{nom} : débit {rps_ref} -> {rps} req/s")
+        if mesure["appels_amont"] is not None and ref["appels_amont"] is not None and amont > amont_ref:
+            regressions.append(f"{nom} : appels amont {amont_ref} -> {amont}")
+
+    return regressions
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Ligne de commande –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def version_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RACINE, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge des endpoints de l'application")
+    parser.add_argument("--url", help="application déjà lancée (sinon gunicorn est démarré)")
+    parser.add_argument("--bouchon", help="URL d'un bouchon déjà lancé, pour les compteurs (avec --url)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mode", choices=("sync", "threaded"), default="sync", help="GATEWAY_MODE")
+    parser.add_argument("--concurrence", type=int, default=16)
+    parser.add_argument("--requetes", type=int, default=400, help="par endpoint")
+    parser.add_argument("--echauffement", type=int, default=10, help="requêtes non mesurées")
+    parser.add_argument("--endpoints", default=",".join(SCENARIOS))
+    parser.add_argument("--latence", default="ors=120,opendatasoft=60,chargetrip=200",
+                        help="latence injectée par le bouchon (ms)")
+    parser.add_argument("--sortie", help="fichier JSON du rapport (sinon sortie standard)")
+    parser.add_argument("--reference", help="rapport précédent à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    endpoints = [nom.strip() for nom in args.endpoints.split(",") if nom.strip()]
+    inconnus = set(endpoints) - set(SCENARIOS)
+    if inconnus:
+        parser.error(f"endpoints inconnus : {', '.join(sorted(inconnus))}")
+
+    bouchon = processus = cache_dir = None
+    latences = lire_latences(args.latence)
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+            base_bouchon = args.bouchon.rstrip("/") if args.bouchon else None
+        else:
+            bouchon = Bouchon(latences=latences).demarrer()
+            base_bouchon = bouchon.url
+            cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+            port = port_libre()
+            url = f"http://127.0.0.1:{port}"
+            processus = lancer_application(
+                port, args.workers, args.mode, bouchon.environnement(), cache_dir
+            )
+        attendre_application(url, processus)
+
+        def compter_amont():
+            if base_bouchon is None:
+                return None
+            return requests.get(f"{base_bouchon}/__stats", timeout=5).json()
+
+        rapport = {
+            "version": VERSION_RAPPORT,
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git": version_git(),
+            "parametres": {
+                "workers": None if args.url else args.workers,
+                "mode": None if args.url else args.mode,
+                "concurrence": args.concurrence,
+                "requetes": args.requetes,
+                "echauffement": args.echauffement,
+                "latence_ms": latences if bouchon is not None else None,
+            },
+            "endpoints": {},
+        }
+        for nom in endpoints:
+            rapport["endpoints"][nom] = executer_scenario(
+                url, nom, args.requetes, args.concurrence, compter_amont, args.echauffement
+            )
+            mesure = rapport["endpoints"][nom]
+            print(
+                f"{nom:<12} {mesure['req_par_s']:>8.1f} req/s  p50 {mesure['latence_ms']['p50']:.1f} ms"
+                f"  p95 {mesure['latence_ms']['p95']:.1f} ms  p99 {mesure['latence_ms']['p99']:.1f} ms"
+                f"  erreurs {mesure['erreurs']}  amont {mesure['appels_amont']}",
+                file=sys.stderr,
+            )
+    finally:
+        if processus is not None:
+            processus.terminate()
+            processus.wait(timeout=30)
+        if bouchon is not None:
+            bouchon.arreter()
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    texte = json.dumps(rapport, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            f.write(texte + "\n")
+    else:
+        print(texte)
+
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            regressions = comparer(rapport, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,184 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import amont
+from irve_index import get_index
+
+# Appels simultanés à l'API des bornes pour une même recherche groupée (get_stations_proche_lot)
+BORNES_EN_PARALLELE = int(os.getenv("BORNES_EN_PARALLELE", "16"))
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Bornes de recharge ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def get_stations_proche(latitude, longitude, rayon_m, max_rows=15):
+    """
+    Récupère les bornes de recharge à proximité d’un point GPS.
+    Si un export IRVE est configuré (IRVE_DATASET), on interroge l'index spatial local,
+    sinon l’API OpenDataSoft (bornes IRVE).
+    """
+    try:
+        index = get_index()
+        stations = (
+            index.rechercher(latitude, longitude, rayon_m, max_rows) if index else None
+        )
+    except Exception as e:
+        return {"error": True, "message": str(e)}
+
+    if index is not None:
+        if not stations:
+            return {"error": True, "message": "Aucune borne trouvée dans le rayon."}
+
+        return {"error": False, "count": len(stations), "stations": stations}
+
+    return get_stations_proche_api(latitude, longitude, rayon_m, max_rows)[0]
+
+
+def get_stations_proche_api(latitude, longitude, rayon_m, max_rows=15):
+    """
+    Interroge l’API OpenDataSoft (bornes IRVE) autour d’un point GPS.
+    Retourne (résultat, complet) : complet est faux si l’API a renvoyé max_rows enregistrements
+    (d’autres bornes du rayon peuvent manquer) ou en cas d’erreur.
+    """
+    url = f"{amont.OPENDATASOFT_BASE_URL}/api/records/1.0/search/"
+    params = {
+        "dataset": "bornes-irve",
+        "geofilter.distance": f"{latitude},{longitude},{rayon_m}",
+        "rows": max_rows,
+    }
+
+    try:
+        r = amont.get("opendatasoft", url, params=params)
+        r.raise_for_status()
+        data = r.json()
+
+        if "records" not in data or not data["records"]:
+            return {"error": True, "message": "Aucune borne trouvée dans le rayon."}, True
+
+        stations = []
+        # Utilisation d'un set pour éviter les doublons
+        seen_coords = set()
+
+        for record in data["records"]:
+            fields = record.get("fields", {})
+            geometry = record.get("geometry", {})
+
+            coords = geometry.get("coordinates", [None, None])
+            lon, lat = coords[0], coords[1]
+
+            if lat is None or lon is None:
+                continue
+
+            dist_raw = fields.get("dist")
+            if dist_raw is None:
+                continue
+
+            try:
+                distance = float(dist_raw)
+            except:
+                continue
+
+            if distance > float(rayon_m):
+                continue
+
+            if (lat, lon) in seen_coords:
+                continue
+            seen_coords.add((lat, lon))
+
+            # NOUVELLES INFOS
+            acces = fields.get("acces_recharge")
+            puiss_max = fields.get("puiss_max")
+
+            # DEBUG CONSOLE
+            # print("----- BORNE IRVE -----")
+            # print("Station :", fields.get("ad_station") or fields.get("n_station"))
+            # print("Accès   :", acces)
+            # print("Puiss max :", puiss_max)
+            # print("----------------------")
+
+            station_info = {
+                "station": fields.get("ad_station") or fields.get("n_station"),
+                "acces_recharge": acces,
+                "puiss_max": puiss_max,
+                "latitude": lat,
+                "longitude": lon,
+                "distance_m": distance,
+            }
+
+            stations.append(station_info)
+
+        resultat = {
+            "error": False,
+            "count": len(stations),
+            "stations": sorted(stations, key=lambda x: x["distance_m"]),
+        }
+        return resultat, len(data["records"]) < int(max_rows)
+
+    except Exception as e:
+        return {"error": True, "message": str(e)}, False
+
+
+def get_stations_rectangle_api(lat_min, lon_min, lat_max, lon_max, max_rows=1000):
+    """
+    Toutes les bornes d'un rectangle, via l’API OpenDataSoft (geofilter.polygon).
+    Retourne (liste de bornes, complet) ; lève une exception en cas d'erreur réseau.
+    """
+    url = f"{amont.OPENDATASOFT_BASE_URL}/api/records/1.0/search/"
+    polygone = ",".join(
+        f"({lat},{lon})"
+        for lat, lon in (
+            (lat_min, lon_min),
+            (lat_min, lon_max),
+            (lat_max, lon_max),
+            (lat_max, lon_min),
+        )
+    )
+    params = {"dataset": "bornes-irve", "geofilter.polygon": polygone, "rows": max_rows}
+
+    r = amont.get("opendatasoft", url, params=params)
+    r.raise_for_status()
+    records = r.json().get("records") or []
+
+    stations = []
+    seen_coords = set()
+    for record in records:
+        fields = record.get("fields", {})
+        lon, lat = (record.get("geometry") or {}).get("coordinates", [None, None])
+        if lat is None or lon is None or (lat, lon) in seen_coords:
+            continue
+        seen_coords.add((lat, lon))
+
+        stations.append(
+            {
+                "station": fields.get("ad_station") or fields.get("n_station"),
+                "acces_recharge": fields.get("acces_recharge"),
+                "puiss_max": fields.get("puiss_max"),
+                "latitude": lat,
+                "longitude": lon,
+            }
+        )
+
+    return stations, len(records) < int(max_rows)
+
+
+def get_stations_proche_lot(points, rayon_m, max_rows=15, chercher=None):
+    """
+    Résout en une fois les bornes autour de plusieurs points [[lat, lon], ...].
+    Avec l'index local les recherches sont immédiates, sinon les appels à l'API partent en parallèle (BORNES_EN_PARALLELE au plus).
+    chercher permet de passer par une recherche en cache (même signature que get_stations_proche).
+    """
+    chercher = chercher or get_stations_proche
+    if not points:
+        return []
+
+    if get_index() is not None:
+        return [get_stations_proche(lat, lon, rayon_m, max_rows) for lat, lon in points]
+
+    with ThreadPoolExecutor(max_workers=min(BORNES_EN_PARALLELE, len(points))) as executor:
+        return list(
+            executor.map(lambda p: chercher(p[0], p[1], rayon_m, max_rows), points)
+        )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,217 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Dossier du fichier SQLite partagé par tous les workers gunicorn d'une même machine
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "etrs013_cache"))
+CACHE_DB = os.path.join(CACHE_DIR, "cache.sqlite3")
+
+# Fréquence (en nombre d'écritures) du nettoyage des entrées expirées / en surnombre sur disque
+NETTOYAGE_TOUTES_LES = 200
+
+# Tous les caches déclarés, par nom (pour exposer leurs statistiques)
+CACHES = {}
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Connexions SQLite –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+_local = threading.local()
+
+
+def connexion():
+    """Connexion SQLite propre au thread (et au processus, après un fork de gunicorn)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=5, isolation_level=None)
+    # WAL : lectures concurrentes entre workers pendant qu'un autre écrit
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Cache à deux niveaux ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class CachePersistant:
+    """
+    Cache clé -> valeur à deux niveaux :
+    - un LRU en mémoire (par processus) avec TTL, pour les accès les plus fréquents ;
+    - une table SQLite partagée entre les workers, qui survit aux redémarrages.
+
+    Les valeurs sont sérialisées en JSON par défaut (serialiser / deserialiser pour un autre format).
+    """
+
+    def __init__(
+        self,
+        nom,
+        ttl_s,
+        taille_memoire=1024,
+        taille_disque=None,
+        serialiser=None,
+        deserialiser=None,
+    ):
+        self.nom = nom
+        self.ttl_s = ttl_s
+        self.taille_memoire = taille_memoire
+        self.taille_disque = taille_disque
+        self.serialiser = serialiser or (lambda v: json.dumps(v).encode("utf-8"))
+        self.deserialiser = deserialiser or (lambda b: json.loads(b))
+
+        self.table = f"cache_{nom}"
+        self._memoire = OrderedDict()
+        self._verrou = threading.Lock()
+        self._ecritures = 0
+        self._table_prete = set()
+
+        self.hits_memoire = 0
+        self.hits_disque = 0
+        self.misses = 0
+
+        CACHES[nom] = self
+
+    def _conn(self):
+        conn = connexion()
+        if id(conn) not in self._table_prete:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(cle TEXT PRIMARY KEY, valeur BLOB, expire REAL, acces REAL)"
+            )
+            self._table_prete.add(id(conn))
+        return conn
+
+    # ––– Lecture –––
+    def get(self, cle):
+        """Valeur associée à la clé, ou None si absente / expirée."""
+        maintenant = time.time()
+
+        with self._verrou:
+            entree = self._memoire.get(cle)
+            if entree is not None:
+                expire, valeur = entree
+                if expire > maintenant:
+                    self._memoire.move_to_end(cle)
+                    self.hits_memoire += 1
+                    return valeur
+                del self._memoire[cle]
+
+        try:
+            ligne = (
+                self._conn()
+                .execute(
+                    f"SELECT valeur, expire FROM {self.table} WHERE cle = ? AND expire > ?",
+                    (cle, maintenant),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            ligne = None
+
+        if ligne is None:
+            with self._verrou:
+                self.misses += 1
+            return None
+
+        valeur = self.deserialiser(ligne[0])
+        self._memoriser(cle, valeur, ligne[1])
+
+        # Date d'accès sur disque : sert à l'éviction des entrées les moins utilisées
+        try:
+            self._conn().execute(
+                f"UPDATE {self.table} SET acces = ? WHERE cle = ?", (maintenant, cle)
+            )
+        except sqlite3.Error:
+            pass
+
+        with self._verrou:
+            self.hits_disque += 1
+        return valeur
+
+    def expiration(self, cle):
+        """Date d'expiration (timestamp) de l'entrée, None si absente ou expirée. Sans effet sur les compteurs."""
+        maintenant = time.time()
+
+        with self._verrou:
+            entree = self._memoire.get(cle)
+        if entree is not None and entree[0] > maintenant:
+            return entree[0]
+
+        try:
+            ligne = (
+                self._conn()
+                .execute(
+                    f"SELECT expire FROM {self.table} WHERE cle = ? AND expire > ?",
+                    (cle, maintenant),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            ligne = None
+        return ligne[0] if ligne else None
+
+    # ––– Écriture –––
+    def set(self, cle, valeur, ttl_s=None):
+        """Enregistre la valeur en mémoire et sur disque (TTL par défaut du cache si non précisé)."""
+        maintenant = time.time()
+        expire = maintenant + (self.ttl_s if ttl_s is None else ttl_s)
+        self._memoriser(cle, valeur, expire)
+
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (cle, valeur, expire, acces) "
+                "VALUES (?, ?, ?, ?)",
+                (cle, self.serialiser(valeur), expire, maintenant),
+            )
+            self._ecritures += 1
+            if self._ecritures % NETTOYAGE_TOUTES_LES == 0:
+                self._nettoyer(conn, maintenant)
+        except sqlite3.Error:
+            # Le disque n'est qu'un second niveau : on garde au moins la copie en mémoire
+            pass
+
+    def _memoriser(self, cle, valeur, expire):
+        with self._verrou:
+            self._memoire[cle] = (expire, valeur)
+            self._memoire.move_to_end(cle)
+            while len(self._memoire) > self.taille_memoire:
+                self._memoire.popitem(last=False)
+
+    def _nettoyer(self, conn, maintenant):
+        """Supprime les entrées expirées, puis les plus anciennes au-delà de taille_disque."""
+        conn.execute(f"DELETE FROM {self.table} WHERE expire <= ?", (maintenant,))
+        if self.taille_disque:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE cle IN ("
+                f"SELECT cle FROM {self.table} ORDER BY acces DESC LIMIT -1 OFFSET ?)",
+                (self.taille_disque,),
+            )
+
+    # ––– Statistiques –––
+    def stats(self):
+        """Compteurs hits / misses (propres au processus)."""
+        with self._verrou:
+            hits = self.hits_memoire + self.hits_disque
+            total = hits + self.misses
+            return {
+                "hits_memoire": self.hits_memoire,
+                "hits_disque": self.hits_disque,
+                "misses": self.misses,
+                "hit_ratio": round(hits / total, 4) if total else None,
+                "taille_memoire": len(self._memoire),
+            }
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
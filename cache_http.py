@@ -0,0 +1,257 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, make_response, request
+
+import prechauffage
+from cache import CACHES
+from transport import brotli
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Taille maximale des réponses gardées en mémoire par worker (corps et variantes compressées compris)
+CACHE_HTTP_MAX_OCTETS = int(os.getenv("CACHE_HTTP_MAX_OCTETS", str(32 * 1024 * 1024)))
+
+# Une réponse plus grosse que ça n'est pas gardée (elle chasserait trop d'entrées)
+CACHE_HTTP_MAX_REPONSE = CACHE_HTTP_MAX_OCTETS // 16
+
+# En-têtes de la réponse d'origine rejoués tels quels (X-Route-* du format f32 par exemple)
+ENTETES_IGNORES = {
+    "content-type", "content-length", "content-encoding", "etag", "cache-control", "vary", "set-cookie",
+}
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Réponses en mémoire –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class _Entree:
+    """
+    Réponse sérialisée : corps non compressé, ETag, en-têtes et variantes compressées (br, gzip),
+    plus les demandes notées pour le préchauffage pendant son calcul (rejouées à chaque hit).
+    """
+
+    def __init__(self, corps, content_type, entetes, etag, expire, popularite):
+        self.corps = corps
+        self.popularite = popularite
+        self.content_type = content_type
+        self.entetes = entetes
+        self.etag = etag
+        self.expire = expire
+        self.variantes = {}
+
+    def taille(self):
+        return len(self.corps) + sum(len(v) for v in self.variantes.values())
+
+
+class CacheReponses:
+    """
+    LRU des réponses HTTP sérialisées, borné en octets (propre au worker).
+    Déclaré dans CACHES : ses compteurs sortent dans /cache/stats et /metrics comme les autres.
+    """
+
+    def __init__(self, nom, max_octets):
+        self.nom = nom
+        self.max_octets = max_octets
+        self.octets = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.non_modifiees = 0
+
+        CACHES[nom] = self
+
+    def get(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and entree.expire > time.monotonic():
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return entree
+            if entree is not None:
+                self._retirer(cle)
+            self.misses += 1
+            return None
+
+    def set(self, cle, entree):
+        with self._verrou:
+            if cle in self._entrees:
+                self._retirer(cle)
+            self._entrees[cle] = entree
+            self.octets += entree.taille()
+            self._evincer()
+
+    def ajouter_variante(self, cle, entree, encodage, corps):
+        """Variante compressée d'une entrée (calculée une fois par compresser, puis resservie)."""
+        with self._verrou:
+            if self._entrees.get(cle) is not entree or encodage in entree.variantes:
+                return
+            entree.variantes[encodage] = corps
+            self.octets += len(corps)
+            self._evincer()
+
+    def _retirer(self, cle):
+        self.octets -= self._entrees.pop(cle).taille()
+
+    def _evincer(self):
+        while self.octets > self.max_octets and self._entrees:
+            self._retirer(next(iter(self._entrees)))
+
+    def noter_non_modifiee(self):
+        with self._verrou:
+            self.non_modifiees += 1
+
+    def stats(self):
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                "hits_memoire": self.hits,
+                "hits_disque": 0,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+                "taille_memoire": len(self._entrees),
+                "octets": self.octets,
+                "non_modifiees": self.non_modifiees,
+            }
+
+
+cache_reponses = CacheReponses("reponses", CACHE_HTTP_MAX_OCTETS)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Décorateur des routes GET –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _encodage_prefere():
+    """Encodage que compresser choisirait pour cette requête (None : pas de compression)."""
+    encodages = request.accept_encodings
+    if brotli is not None and encodages["br"]:
+        return "br"
+    if encodages["gzip"]:
+        return "gzip"
+    return None
+
+
+def _entetes_cache(reponse, entree, max_age_s, vary):
+    reponse.set_etag(entree.etag, weak=True)
+    reponse.cache_control.public = True
+    reponse.cache_control.max_age = max_age_s
+    reponse.vary.add("Accept-Encoding")
+    for entete in vary:
+        reponse.vary.add(entete)
+    return reponse
+
+
+def reponse_en_cache(max_age_s, ttl_s=None, vary=()):
+    """
+    Cache HTTP d'une route GET idempotente :
+    - ETag faible = empreinte du corps JSON (identique d'un worker et d'un redémarrage à l'autre),
+      If-None-Match -> 304 sans corps ;
+    - Cache-Control: public, max-age=max_age_s ;
+    - corps sérialisé gardé ttl_s secondes (max_age_s par défaut) dans cache_reponses : tant qu'il
+      est frais, la vue n'est pas exécutée et le JSON n'est pas réencodé.
+
+    La clé est le chemin, les paramètres et les en-têtes listés dans vary (Accept pour la
+    négociation de format de /route). Le corps est gardé non compressé : compresser le compresse
+    au premier hit de chaque encodage, puis memoriser_variante garde le résultat pour les suivants.
+    """
+    ttl_s = max_age_s if ttl_s is None else ttl_s
+
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(*args, **kwargs):
+            cle = (
+                request.path,
+                tuple(sorted(request.args.items(multi=True))),
+                tuple(request.headers.get(entete, "") for entete in vary),
+            )
+
+            entree = cache_reponses.get(cle)
+            if entree is None:
+                rv, popularite = prechauffage.capturer(vue, *args, **kwargs)
+                reponse = make_response(rv)
+                entree = _memoriser(cle, reponse, ttl_s, popularite)
+                if entree is None:
+                    return reponse
+            else:
+                # La vue ne s'exécute pas : ses demandes comptent quand même pour le préchauffage
+                for type, cle_entree, params in entree.popularite:
+                    prechauffage.noter(type, cle_entree, params)
+
+            if request.if_none_match.contains_weak(entree.etag):
+                cache_reponses.noter_non_modifiee()
+                return _entetes_cache(Response(status=304), entree, max_age_s, vary)
+
+            encodage = _encodage_prefere()
+            variante = entree.variantes.get(encodage) if encodage else None
+            reponse = Response(variante or entree.corps, content_type=entree.content_type)
+            reponse.headers.extend(entree.entetes)
+            if variante is not None:
+                # compresser laisse passer les réponses qui ont déjà un Content-Encoding
+                reponse.headers["Content-Encoding"] = encodage
+            else:
+                g.cache_http = (cle, entree)
+            return _entetes_cache(reponse, entree, max_age_s, vary)
+
+        return enveloppe
+
+    return decorateur
+
+
+def ne_pas_garder():
+    """
+    À appeler par une vue qui répond une erreur avec un statut 200 (format historique
+    {"error": True, ...} de /route et /station) : la réponse n'est pas gardée.
+    """
+    g.cache_http_refus = True
+
+
+def _memoriser(cle, reponse, ttl_s, popularite):
+    """Entrée de cache pour une réponse 200 non compressée, non streamée et non refusée (None sinon)."""
+    if (
+        g.pop("cache_http_refus", False)
+        or reponse.status_code != 200
+        or reponse.is_streamed
+        or reponse.direct_passthrough
+        or "Content-Encoding" in reponse.headers
+        or "Set-Cookie" in reponse.headers
+    ):
+        return None
+
+    corps = reponse.get_data()
+    if len(corps) > CACHE_HTTP_MAX_REPONSE:
+        return None
+
+    entree = _Entree(
+        corps,
+        reponse.content_type,
+        [(k, v) for k, v in reponse.headers.items() if k.lower() not in ENTETES_IGNORES],
+        hashlib.sha1(corps).hexdigest()[:24],
+        time.monotonic() + ttl_s,
+        popularite,
+    )
+    cache_reponses.set(cle, entree)
+    return entree
+
+
+def memoriser_variante(reponse):
+    """
+    after_request, enregistré avant compresser (donc exécuté après lui) : garde la version
+    compressée d'une réponse servie depuis le cache, pour ne plus la recompresser.
+    """
+    attente = g.pop("cache_http", None)
+    encodage = reponse.headers.get("Content-Encoding")
+    if attente is not None and encodage in ("br", "gzip"):
+        cle, entree = attente
+        cache_reponses.ajouter_variante(cle, entree, encodage, reponse.get_data())
+    return reponse
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,166 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import math
+import os
+
+import prechauffage
+from cache import CachePersistant
+from vol_unique import VolUnique
+from irve_index import METRES_PAR_DEGRE, get_index, haversine_m
+from bornes import (
+    get_stations_proche,
+    get_stations_proche_api,
+    get_stations_proche_lot as _get_stations_proche_lot,
+)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres du cache des bornes ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Taille d'une cellule de la grille (~1,1 km en latitude)
+CELLULE_DEG = 0.01
+
+# Demi-diagonale maximale d'une cellule : tout point de la cellule est à moins de ça de son centre
+DEMI_DIAGONALE_M = CELLULE_DEG / 2 * METRES_PAR_DEGRE * math.sqrt(2)
+
+# Les rayons de couverture sont arrondis au palier supérieur pour partager les entrées
+PALIER_RAYON_M = 500
+
+# Au-delà de ce rayon on ne passe plus par une couverture de cellule
+RAYON_MAX_COUVERTURE_M = 10000
+
+# Nombre de lignes demandées à l'API pour une couverture de cellule
+COUVERTURE_MAX_ROWS = 100
+
+STATIONS_CACHE_TTL_S = int(os.getenv("STATIONS_CACHE_TTL", str(24 * 3600)))
+# "Aucune borne" est mis en cache moins longtemps (nouvelle borne, jeu de données corrigé...)
+STATIONS_CACHE_TTL_NEGATIF_S = int(os.getenv("STATIONS_CACHE_TTL_NEGATIVE", "600"))
+
+cache_stations = CachePersistant(
+    "stations",
+    STATIONS_CACHE_TTL_S,
+    taille_memoire=int(os.getenv("STATIONS_CACHE_MEMORY_ENTRIES", "2048")),
+    taille_disque=int(os.getenv("STATIONS_CACHE_MAX_ENTRIES", "50000")),
+)
+
+AUCUNE_BORNE = "Aucune borne trouvée dans le rayon."
+
+# Une seule requête ODS par clé, même si plusieurs requêtes (ou workers) la demandent en même temps
+vol_stations = VolUnique("stations", entre_workers=True)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Recherche en cache ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _interroger(cle, lat, lon, rayon, max_rows):
+    """
+    Résultat de l'API pour (lat, lon, rayon), depuis le cache si possible.
+    Seules les réponses fiables sont mises en cache : une liste de bornes, ou "aucune borne" (TTL court).
+    Retourne (résultat, complet) ; les erreurs réseau ne sont jamais mises en cache.
+    """
+    prechauffage.noter("cellule", cle, [lat, lon, rayon, max_rows])
+
+    entree = cache_stations.get(cle)
+    if entree is not None:
+        return entree["resultat"], entree["complet"]
+
+    return vol_stations.executer(cle, _interroger_api, cle, lat, lon, rayon, max_rows)
+
+
+def _interroger_api(cle, lat, lon, rayon, max_rows, forcer=False):
+    """Appel à l'API puis mise en cache, sauf si un autre worker vient de remplir le cache."""
+    if not forcer:
+        entree = cache_stations.get(cle)
+        if entree is not None:
+            return entree["resultat"], entree["complet"]
+
+    resultat, complet = get_stations_proche_api(lat, lon, rayon, max_rows)
+
+    if not resultat.get("error"):
+        cache_stations.set(cle, {"resultat": resultat, "complet": complet})
+    elif complet and not forcer:
+        # Au préchauffage, une entrée devenue vide n'est pas prolongée : elle expire normalement
+        cache_stations.set(
+            cle, {"resultat": resultat, "complet": True}, ttl_s=STATIONS_CACHE_TTL_NEGATIF_S
+        )
+
+    return resultat, complet
+
+
+def rafraichir_cellule(cle, lat, lon, rayon, max_rows):
+    """Bornes redemandées par le préchauffage, avant l'expiration de l'entrée."""
+    return vol_stations.executer(cle, _interroger_api, cle, lat, lon, rayon, max_rows, True)
+
+
+prechauffage.enregistrer("cellule", cache_stations, rafraichir_cellule, amont="opendatasoft")
+
+
+def _filtrer(resultat, lat, lon, rayon, max_rows):
+    """Bornes d'une couverture à moins de rayon mètres du point, au format de get_stations_proche."""
+    stations = []
+    for s in resultat.get("stations") or []:
+        distance = haversine_m(lat, lon, s["latitude"], s["longitude"])
+        if distance <= rayon:
+            stations.append(dict(s, distance_m=distance))
+
+    stations.sort(key=lambda s: s["distance_m"])
+    stations = stations[:max_rows]
+
+    if not stations:
+        return {"error": True, "message": AUCUNE_BORNE}
+
+    return {"error": False, "count": len(stations), "stations": stations}
+
+
+def get_stations_proche_cached(lat, lon, rayon, max_rows=15):
+    """
+    Bornes proches d'un point, avec cache partagé entre les workers.
+
+    Le point est rattaché à une cellule de la grille. On met en cache toutes les bornes autour
+    du centre de la cellule dans un rayon qui couvre le cercle demandé, quel que soit le point
+    de la cellule : tout point de la même cellule est ensuite servi en filtrant ce résultat.
+    Si la couverture a été tronquée par l'API, on se rabat sur une requête exacte (elle aussi en cache).
+    """
+    # L'index local répond déjà sans réseau : pas besoin de cache
+    if get_index() is not None:
+        return get_stations_proche(lat, lon, rayon, max_rows)
+
+    try:
+        lat = float(lat)
+        lon = float(lon)
+        rayon = float(rayon)
+    except (TypeError, ValueError):
+        # Paramètres invalides : même réponse d'erreur qu'avant, sans cache
+        return get_stations_proche(lat, lon, rayon, max_rows)
+
+    if rayon <= RAYON_MAX_COUVERTURE_M:
+        i = math.floor(lat / CELLULE_DEG)
+        j = math.floor(lon / CELLULE_DEG)
+        centre_lat = (i + 0.5) * CELLULE_DEG
+        centre_lon = (j + 0.5) * CELLULE_DEG
+
+        rayon_couverture = (
+            math.ceil((rayon + DEMI_DIAGONALE_M) / PALIER_RAYON_M) * PALIER_RAYON_M
+        )
+        cle = f"c:{i}:{j}:{rayon_couverture}"
+
+        resultat, complet = _interroger(
+            cle, centre_lat, centre_lon, rayon_couverture, COUVERTURE_MAX_ROWS
+        )
+        if complet:
+            return _filtrer(resultat, lat, lon, rayon, max_rows)
+        if resultat.get("error"):
+            return resultat
+
+    # Requête exacte, clé arrondie au mètre près
+    cle = f"p:{lat:.5f}:{lon:.5f}:{rayon:.0f}:{max_rows}"
+    return _interroger(cle, lat, lon, rayon, max_rows)[0]
+
+
+def get_stations_proche_lot(points, rayon_m, max_rows=15):
+    """Comme bornes.get_stations_proche_lot, en passant par le cache."""
+    return _get_stations_proche_lot(
+        points, rayon_m, max_rows, chercher=get_stations_proche_cached
+    )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,277 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from cache import connexion
+
+# Intervalle entre deux rafraîchissements complets du miroir (le catalogue change rarement)
+CATALOGUE_REFRESH_S = int(os.getenv("CATALOGUE_REFRESH", str(6 * 3600)))
+
+# Fréquence à laquelle chaque worker regarde si un autre a mis le miroir à jour
+CATALOGUE_VERIFICATION_S = 60
+
+# Taille des pages demandées à ChargeTrip pendant un rafraîchissement
+CATALOGUE_PAGE_SIZE = int(os.getenv("CATALOGUE_PAGE_SIZE", "100"))
+CATALOGUE_MAX_PAGES = 200
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Outils ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def normaliser_texte(texte):
+    """Texte sans casse ni accents, pour la recherche."""
+    texte = unicodedata.normalize("NFKD", texte or "")
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    return " ".join(texte.casefold().split())
+
+
+def _tranche(liste, page, size):
+    """Éléments de la page (size par page) ; une page ou une taille négative est ramenée à 0."""
+    page, size = max(page, 0), max(size, 0)
+    return liste[page * size : (page + 1) * size]
+
+
+def libelle(vehicule):
+    """Libellé "marque modèle version" d'un véhicule ChargeTrip."""
+    naming = vehicule.get("naming") or {}
+    return " ".join(
+        str(naming.get(champ)) for champ in ("make", "model", "version") if naming.get(champ)
+    )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Miroir local du catalogue –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class CatalogueVehicules:
+    """
+    Miroir local de la vehicleList ChargeTrip.
+
+    Le catalogue est stocké dans la base SQLite partagée (cache.CACHE_DB) et rechargé en mémoire
+    dans chaque worker, indexé par id et par marque / modèle. Un thread de fond le rafraîchit toutes
+    les CATALOGUE_REFRESH_S secondes : un seul worker à la fois interroge ChargeTrip (bail en base),
+    seuls les véhicules modifiés sont réécrits, et les autres workers rechargent la nouvelle version.
+    """
+
+    def __init__(self, charger_page):
+        # charger_page(page, size) -> réponse GraphQL brute de vehicleList
+        self.charger_page = charger_page
+
+        self.vehicules = []
+        self.par_id = {}
+        self.par_marque = {}
+        self.libelles = []
+        self.version = None
+
+        self._verrou = threading.Lock()
+        self._pid = None
+
+    # ––– Base SQLite –––
+    def _conn(self):
+        conn = connexion()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalogue_vehicules "
+            "(id TEXT PRIMARY KEY, rang INTEGER, empreinte TEXT, data TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalogue_meta (cle TEXT PRIMARY KEY, valeur TEXT)"
+        )
+        return conn
+
+    def _meta(self, conn, cle):
+        ligne = conn.execute(
+            "SELECT valeur FROM catalogue_meta WHERE cle = ?", (cle,)
+        ).fetchone()
+        return ligne[0] if ligne else None
+
+    # ––– Chargement en mémoire –––
+    def _charger_memoire(self, conn):
+        """Recharge les index en mémoire si la version en base a changé."""
+        version = self._meta(conn, "version")
+        if version is None or version == self.version:
+            return
+
+        lignes = conn.execute(
+            "SELECT data FROM catalogue_vehicules ORDER BY rang"
+        ).fetchall()
+        vehicules = [json.loads(data) for (data,) in lignes]
+
+        par_marque = {}
+        for v in vehicules:
+            marque = normaliser_texte((v.get("naming") or {}).get("make"))
+            par_marque.setdefault(marque, []).append(v)
+
+        # Remplacement atomique des index : les lecteurs voient l'ancienne ou la nouvelle version
+        with self._verrou:
+            self.vehicules = vehicules
+            self.par_id = {str(v["id"]): v for v in vehicules}
+            self.par_marque = par_marque
+            self.libelles = [normaliser_texte(libelle(v)) for v in vehicules]
+            self.version = version
+
+    # ––– Rafraîchissement depuis ChargeTrip –––
+    def _prendre_bail(self, conn):
+        """Vrai si ce worker doit rafraîchir (miroir trop ancien et personne d'autre dessus)."""
+        maintenant = time.time()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            maj = float(self._meta(conn, "maj") or 0)
+            bail = float(self._meta(conn, "bail") or 0)
+
+            if maintenant - maj < CATALOGUE_REFRESH_S or bail > maintenant:
+                conn.execute("COMMIT")
+                return False
+
+            conn.execute(
+                "INSERT OR REPLACE INTO catalogue_meta (cle, valeur) VALUES ('bail', ?)",
+                (str(maintenant + 600),),
+            )
+            conn.execute("COMMIT")
+            return True
+        except sqlite3.Error:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return False
+
+    def _telecharger(self):
+        """Toute la vehicleList ChargeTrip, page par page, sans doublons."""
+        vehicules = {}
+        for page in range(CATALOGUE_MAX_PAGES):
+            resp_json = self.charger_page(page, CATALOGUE_PAGE_SIZE)
+            liste = (resp_json.get("data") or {}).get("vehicleList")
+            if liste is None:
+                raise RuntimeError("Format inattendu de la vehicleList ChargeTrip")
+
+            for v in liste:
+                vehicules.setdefault(str(v["id"]), v)
+
+            if len(liste) < CATALOGUE_PAGE_SIZE:
+                break
+
+        return vehicules
+
+    def rafraichir(self, conn):
+        """
+        Télécharge la vehicleList et n'écrit que les véhicules nouveaux ou modifiés.
+        Les appels réseau se font hors transaction pour ne pas bloquer les autres workers.
+        """
+        vehicules = self._telecharger()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._synchroniser(conn, vehicules)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _synchroniser(self, conn, vehicules):
+        existants = dict(conn.execute("SELECT id, empreinte FROM catalogue_vehicules"))
+        modifies = 0
+
+        for rang, (vid, v) in enumerate(vehicules.items()):
+            data = json.dumps(v, sort_keys=True)
+            empreinte = hashlib.sha1(data.encode("utf-8")).hexdigest()
+            if existants.get(vid) != empreinte:
+                conn.execute(
+                    "INSERT OR REPLACE INTO catalogue_vehicules (id, rang, empreinte, data) "
+                    "VALUES (?, ?, ?, ?)",
+                    (vid, rang, empreinte, data),
+                )
+                modifies += 1
+            else:
+                conn.execute(
+                    "UPDATE catalogue_vehicules SET rang = ? WHERE id = ?", (rang, vid)
+                )
+
+        # Véhicules retirés du catalogue
+        retires = set(existants) - set(vehicules)
+        conn.executemany(
+            "DELETE FROM catalogue_vehicules WHERE id = ?", [(vid,) for vid in retires]
+        )
+
+        maintenant = str(time.time())
+        if modifies or retires or self._meta(conn, "version") is None:
+            conn.execute(
+                "INSERT OR REPLACE INTO catalogue_meta (cle, valeur) VALUES ('version', ?)",
+                (maintenant,),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO catalogue_meta (cle, valeur) VALUES ('maj', ?)",
+            (maintenant,),
+        )
+        conn.execute("DELETE FROM catalogue_meta WHERE cle = 'bail'")
+
+    def _tour(self):
+        """Un passage du thread de fond : rafraîchit si nécessaire, puis recharge la mémoire."""
+        conn = self._conn()
+        if self._prendre_bail(conn):
+            try:
+                self.rafraichir(conn)
+            except Exception:
+                # Échec amont : on libère le bail, le prochain tour réessaiera
+                conn.execute("DELETE FROM catalogue_meta WHERE cle = 'bail'")
+        self._charger_memoire(conn)
+
+    def _boucle(self):
+        while True:
+            try:
+                self._tour()
+            except Exception:
+                pass
+            time.sleep(CATALOGUE_VERIFICATION_S)
+
+    def demarrer(self):
+        """Démarre le thread de fond (une fois par processus, y compris après un fork)."""
+        with self._verrou:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+        try:
+            self._charger_memoire(self._conn())
+        except sqlite3.Error:
+            pass
+
+        threading.Thread(target=self._boucle, name="catalogue", daemon=True).start()
+
+    # ––– Lecture –––
+    def pret(self):
+        """Vrai si le miroir contient des véhicules."""
+        self.demarrer()
+        return bool(self.vehicules)
+
+    def page(self, page, size):
+        """Page de la liste, dans l'ordre de ChargeTrip."""
+        return _tranche(self.vehicules, page, size)
+
+    def vehicule(self, vid):
+        return self.par_id.get(str(vid))
+
+    def rechercher(self, texte, page=0, size=20):
+        """Véhicules dont le libellé contient tous les mots de la recherche (ou d'une marque exacte)."""
+        mots = normaliser_texte(texte).split()
+        if not mots:
+            return self.page(page, size)
+
+        marque = self.par_marque.get(" ".join(mots))
+        if marque is not None:
+            resultats = marque
+        else:
+            with self._verrou:
+                vehicules, libelles = self.vehicules, self.libelles
+            resultats = [
+                v for v, lib in zip(vehicules, libelles) if all(m in lib for m in mots)
+            ]
+
+        return _tranche(resultats, page, size)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
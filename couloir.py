@@ -0,0 +1,204 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metriques
+import prechauffage
+from bornes import get_stations_rectangle_api
+from cache import CachePersistant
+from cache_stations import STATIONS_CACHE_TTL_S
+from geometrie import decouper_couloir, distances_couloir, longueurs_segments_m
+from irve_index import get_index
+from vol_unique import VolUnique
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres du couloir –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+LARGEUR_DEFAUT_M = 2000
+LARGEUR_MAX_M = 20000
+
+# Sans index local, les bornes sont demandées à l'API par tuiles fixes (partagées entre itinéraires)
+TUILE_DEG = 0.2
+TUILE_MAX_ROWS = 1000
+# Une tuile tronquée par l'API est redécoupée en 4, jusqu'à cette profondeur
+TUILE_PROFONDEUR_MAX = 3
+TUILES_EN_PARALLELE = int(os.getenv("COULOIR_TUILES_EN_PARALLELE", "16"))
+
+# Budget d'une requête de couloir : tuiles de l'API, ou cellules de l'index local (0,05°).
+# Au-delà, CouloirTropGrand (400 pour /stations/corridor), comme /stations/tiles.
+COULOIR_TUILES_MAX = int(os.getenv("COULOIR_TUILES_MAX", "600"))
+COULOIR_CELLULES_MAX = int(os.getenv("COULOIR_CELLULES_MAX", "20000"))
+# Longueur maximale de l'itinéraire (ses longs segments sont redécoupés tous les 2 km)
+COULOIR_LONGUEUR_MAX_M = float(os.getenv("COULOIR_LONGUEUR_MAX_M", "5000000"))
+
+# Tuiles stockées en listes compactes [lat, lon, station, acces_recharge, puiss_max]
+cache_tuiles = CachePersistant(
+    "couloir",
+    STATIONS_CACHE_TTL_S,
+    taille_memoire=512,
+    taille_disque=int(os.getenv("COULOIR_CACHE_MAX_ENTRIES", "20000")),
+)
+
+# Itinéraires concurrents qui partagent des tuiles : une seule requête par tuile
+vol_tuiles = VolUnique("couloir", entre_workers=True)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Bornes candidates (préfiltre par rectangles) ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _tuile(i, j, niveau=0, forcer=False):
+    """Bornes de la tuile (i, j) au niveau de découpage donné, depuis le cache si possible."""
+    cle = f"t:{niveau}:{i}:{j}"
+    if not forcer:
+        stations = cache_tuiles.get(cle)
+        if stations is not None:
+            return stations
+
+    taille = TUILE_DEG / 2**niveau
+    trouvees, complet = get_stations_rectangle_api(
+        i * taille, j * taille, (i + 1) * taille, (j + 1) * taille, TUILE_MAX_ROWS
+    )
+
+    if not complet and niveau < TUILE_PROFONDEUR_MAX:
+        stations = [
+            s
+            for di in (0, 1)
+            for dj in (0, 1)
+            for s in _tuile(2 * i + di, 2 * j + dj, niveau + 1, forcer)
+        ]
+    else:
+        stations = [
+            [s["latitude"], s["longitude"], s["station"], s["acces_recharge"], s["puiss_max"]]
+            for s in trouvees
+        ]
+
+    cache_tuiles.set(cle, stations)
+    return stations
+
+
+def _tuile_partagee(tuile):
+    """
+    _tuile regroupée avec les appels concurrents de même tuile. Seules les tuiles de niveau 0
+    passent par là : les sous-tuiles sont demandées par celui qui tient déjà la tuile parente,
+    ce qui évite de reprendre un verrou pendant qu'on en tient un.
+    """
+    i, j = tuile
+    cle = f"t:0:{i}:{j}"
+    prechauffage.noter("tuile", cle, [i, j])
+
+    stations = cache_tuiles.get(cle)
+    if stations is not None:
+        return stations
+    return vol_tuiles.executer(cle, _tuile, i, j)
+
+
+def rafraichir_tuile(cle, i, j):
+    """Tuile (et ses sous-tuiles) redemandée par le préchauffage, avant l'expiration de l'entrée."""
+    return vol_tuiles.executer(cle, _tuile, i, j, 0, True)
+
+
+prechauffage.enregistrer("tuile", cache_tuiles, rafraichir_tuile, amont="opendatasoft")
+
+
+class CouloirTropGrand(ValueError):
+    """Emprise du couloir au-delà du budget de tuiles ou de cellules."""
+
+
+def tuiles_rectangles(rectangles, maximum=None):
+    """Tuiles (i, j) de TUILE_DEG qui recouvrent les rectangles ; None au-delà de maximum tuiles."""
+    tuiles = set()
+    for lat_min, lon_min, lat_max, lon_max in rectangles:
+        i_min, i_max = math.floor(lat_min / TUILE_DEG), math.floor(lat_max / TUILE_DEG)
+        j_min, j_max = math.floor(lon_min / TUILE_DEG), math.floor(lon_max / TUILE_DEG)
+        if maximum is not None and (i_max - i_min + 1) * (j_max - j_min + 1) > maximum:
+            return None
+        tuiles.update(
+            (i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)
+        )
+        if maximum is not None and len(tuiles) > maximum:
+            return None
+    return tuiles
+
+
+def _candidats(rectangles):
+    """Bornes (lat, lon, station, acces_recharge, puiss_max) qui peuvent tomber dans les rectangles."""
+    index = get_index()
+    if index is not None:
+        candidats = index.dans_rectangles(rectangles, COULOIR_CELLULES_MAX)
+        if candidats is None:
+            raise CouloirTropGrand(f"Couloir trop étendu (plus de {COULOIR_CELLULES_MAX} cellules)")
+        return candidats
+
+    tuiles = tuiles_rectangles(rectangles, COULOIR_TUILES_MAX)
+    if tuiles is None:
+        raise CouloirTropGrand(f"Couloir trop étendu (plus de {COULOIR_TUILES_MAX} tuiles)")
+    if not tuiles:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(TUILES_EN_PARALLELE, len(tuiles))) as executor:
+        listes = executor.map(_tuile_partagee, sorted(tuiles))
+        return [s for stations in listes for s in stations]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Requête de couloir ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@metriques.chrono("stations_couloir")
+def stations_couloir(latlngs, largeur_m=LARGEUR_DEFAUT_M):
+    """
+    Toutes les bornes à moins de largeur_m mètres d'un itinéraire [[lat, lon], ...],
+    triées par position le long de l'itinéraire.
+
+    Chaque borne porte position_m (distance depuis le départ jusqu'à sa projection sur
+    l'itinéraire) et ecart_m (distance latérale à l'itinéraire). Les candidates viennent d'un
+    préfiltre par rectangles élargis (index local ou tuiles de l'API), puis une seule passe
+    vectorisée calcule les distances point-segment.
+    Lève CouloirTropGrand si l'emprise dépasse le budget de la requête.
+    """
+    pts = np.asarray(latlngs, dtype=float).reshape(-1, 2)
+    if len(pts) == 0:
+        return []
+
+    if longueurs_segments_m(pts).sum() > COULOIR_LONGUEUR_MAX_M:
+        raise CouloirTropGrand(f"Itinéraire trop long (plus de {COULOIR_LONGUEUR_MAX_M / 1000:.0f} km)")
+
+    morceaux = decouper_couloir(pts, largeur_m)
+    candidats = _candidats([rectangle for _, _, rectangle in morceaux])
+    if not candidats:
+        return []
+
+    coords = np.array([(c[0], c[1]) for c in candidats], dtype=float)
+    position, ecart = distances_couloir(morceaux, coords)
+
+    garder = np.flatnonzero(ecart <= largeur_m)
+    garder = garder[np.argsort(position[garder], kind="stable")]
+
+    stations = []
+    seen_coords = set()
+    for k in garder.tolist():
+        lat, lon, nom, acces, puiss_max = candidats[k]
+        if (lat, lon) in seen_coords:
+            continue
+        seen_coords.add((lat, lon))
+
+        stations.append(
+            {
+                "station": nom,
+                "acces_recharge": acces,
+                "puiss_max": puiss_max,
+                "latitude": lat,
+                "longitude": lon,
+                "position_m": round(float(position[k]), 1),
+                "ecart_m": round(float(ecart[k]), 1),
+            }
+        )
+
+    return stations
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,317 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import numpy as np
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Constantes ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+RAYON_TERRE_M = 6371008.8
+
+# Les polylignes ORS sont encodées avec 5 décimales
+PRECISION_POLYLINE = 5
+
+# Toutes les géométries manipulées ici sont des tableaux (n, 2) de [lat, lon] en float64.
+# Le GeoJSON (ORS, Front-End) est en [lon, lat] : voir depuis_geojson / vers_geojson.
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Polylignes encodées –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def decoder_polyline(polyline, precision=PRECISION_POLYLINE):
+    """
+    Décode une polyligne encodée (format Google / ORS) en tableau (n, 2) de [lat, lon].
+
+    Tout est vectorisé : chaque caractère porte 5 bits et un bit de continuation,
+    on regroupe les caractères par valeur, on recompose les entiers, puis on cumule les deltas.
+    """
+    octets = np.frombuffer(polyline.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if octets.size == 0:
+        return np.empty((0, 2))
+
+    fin = (octets & 0x20) == 0
+    debuts = np.flatnonzero(np.concatenate(([True], fin[:-1])))
+
+    # Position de chaque caractère dans sa valeur -> décalage de 5 bits par position
+    groupe = np.cumsum(np.concatenate(([0], fin[:-1].astype(np.int64))))
+    position = np.arange(octets.size) - debuts[groupe]
+    valeurs = np.add.reduceat((octets & 0x1F) << (5 * position), debuts)
+
+    # Décodage zig-zag (signe dans le bit de poids faible)
+    deltas = np.where(valeurs & 1, ~(valeurs >> 1), valeurs >> 1)
+
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10.0**precision
+
+
+def encoder_polyline(latlngs, precision=PRECISION_POLYLINE):
+    """Encode un tableau (n, 2) de [lat, lon] en polyligne (opération inverse de decoder_polyline)."""
+    entiers = np.round(np.asarray(latlngs, dtype=float) * 10.0**precision).astype(np.int64)
+    if entiers.size == 0:
+        return ""
+
+    deltas = np.diff(entiers, axis=0, prepend=0).ravel()
+    valeurs = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    morceaux = []
+    for v in valeurs.tolist():
+        while v >= 0x20:
+            morceaux.append(chr((0x20 | (v & 0x1F)) + 63))
+            v >>= 5
+        morceaux.append(chr(v + 63))
+    return "".join(morceaux)
+
+
+def depuis_geojson(geometry):
+    """LineString GeoJSON ([lon, lat]) -> tableau (n, 2) de [lat, lon]."""
+    coords = np.asarray(geometry["coordinates"], dtype=float).reshape(-1, 2)
+    return coords[:, ::-1]
+
+
+def vers_geojson(latlngs, decimales=6):
+    """Tableau (n, 2) de [lat, lon] -> LineString GeoJSON ([lon, lat]), comme ors.convert."""
+    coords = np.round(np.asarray(latlngs, dtype=float)[:, ::-1], decimales)
+    return {"type": "LineString", "coordinates": coords.tolist()}
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Distances –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distance orthodromique (m), vectorisée sur des tableaux NumPy."""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * RAYON_TERRE_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def longueurs_segments_m(latlngs):
+    """Longueur (m) de chaque segment d'une polyligne."""
+    pts = np.asarray(latlngs, dtype=float)
+    return haversine_m(pts[:-1, 0], pts[:-1, 1], pts[1:, 0], pts[1:, 1])
+
+
+def distances_cumulees_m(latlngs):
+    """cumul[k] = distance (m) le long de la polyligne entre le sommet 0 et le sommet k."""
+    return np.concatenate(([0.0], np.cumsum(longueurs_segments_m(latlngs))))
+
+
+def indice_seuil(cumul, seuil):
+    """Premier sommet k tel que cumul[k] >= seuil (len(cumul) si le seuil n'est jamais atteint)."""
+    return int(np.searchsorted(cumul, seuil, side="left"))
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Rééchantillonnage et simplification –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def reechantillonner(latlngs, nb_points):
+    """nb_points sommets régulièrement espacés le long de la polyligne (extrémités conservées)."""
+    pts = np.asarray(latlngs, dtype=float)
+    if len(pts) <= 2 or nb_points >= len(pts):
+        return pts
+
+    cumul = distances_cumulees_m(pts)
+    cibles = np.linspace(0.0, cumul[-1], max(nb_points, 2))
+    return np.column_stack(
+        (np.interp(cibles, cumul, pts[:, 0]), np.interp(cibles, cumul, pts[:, 1]))
+    )
+
+
+def _projection_m(pts):
+    """Projection équirectangulaire locale en mètres (suffisant pour la simplification)."""
+    lat0 = np.radians(pts[:, 0].mean())
+    x = np.radians(pts[:, 1]) * np.cos(lat0) * RAYON_TERRE_M
+    y = np.radians(pts[:, 0]) * RAYON_TERRE_M
+    return np.column_stack((x, y))
+
+
+def _masque_douglas_peucker(xy, tolerance_m):
+    """Sommets conservés par Douglas-Peucker (pile explicite, distances vectorisées par segment)."""
+    garder = np.zeros(len(xy), dtype=bool)
+    garder[0] = garder[-1] = True
+    pile = [(0, len(xy) - 1)]
+
+    while pile:
+        debut, fin = pile.pop()
+        if fin - debut < 2:
+            continue
+
+        a = xy[debut]
+        ab = xy[fin] - a
+        ap = xy[debut + 1 : fin] - a
+        longueur2 = ab @ ab
+
+        if longueur2 == 0:
+            distances = np.hypot(ap[:, 0], ap[:, 1])
+        else:
+            t = np.clip(ap @ ab / longueur2, 0.0, 1.0)
+            ecart = ap - np.outer(t, ab)
+            distances = np.hypot(ecart[:, 0], ecart[:, 1])
+
+        k = int(np.argmax(distances))
+        if distances[k] > tolerance_m:
+            milieu = debut + 1 + k
+            garder[milieu] = True
+            pile.append((debut, milieu))
+            pile.append((milieu, fin))
+
+    return garder
+
+
+def simplifier(latlngs, tolerance_m):
+    """Simplification Douglas-Peucker : écart maximal de tolerance_m mètres avec le tracé d'origine."""
+    pts = np.asarray(latlngs, dtype=float)
+    if len(pts) <= 2:
+        return pts
+    return pts[_masque_douglas_peucker(_projection_m(pts), tolerance_m)]
+
+
+def simplifier_budget(latlngs, max_points, iterations=16):
+    """
+    Simplification Douglas-Peucker au plus max_points sommets.
+    La tolérance est cherchée par dichotomie : on garde la plus petite qui respecte le budget.
+    """
+    pts = np.asarray(latlngs, dtype=float)
+    if len(pts) <= max_points:
+        return pts
+    if max_points < 2:
+        return pts[[0, -1]]
+
+    xy = _projection_m(pts)
+    bas, haut = 0.0, float(np.ptp(xy, axis=0).max()) or 1.0
+    meilleur = np.zeros(len(pts), dtype=bool)
+    meilleur[[0, -1]] = True
+
+    for _ in range(iterations):
+        tolerance = (bas + haut) / 2
+        masque = _masque_douglas_peucker(xy, tolerance)
+        nb = int(masque.sum())
+        if nb <= max_points:
+            meilleur, haut = masque, tolerance
+            # Assez proche du budget : inutile d'affiner davantage
+            if nb >= 0.9 * max_points:
+                break
+        else:
+            bas = tolerance
+
+    return pts[meilleur]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Couloir autour d'une polyligne ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _subdiviser(pts, cumul, longueur_max_m):
+    """Sommets intermédiaires (alignés) ajoutés pour qu'aucun segment ne dépasse longueur_max_m."""
+    nb = np.maximum(np.ceil(np.diff(cumul) / longueur_max_m).astype(np.int64), 1)
+    if len(pts) < 2 or nb.max() == 1:
+        return pts, cumul
+
+    segment = np.repeat(np.arange(len(nb)), nb)
+    t = (np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb, nb)) / np.repeat(nb, nb)
+    pts_sub = pts[segment] + (pts[segment + 1] - pts[segment]) * t[:, None]
+    cumul_sub = cumul[segment] + (cumul[segment + 1] - cumul[segment]) * t
+    return np.vstack((pts_sub, pts[-1:])), np.concatenate((cumul_sub, cumul[-1:]))
+
+
+def decouper_couloir(latlngs, largeur_m, segments_par_morceau=16, longueur_segment_max_m=2000):
+    """
+    Prépare une requête de couloir : la polyligne est simplifiée (écart négligeable devant la largeur),
+    ses longs segments sont redécoupés (longueur_segment_max_m), puis elle est découpée en morceaux
+    de quelques segments : l'emprise d'un morceau reste petite même entre deux sommets éloignés.
+    Retourne une liste de (sommets (k, 2), cumul (k,), rectangle) où cumul est la distance le long
+    de la polyligne d'origine et rectangle = (lat_min, lon_min, lat_max, lon_max) élargi de largeur_m.
+    """
+    pts = np.asarray(latlngs, dtype=float)
+    cumul = distances_cumulees_m(pts)
+
+    if len(pts) > 2:
+        garder = _masque_douglas_peucker(_projection_m(pts), min(largeur_m / 100, 20.0))
+        pts, cumul = pts[garder], cumul[garder]
+
+    pts, cumul = _subdiviser(pts, cumul, longueur_segment_max_m)
+
+    dlat = np.degrees(largeur_m / RAYON_TERRE_M)
+    morceaux = []
+    for debut in range(0, max(len(pts) - 1, 1), segments_par_morceau):
+        sommets = pts[debut : debut + segments_par_morceau + 1]
+        lat_max_abs = float(np.abs(sommets[:, 0]).max())
+        dlon = dlat / max(np.cos(np.radians(lat_max_abs + dlat)), 1e-6)
+        rectangle = (
+            float(sommets[:, 0].min() - dlat),
+            float(sommets[:, 1].min() - dlon),
+            float(sommets[:, 0].max() + dlat),
+            float(sommets[:, 1].max() + dlon),
+        )
+        morceaux.append((sommets, cumul[debut : debut + segments_par_morceau + 1], rectangle))
+
+    return morceaux
+
+
+def distances_couloir(morceaux, points):
+    """
+    Pour chaque point [lat, lon] : (position_m, ecart_m) = abscisse de sa projection sur la
+    polyligne et distance à celle-ci. Seuls les points du rectangle d'un morceau sont comparés
+    à ses segments (distance point-segment vectorisée, projection locale en mètres) ;
+    ecart_m vaut inf pour les points hors de tous les rectangles.
+    """
+    pts = np.asarray(points, dtype=float).reshape(-1, 2)
+    position = np.zeros(len(pts))
+    ecart = np.full(len(pts), np.inf)
+
+    for sommets, cumul, (lat_min, lon_min, lat_max, lon_max) in morceaux:
+        sel = np.flatnonzero(
+            (pts[:, 0] >= lat_min)
+            & (pts[:, 0] <= lat_max)
+            & (pts[:, 1] >= lon_min)
+            & (pts[:, 1] <= lon_max)
+        )
+        if sel.size == 0:
+            continue
+
+        # Projection sinusoïdale centrée sur le morceau (x suit la latitude de chaque point :
+        # reste juste sur les longs morceaux nord-sud, contrairement à un cos(lat) unique)
+        lat0, lon0 = sommets[0]
+        k = np.radians(1.0) * RAYON_TERRE_M
+
+        def projeter(p):
+            return np.column_stack(
+                ((p[:, 1] - lon0) * np.cos(np.radians(p[:, 0])) * k, (p[:, 0] - lat0) * k)
+            )
+
+        xy = projeter(sommets)
+        q = projeter(pts[sel])
+
+        if len(xy) == 1:
+            d = np.hypot(q[:, 0] - xy[0, 0], q[:, 1] - xy[0, 1])
+            pos = np.full(len(sel), cumul[0])
+        else:
+            a = xy[:-1]
+            ab = xy[1:] - a
+            longueur2 = np.maximum((ab**2).sum(axis=1), 1e-12)
+
+            # (points, segments) : paramètre t de la projection, borné au segment
+            ap = q[:, None, :] - a[None, :, :]
+            t = np.clip((ap * ab[None]).sum(axis=2) / longueur2, 0.0, 1.0)
+            ecarts = np.hypot(
+                ap[:, :, 0] - t * ab[None, :, 0], ap[:, :, 1] - t * ab[None, :, 1]
+            )
+
+            plus_proche = np.argmin(ecarts, axis=1)
+            rangs = np.arange(len(sel))
+            d = ecarts[rangs, plus_proche]
+            pos = cumul[plus_proche] + t[rangs, plus_proche] * (
+                cumul[plus_proche + 1] - cumul[plus_proche]
+            )
+
+        mieux = d < ecart[sel]
+        ecart[sel[mieux]] = d[mieux]
+        position[sel[mieux]] = pos[mieux]
+
+    return position, ecart
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,43 @@
+# ––– Configuration gunicorn (lue automatiquement au démarrage) –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# En mode sync (défaut) on garde les réglages de gunicorn / Azure tels quels.
+# En mode threaded (GATEWAY_MODE=threaded), chaque worker gthread garde des centaines de requêtes en vol
+# pendant que les appels amont attendent le réseau : un thread par requête, sans boucle d'événements.
+import gc
+import os
+
+if os.getenv("GATEWAY_MODE", "sync").lower() in ("threaded", "async"):
+    worker_class = "gthread"
+    threads = int(os.getenv("GATEWAY_THREADS", "200"))
+
+# GUNICORN_PRELOAD=1 : l'application est importée une seule fois dans le maître, puis les workers
+# sont forkés. Tout ce qui est chargé avant le fork (modules, WSDL, index IRVE) est partagé en
+# copy-on-write au lieu d'être reconstruit par chaque worker.
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def when_ready(server):
+    """Dans le maître, une fois l'application chargée : préchauffage avant le premier fork."""
+    if not preload_app:
+        return
+
+    import app
+
+    app.prechauffer()
+
+    # Les objets déjà créés ne seront plus parcourus par le GC : leurs pages restent partagées
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """
+    Dans chaque worker, application chargée : threads de préchauffage et de publication des
+    métriques lancés sans attendre de requête.
+    """
+    import metriques
+    import prechauffage
+
+    prechauffage.demarrer()
+    metriques.demarrer_publication()
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
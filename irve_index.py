@@ -0,0 +1,320 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import csv
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+# Export IRVE (fichier .json / .geojson / .csv d'OpenDataSoft) ou dossier contenant les exports successifs.
+# Si la variable n'est pas définie, on garde l'appel à l'API OpenDataSoft.
+IRVE_DATASET = os.getenv("IRVE_DATASET")
+
+# Intervalle minimal (en secondes) entre deux vérifications de la présence d'un nouveau fichier
+IRVE_RELOAD_INTERVAL = float(os.getenv("IRVE_RELOAD_INTERVAL", "30"))
+
+# Taille d'une cellule de la grille (~5,5 km en latitude)
+TAILLE_CELLULE_DEG = 0.05
+
+# Rayon de recherche maximal autour d'un point (/station répond 400 au-delà, rechercher le plafonne)
+RAYON_MAX_M = float(os.getenv("STATION_RAYON_MAX_M", "50000"))
+
+RAYON_TERRE_M = 6371008.8
+METRES_PAR_DEGRE = math.pi * RAYON_TERRE_M / 180.0
+
+EXTENSIONS_IRVE = (".json", ".geojson", ".csv")
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Outils géographiques ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distance orthodromique en mètres entre deux points GPS."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * RAYON_TERRE_M * math.asin(math.sqrt(a))
+
+
+def _cellule(lat, lon):
+    """Cellule de la grille contenant un point."""
+    return (
+        int(math.floor(lat / TAILLE_CELLULE_DEG)),
+        int(math.floor(lon / TAILLE_CELLULE_DEG)),
+    )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Lecture de l'export IRVE ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _en_float(valeur):
+    try:
+        return float(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coordonnees(fields, geometry):
+    """Extrait (lat, lon) d'un enregistrement IRVE, quel que soit le format d'export."""
+    coords = (geometry or {}).get("coordinates")
+    if coords and len(coords) >= 2:
+        return _en_float(coords[1]), _en_float(coords[0])
+
+    # Export CSV : "geo_point_borne" vaut "lat, lon"
+    geo_point = fields.get("geo_point_borne")
+    if isinstance(geo_point, str) and "," in geo_point:
+        lat, lon = geo_point.split(",", 1)
+        return _en_float(lat), _en_float(lon)
+    if isinstance(geo_point, (list, tuple)) and len(geo_point) >= 2:
+        return _en_float(geo_point[0]), _en_float(geo_point[1])
+
+    return _en_float(fields.get("ylatitude")), _en_float(fields.get("xlongitude"))
+
+
+def _lire_enregistrements(chemin):
+    """Générateur de (fields, geometry) pour un export IRVE."""
+    if chemin.endswith(".csv"):
+        with open(chemin, newline="", encoding="utf-8-sig") as f:
+            echantillon = f.read(4096)
+            f.seek(0)
+            dialecte = csv.Sniffer().sniff(echantillon, delimiters=";,")
+            for ligne in csv.DictReader(f, dialect=dialecte):
+                yield ligne, None
+        return
+
+    with open(chemin, encoding="utf-8") as f:
+        data = json.load(f)
+
+    # GeoJSON (FeatureCollection) ou export JSON OpenDataSoft (liste de records)
+    if isinstance(data, dict):
+        records = data.get("features") or data.get("records") or []
+    else:
+        records = data
+
+    for record in records:
+        fields = record.get("fields") or record.get("properties") or {}
+        yield fields, record.get("geometry")
+
+
+def _station_depuis_champs(fields, geometry):
+    """Tuple compact (lat, lon, station, acces_recharge, puiss_max) ou None."""
+    lat, lon = _coordonnees(fields, geometry)
+    if lat is None or lon is None:
+        return None
+
+    puiss_max = fields.get("puiss_max")
+    if isinstance(puiss_max, str):
+        puiss_max = _en_float(puiss_max) if puiss_max.strip() else None
+
+    return (
+        lat,
+        lon,
+        fields.get("ad_station") or fields.get("n_station"),
+        fields.get("acces_recharge") or None,
+        puiss_max,
+    )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Index spatial –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class IndexIRVE:
+    """
+    Index spatial en mémoire des bornes IRVE.
+
+    Les bornes sont rangées dans une grille régulière (cellules de TAILLE_CELLULE_DEG),
+    une recherche par rayon ne parcourt donc que les quelques cellules qui recouvrent le cercle.
+    """
+
+    def __init__(self, stations, source=None, version="0"):
+        self.source = source
+        # Identifie le contenu chargé (ETag des réponses calculées depuis l'index)
+        self.version = version
+        self.nb_stations = 0
+        self.grille = {}
+
+        for station in stations:
+            self.grille.setdefault(_cellule(station[0], station[1]), []).append(station)
+            self.nb_stations += 1
+
+    @classmethod
+    def charger(cls, chemin):
+        """Construit l'index à partir d'un export IRVE."""
+        stat = os.stat(chemin)
+        version = hashlib.sha1(
+            f"{chemin}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")
+        ).hexdigest()[:16]
+
+        stations = (
+            _station_depuis_champs(fields, geometry)
+            for fields, geometry in _lire_enregistrements(chemin)
+        )
+        return cls((s for s in stations if s is not None), source=chemin, version=version)
+
+    def _cellules_plage(self, i_min, j_min, i_max, j_max):
+        """
+        Cellules occupées de la plage [i_min, i_max] x [j_min, j_max]. Une plage plus grande que la
+        grille elle-même est filtrée sur les cellules occupées : le coût reste borné par l'index.
+        """
+        if (i_max - i_min + 1) * (j_max - j_min + 1) > len(self.grille):
+            return [
+                (i, j) for i, j in self.grille if i_min <= i <= i_max and j_min <= j <= j_max
+            ]
+        return [
+            (i, j)
+            for i in range(i_min, i_max + 1)
+            for j in range(j_min, j_max + 1)
+            if (i, j) in self.grille
+        ]
+
+    def _dans_plage(self, i_min, j_min, i_max, j_max):
+        """Bornes (tuples compacts) des cellules de la plage."""
+        for cellule in self._cellules_plage(i_min, j_min, i_max, j_max):
+            yield from self.grille[cellule]
+
+    def rechercher(self, latitude, longitude, rayon_m, max_rows=15):
+        """
+        Bornes à moins de rayon_m mètres, triées par distance et dédoublonnées par coordonnées.
+        Même forme de résultat que l'API OpenDataSoft (voir bornes.get_stations_proche).
+        Le rayon est plafonné à RAYON_MAX_M.
+        """
+        lat = float(latitude)
+        lon = float(longitude)
+        rayon = min(float(rayon_m), RAYON_MAX_M)
+
+        # Emprise du cercle en degrés (la longitude se resserre avec la latitude, sans dépasser
+        # un tour complet près des pôles)
+        dlat = rayon / METRES_PAR_DEGRE
+        dlon = min(rayon / (METRES_PAR_DEGRE * max(math.cos(math.radians(lat)), 1e-6)), 180.0)
+
+        i_min, j_min = _cellule(max(lat - dlat, -90.0), lon - dlon)
+        i_max, j_max = _cellule(min(lat + dlat, 90.0), lon + dlon)
+
+        candidats = []
+        for station in self._dans_plage(i_min, j_min, i_max, j_max):
+            distance = haversine_m(lat, lon, station[0], station[1])
+            if distance <= rayon:
+                candidats.append((distance, station))
+
+        # Comme l'API : on garde les max_rows plus proches avant dédoublonnage
+        candidats.sort(key=lambda c: c[0])
+
+        stations = []
+        seen_coords = set()
+        for distance, (s_lat, s_lon, nom, acces, puiss_max) in candidats[:max_rows]:
+            if (s_lat, s_lon) in seen_coords:
+                continue
+            seen_coords.add((s_lat, s_lon))
+
+            stations.append(
+                {
+                    "station": nom,
+                    "acces_recharge": acces,
+                    "puiss_max": puiss_max,
+                    "latitude": s_lat,
+                    "longitude": s_lon,
+                    "distance_m": distance,
+                }
+            )
+
+        return stations
+
+    def dans_rectangles(self, rectangles, maximum=None):
+        """
+        Bornes (tuples compacts) des cellules qui recouvrent au moins un des rectangles
+        (lat_min, lon_min, lat_max, lon_max). Préfiltre grossier : le tri fin est fait par l'appelant.
+        None si les rectangles couvrent plus de maximum cellules (occupées ou non).
+        """
+        cellules = set()
+        for lat_min, lon_min, lat_max, lon_max in rectangles:
+            i_min, j_min = _cellule(lat_min, lon_min)
+            i_max, j_max = _cellule(lat_max, lon_max)
+            if maximum is None:
+                cellules.update(self._cellules_plage(i_min, j_min, i_max, j_max))
+                continue
+
+            # Décompte avant de construire : la plage d'un seul rectangle peut déjà être immense
+            if (i_max - i_min + 1) * (j_max - j_min + 1) > maximum:
+                return None
+            cellules.update(
+                (i, j) for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)
+            )
+            if len(cellules) > maximum:
+                return None
+
+        return [station for cellule in cellules for station in self.grille.get(cellule, ())]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Chargement unique + rechargement à chaud ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+_index = None
+_signature = None
+_dernier_controle = 0.0
+_verrou = threading.Lock()
+
+
+def _fichier_courant():
+    """Fichier d'export à utiliser : IRVE_DATASET, ou le plus récent s'il s'agit d'un dossier."""
+    if os.path.isdir(IRVE_DATASET):
+        fichiers = [
+            os.path.join(IRVE_DATASET, nom)
+            for nom in os.listdir(IRVE_DATASET)
+            if nom.lower().endswith(EXTENSIONS_IRVE)
+        ]
+        if not fichiers:
+            return None
+        return max(fichiers, key=os.path.getmtime)
+
+    return IRVE_DATASET if os.path.isfile(IRVE_DATASET) else None
+
+
+def get_index():
+    """
+    Retourne l'index IRVE courant (ou None si aucun export n'est configuré).
+
+    L'index est chargé une seule fois par processus. Toutes les IRVE_RELOAD_INTERVAL secondes,
+    on regarde si un nouveau fichier est apparu (ou a été modifié) et on reconstruit l'index.
+    Pendant la reconstruction, les autres requêtes continuent d'utiliser l'ancien index.
+    """
+    global _index, _signature, _dernier_controle
+
+    if not IRVE_DATASET:
+        return None
+
+    maintenant = time.monotonic()
+    if _index is not None and maintenant - _dernier_controle < IRVE_RELOAD_INTERVAL:
+        return _index
+
+    # Un seul thread reconstruit, les autres ne bloquent que s'il n'y a encore aucun index
+    if not _verrou.acquire(blocking=_index is None):
+        return _index
+
+    try:
+        _dernier_controle = maintenant
+        chemin = _fichier_courant()
+        if chemin is None:
+            return _index
+
+        stat = os.stat(chemin)
+        signature = (chemin, stat.st_mtime_ns, stat.st_size)
+        if signature != _signature:
+            _index = IndexIRVE.charger(chemin)
+            _signature = signature
+
+        return _index
+    finally:
+        _verrou.release()
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,462 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from flask import g, request
+
+from cache import CACHE_DIR, CACHES
+from vol_unique import VOLS
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Bornes des histogrammes de durée (secondes)
+BORNES_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Chaque worker publie ses compteurs dans CACHE_DIR/metriques toutes les METRICS_FLUSH secondes, depuis
+# un thread dédié (demarrer_publication) ; /metrics additionne les publications des workers vivants
+DOSSIER_METRIQUES = os.path.join(CACHE_DIR, "metriques")
+METRICS_FLUSH_S = float(os.getenv("METRICS_FLUSH", "5"))
+
+# Profileur par échantillonnage (désactivé par défaut) : PROFILER_SEUIL_MS=500 enregistre les piles
+# les plus fréquentes des requêtes plus lentes que 500 ms
+PROFILER_SEUIL_MS = float(os.getenv("PROFILER_SEUIL_MS", "0"))
+PROFILER_INTERVALLE_MS = float(os.getenv("PROFILER_INTERVALLE_MS", "10"))
+PROFILER_PROFONDEUR = 30
+PROFILER_PILES = 5
+PROFILER_GARDER = 50
+
+journal = logging.getLogger("metriques")
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Compteurs et histogrammes –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+REGISTRE = {}
+
+
+class Compteur:
+    """Compteur cumulatif par combinaison d'étiquettes (tuple de valeurs, dans l'ordre de etiquettes)."""
+
+    type = "counter"
+
+    def __init__(self, nom, aide, etiquettes):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = etiquettes
+        self.valeurs = {}
+        self._verrou = threading.Lock()
+        REGISTRE[nom] = self
+
+    def ajouter(self, etiquettes, n=1):
+        with self._verrou:
+            self.valeurs[etiquettes] = self.valeurs.get(etiquettes, 0) + n
+
+    def instantane(self):
+        with self._verrou:
+            return [[list(e), v] for e, v in self.valeurs.items()]
+
+
+class Histogramme:
+    """
+    Histogramme de durées à bornes fixes. Une observation coûte une recherche dichotomique et
+    trois additions sous verrou : on peut le laisser actif en production.
+    Valeur par étiquettes : [effectif par borne (+ dépassement), somme, nombre].
+    """
+
+    type = "histogram"
+
+    def __init__(self, nom, aide, etiquettes, bornes=BORNES_S):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = etiquettes
+        self.bornes = bornes
+        self.valeurs = {}
+        self._verrou = threading.Lock()
+        REGISTRE[nom] = self
+
+    def observer(self, etiquettes, duree_s):
+        i = bisect_left(self.bornes, duree_s)
+        with self._verrou:
+            valeur = self.valeurs.get(etiquettes)
+            if valeur is None:
+                valeur = self.valeurs[etiquettes] = [[0] * (len(self.bornes) + 1), 0.0, 0]
+            valeur[0][i] += 1
+            valeur[1] += duree_s
+            valeur[2] += 1
+
+    def instantane(self):
+        with self._verrou:
+            return [[list(e), [list(v[0]), v[1], v[2]]] for e, v in self.valeurs.items()]
+
+
+requetes_http = Histogramme(
+    "http_request_duration_seconds",
+    "Durée des requêtes Flask par route (jusqu'au premier octet pour le streaming)",
+    ("route", "methode", "statut"),
+)
+operations_soap = Histogramme(
+    "soap_operation_duration_seconds",
+    "Durée des opérations SOAP (lecture XML, appel, écriture)",
+    ("operation", "issue"),
+)
+appels_amont = Histogramme(
+    "upstream_request_duration_seconds",
+    "Durée de chaque tentative d'appel à une API amont",
+    ("amont", "appel", "statut"),
+)
+nouvelles_tentatives = Compteur(
+    "upstream_retries_total", "Nouvelles tentatives après un échec amont", ("amont",)
+)
+sections = Histogramme(
+    "section_duration_seconds",
+    "Durée des sections de calcul instrumentées (décodage, planification...)",
+    ("section",),
+)
+erreurs_planification = Compteur(
+    "planning_errors_total", "Échecs inattendus de la planification optimale (repli glouton)", ("erreur",)
+)
+requetes_profilees = Compteur(
+    "slow_requests_profiled_total", "Requêtes lentes profilées (voir /metrics/profils)", ("route",)
+)
+
+
+@contextmanager
+def chrono(section):
+    """
+    with chrono("decoder_polyline"): ... (ou @chrono(...) sur une fonction)
+    -> durée observée dans section_duration_seconds.
+    """
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        sections.observer((section,), time.perf_counter() - debut)
+
+
+def _collecter_caches():
+    """Compteurs des caches (hits / misses) et des appels regroupés, lus au moment de la publication."""
+    metriques = {
+        "cache_requests_total": {
+            "type": "counter",
+            "aide": "Lectures de cache par résultat (hit mémoire, hit disque, miss)",
+            "etiquettes": ["cache", "resultat"],
+            "valeurs": [],
+        },
+        "cache_memory_entries": {
+            "type": "gauge",
+            "aide": "Entrées dans le niveau mémoire des caches (somme des workers)",
+            "etiquettes": ["cache"],
+            "valeurs": [],
+        },
+        "coalesced_calls_total": {
+            "type": "counter",
+            "aide": "Appels amont regroupés (single-flight) : partages = appels évités",
+            "etiquettes": ["vol", "type"],
+            "valeurs": [],
+        },
+    }
+    for nom, cache in CACHES.items():
+        stats = cache.stats()
+        for resultat in ("hits_memoire", "hits_disque", "misses"):
+            metriques["cache_requests_total"]["valeurs"].append([[nom, resultat], stats[resultat]])
+        metriques["cache_memory_entries"]["valeurs"].append([[nom], stats["taille_memoire"]])
+    for nom, vol in VOLS.items():
+        stats = vol.stats()
+        for cle in ("appels", "partages"):
+            metriques["coalesced_calls_total"]["valeurs"].append([[nom, cle], stats[cle]])
+    return metriques
+
+
+def instantane():
+    """Toutes les métriques du processus, sous une forme JSON fusionnable."""
+    metriques = {
+        nom: {
+            "type": m.type,
+            "aide": m.aide,
+            "etiquettes": list(m.etiquettes),
+            "bornes": list(getattr(m, "bornes", ())),
+            "valeurs": m.instantane(),
+        }
+        for nom, m in REGISTRE.items()
+    }
+    metriques.update(_collecter_caches())
+    return metriques
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Publication et agrégation entre workers –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+_derniere_publication = 0.0
+
+
+def publier(forcer=False):
+    """Écrit l'instantané du worker dans DOSSIER_METRIQUES/<pid>.json (au plus toutes les METRICS_FLUSH_S)."""
+    global _derniere_publication
+
+    maintenant = time.monotonic()
+    if not forcer and maintenant - _derniere_publication < METRICS_FLUSH_S:
+        return
+    _derniere_publication = maintenant
+
+    try:
+        os.makedirs(DOSSIER_METRIQUES, exist_ok=True)
+        chemin = os.path.join(DOSSIER_METRIQUES, f"{os.getpid()}.json")
+        with open(f"{chemin}.{threading.get_ident()}.tmp", "w", encoding="utf-8") as f:
+            json.dump(instantane(), f, separators=(",", ":"))
+        os.replace(f"{chemin}.{threading.get_ident()}.tmp", chemin)
+    except OSError as e:
+        journal.warning("Publication des métriques impossible : %s", e)
+
+
+_pid_publication = None
+_verrou_publication = threading.Lock()
+
+
+def _publier_en_boucle():
+    while True:
+        time.sleep(METRICS_FLUSH_S)
+        publier(forcer=True)
+
+
+def demarrer_publication():
+    """
+    Lance le thread qui publie l'instantané du worker toutes les METRICS_FLUSH_S (une fois par
+    processus, après le fork de gunicorn) : aucune écriture disque sur le chemin des requêtes.
+    """
+    global _pid_publication
+
+    if _pid_publication == os.getpid():
+        return
+
+    with _verrou_publication:
+        if _pid_publication == os.getpid():
+            return
+        _pid_publication = os.getpid()
+        threading.Thread(target=_publier_en_boucle, name="metriques", daemon=True).start()
+
+
+def _vivant(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _fusionner(total, metriques):
+    for nom, m in metriques.items():
+        cible = total.setdefault(nom, dict(m, valeurs={}))
+        for etiquettes, valeur in m["valeurs"]:
+            cle = tuple(etiquettes)
+            actuelle = cible["valeurs"].get(cle)
+            if actuelle is None:
+                cible["valeurs"][cle] = valeur
+            elif m["type"] == "histogram":
+                actuelle[0] = [a + b for a, b in zip(actuelle[0], valeur[0])]
+                actuelle[1] += valeur[1]
+                actuelle[2] += valeur[2]
+            else:
+                cible["valeurs"][cle] = actuelle + valeur
+
+
+def agreger():
+    """
+    Métriques additionnées sur tous les workers vivants de la machine.
+    Les publications des workers arrêtés sont supprimées (leurs compteurs repartent de zéro,
+    ce que Prometheus sait interpréter comme une remise à zéro de compteur).
+    """
+    publier(forcer=True)
+
+    total = {}
+    try:
+        fichiers = os.listdir(DOSSIER_METRIQUES)
+    except OSError:
+        fichiers = []
+
+    for nom in fichiers:
+        if not nom.endswith(".json"):
+            continue
+        chemin = os.path.join(DOSSIER_METRIQUES, nom)
+        try:
+            pid = int(nom[:-5])
+        except ValueError:
+            continue
+
+        if not _vivant(pid):
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+            continue
+
+        try:
+            with open(chemin, encoding="utf-8") as f:
+                _fusionner(total, json.load(f))
+        except (OSError, ValueError):
+            # Fichier en cours de remplacement : ce worker sera compté au prochain relevé
+            continue
+
+    return total
+
+
+def _echapper(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquettes(noms, valeurs, extra=""):
+    paires = [f'{n}="{_echapper(v)}"' for n, v in zip(noms, valeurs)]
+    if extra:
+        paires.append(extra)
+    return "{" + ",".join(paires) + "}" if paires else ""
+
+
+def format_prometheus(metriques):
+    """Texte d'exposition Prometheus (version 0.0.4) des métriques agrégées."""
+    lignes = []
+    for nom in sorted(metriques):
+        m = metriques[nom]
+        lignes.append(f"# HELP {nom} {m['aide']}")
+        lignes.append(f"# TYPE {nom} {m['type']}")
+
+        for cle in sorted(m["valeurs"]):
+            valeur = m["valeurs"][cle]
+            if m["type"] != "histogram":
+                lignes.append(f"{nom}{_etiquettes(m['etiquettes'], cle)} {valeur}")
+                continue
+
+            effectifs, somme, nombre = valeur
+            cumul = 0
+            for borne, effectif in zip(list(m["bornes"]) + ["+Inf"], effectifs):
+                cumul += effectif
+                le = 'le="' + (borne if borne == "+Inf" else repr(float(borne))) + '"'
+                lignes.append(f"{nom}_bucket{_etiquettes(m['etiquettes'], cle, le)} {cumul}")
+            lignes.append(f"{nom}_sum{_etiquettes(m['etiquettes'], cle)} {round(somme, 6)}")
+            lignes.append(f"{nom}_count{_etiquettes(m['etiquettes'], cle)} {nombre}")
+
+    return "\n".join(lignes) + "\n"
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Profileur par échantillonnage –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class Profileur:
+    """
+    Échantillonne toutes les `intervalle_ms` la pile des threads qui traitent une requête
+    (sys._current_frames). À la fin d'une requête plus lente que `seuil_ms`, ses piles les plus
+    fréquentes sont journalisées et gardées pour /metrics/profils ; sinon elles sont jetées.
+    Le thread d'échantillonnage est démarré à la première requête, dans chaque worker.
+    """
+
+    def __init__(self, seuil_ms, intervalle_ms):
+        self.seuil_s = seuil_ms / 1000
+        self.intervalle_s = intervalle_ms / 1000
+        self.profils = deque(maxlen=PROFILER_GARDER)
+
+        self._en_cours = {}
+        self._verrou = threading.Lock()
+        self._pid = None
+
+    def _demarrer(self):
+        # Après un fork, le thread du maître n'existe plus dans le worker (appelé sous _verrou)
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._echantillonner, daemon=True, name="profileur").start()
+
+    def _echantillonner(self):
+        while True:
+            time.sleep(self.intervalle_s)
+            with self._verrou:
+                if not self._en_cours:
+                    continue
+                cadres = sys._current_frames()
+                for ident, echantillons in self._en_cours.items():
+                    cadre = cadres.get(ident)
+                    if cadre is None:
+                        continue
+                    pile = []
+                    while cadre is not None and len(pile) < PROFILER_PROFONDEUR:
+                        code = cadre.f_code
+                        pile.append(
+                            f"{os.path.basename(code.co_filename)}:{cadre.f_lineno} {code.co_name}"
+                        )
+                        cadre = cadre.f_back
+                    echantillons[tuple(pile)] += 1
+
+    def debut(self):
+        with self._verrou:
+            self._demarrer()
+            self._en_cours[threading.get_ident()] = Counter()
+
+    def fin(self, route, duree_s):
+        with self._verrou:
+            echantillons = self._en_cours.pop(threading.get_ident(), None)
+        if echantillons is None or duree_s < self.seuil_s:
+            return
+
+        piles = [
+            {"echantillons": n, "pile": list(pile)}
+            for pile, n in echantillons.most_common(PROFILER_PILES)
+        ]
+        self.profils.append(
+            {
+                "route": route,
+                "duree_ms": round(duree_s * 1000, 1),
+                "echantillons": sum(echantillons.values()),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "pid": os.getpid(),
+                "piles": piles,
+            }
+        )
+        requetes_profilees.ajouter((route,))
+        if piles:
+            journal.warning(
+                "Requête lente %s (%.0f ms), pile la plus fréquente :\n  %s",
+                route,
+                duree_s * 1000,
+                "\n  ".join(piles[0]["pile"]),
+            )
+
+
+profileur = Profileur(PROFILER_SEUIL_MS, PROFILER_INTERVALLE_MS) if PROFILER_SEUIL_MS > 0 else None
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Hooks Flask –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def debut_requete():
+    """before_request : départ du chrono (et du profileur s'il est activé)."""
+    g.debut_requete = time.perf_counter()
+    if profileur is not None:
+        profileur.debut()
+
+
+def fin_requete(reponse):
+    """after_request (enregistré avant compresser pour mesurer aussi la compression)."""
+    debut = g.pop("debut_requete", None)
+    if debut is None:
+        return reponse
+
+    duree = time.perf_counter() - debut
+    route = request.url_rule.rule if request.url_rule is not None else "<inconnue>"
+    requetes_http.observer((route, request.method, str(reponse.status_code)), duree)
+    if profileur is not None:
+        profileur.fin(route, duree)
+
+    return reponse
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
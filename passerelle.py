@@ -0,0 +1,79 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Mode d'exécution ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# "sync" (défaut) : comportement historique, les appels amont s'enchaînent les uns après les autres.
+# "threaded" : les appels amont indépendants partent en même temps sur un pool de threads partagé
+#              (voir aussi gunicorn.conf.py pour les workers gthread). Mode à base de threads, pas
+#              d'asyncio : les clients HTTP restent bloquants, chaque appel en vol occupe un thread
+#              (et sa pile). "async", l'ancien nom de ce mode, est encore accepté.
+GATEWAY_MODE = os.getenv("GATEWAY_MODE", "sync").lower()
+MODE_THREADS = GATEWAY_MODE in ("threaded", "async")
+
+# Nombre maximal d'appels amont en vol simultanément dans un processus
+GATEWAY_MAX_INFLIGHT = int(os.getenv("GATEWAY_MAX_INFLIGHT", "256"))
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Pool de threads partagé –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+_executor = None
+_pid = None
+_verrou = threading.Lock()
+
+
+def _get_executor():
+    """Pool du processus, créé à la première utilisation (et recréé après un fork de gunicorn)."""
+    global _executor, _pid
+
+    with _verrou:
+        if _executor is None or _pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=GATEWAY_MAX_INFLIGHT, thread_name_prefix="amont"
+            )
+            _pid = os.getpid()
+        return _executor
+
+
+def _soumettre(fonction, *args):
+    """
+    Appel soumis au pool dans une copie du contexte de l'appelant (contextvars) : le contexte
+    Flask et les collecteurs de popularité (prechauffage) suivent l'appel dans son thread.
+    """
+    return _get_executor().submit(contextvars.copy_context().run, fonction, *args)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– API utilisée par les routes Flask –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def executer(*appels):
+    """
+    Exécute des appels indépendants, donnés sous la forme (fonction, *args),
+    et retourne la liste de leurs résultats dans le même ordre.
+
+    En mode threaded ils partent tous ensemble, en mode sync ils s'enchaînent.
+    La première exception rencontrée est propagée à l'appelant dans les deux cas.
+    """
+    if not MODE_THREADS or len(appels) < 2:
+        return [fonction(*args) for fonction, *args in appels]
+
+    futurs = [_soumettre(fonction, *args) for fonction, *args in appels]
+    return [futur.result() for futur in futurs]
+
+
+def en_arriere_plan(fonction, *args):
+    """Planifie un appel sans l'attendre (préchargement). Sans effet en mode sync."""
+    if not MODE_THREADS:
+        return
+
+    _soumettre(fonction, *args)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,286 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import numpy as np
+
+from geometrie import distances_cumulees_m, haversine_m, indice_seuil
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres de la planification ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Rayon de recherche autour du point où l'on passe sous le seuil (identique à l'ancien Front-End)
+RAYON_RECHERCHE_M = 2000
+
+# Puissance retenue si la borne ne la renseigne pas, et plafond (véhicule / borne)
+PUISSANCE_DEFAUT_KW = 22.0
+PUISSANCE_MAX_KW = 150.0
+
+# On recharge du seuil jusqu'à 80 %
+NIVEAU_CIBLE = 0.8
+
+# Nombre de sommets candidats résolus en un seul lot quand on cherche une borne
+TAILLE_LOT = 4
+
+# Recherche optimale : bornes d'un couloir de cette largeur autour de l'itinéraire
+LARGEUR_COULOIR_M = 3000
+
+# Dans chaque tronçon de cette longueur, on ne garde que les bornes non dominées (puissance / détour)
+PAS_ELAGAGE_M = 2000
+
+# Batterie pleine au départ (comme l'algorithme glouton)
+NIVEAU_DEPART = 1.0
+
+# Temps fixe d'un arrêt (manœuvre, branchement, paiement) et vitesse sur le détour jusqu'à la borne
+TEMPS_ARRET_S = 5 * 60
+VITESSE_DETOUR_KMH = 40.0
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Choix des bornes (algorithme glouton) –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def puissance_borne(puiss_max):
+    """
+    Puissance utilisable (kW) d'une borne, bornée à PUISSANCE_MAX_KW.
+    Une puissance absente, illisible, nulle, négative ou infinie (données IRVE) vaut PUISSANCE_DEFAUT_KW.
+    """
+    try:
+        puissance = float(puiss_max)
+    except (TypeError, ValueError):
+        puissance = PUISSANCE_DEFAUT_KW
+
+    if not np.isfinite(puissance) or puissance <= 0:
+        puissance = PUISSANCE_DEFAUT_KW
+
+    return min(puissance, PUISSANCE_MAX_KW)
+
+
+def temps_recharge_min(capacite_kwh, seuil_pourcent, puissance_kw):
+    """Temps (minutes) pour recharger du seuil jusqu'à NIVEAU_CIBLE."""
+    energie_kwh = capacite_kwh * (NIVEAU_CIBLE - seuil_pourcent)
+    return int(round(energie_kwh / puissance_kw * 60))
+
+
+def _borne_choisie(borne, capacite_kwh, seuil_pourcent):
+    """
+    Mise en forme d'une borne retenue (même format que l'ancien Front-End).
+    seuil_pourcent est le niveau de batterie à l'arrivée à la borne.
+    """
+    puissance = puissance_borne(borne.get("puiss_max"))
+
+    return {
+        "station": borne.get("station") or "Borne inconnue",
+        "acces": borne.get("acces_recharge") or "Inconnu",
+        "puissance_kw": puissance,
+        "temps_recharge_min": temps_recharge_min(capacite_kwh, seuil_pourcent, puissance),
+        "latitude": borne["latitude"],
+        "longitude": borne["longitude"],
+        "distance_m": borne.get("distance_m") or 0,
+    }
+
+
+def recherche_couloir(stations, max_rows=15):
+    """
+    chercher_lot servi par les bornes d'un couloir déjà chargé (couloir.stations_couloir, de largeur
+    au moins RAYON_RECHERCHE_M : toute borne à moins du rayon d'un sommet y figure). Toutes les
+    bornes du trajet arrivent en une requête groupée ; la boucle gloutonne ne fait plus d'appel
+    réseau par arrêt. Même format de réponse que bornes.get_stations_proche.
+    """
+    coords = np.array([[s["latitude"], s["longitude"]] for s in stations], dtype=float).reshape(-1, 2)
+
+    def chercher_lot(points, rayon_m):
+        resultats = []
+        for lat, lon in points:
+            distances = haversine_m(lat, lon, coords[:, 0], coords[:, 1])
+            proches = np.flatnonzero(distances <= rayon_m)
+            if proches.size == 0:
+                resultats.append({"error": True, "message": "Aucune borne trouvée dans le rayon."})
+                continue
+
+            proches = proches[np.argsort(distances[proches], kind="stable")][:max_rows]
+            trouvees = [dict(stations[k], distance_m=float(distances[k])) for k in proches]
+            resultats.append({"error": False, "count": len(trouvees), "stations": trouvees})
+        return resultats
+
+    return chercher_lot
+
+
+def choisir_bornes(latlngs, autonomie_km, capacite_kwh, seuil_pourcent, chercher_lot):
+    """Sélection gloutonne des bornes (liste complète, voir iterer_bornes)."""
+    return list(iterer_bornes(latlngs, autonomie_km, capacite_kwh, seuil_pourcent, chercher_lot))
+
+
+def iterer_bornes(latlngs, autonomie_km, capacite_kwh, seuil_pourcent, chercher_lot):
+    """
+    Sélection gloutonne des bornes le long d'une polyligne [[lat, lon], ...],
+    produites une par une dès qu'elles sont choisies.
+
+    Même règle que l'ancienne boucle du Front-End : on roule jusqu'à passer sous le seuil
+    d'autonomie, puis on prend la borne la plus proche du sommet courant (ou des suivants
+    si aucune n'est trouvée). Les distances sont cumulées en une passe vectorisée, et les
+    sommets candidats sont résolus par lots via chercher_lot(points, rayon_m).
+    """
+    pts = np.asarray(latlngs, dtype=float)
+    if len(pts) < 2:
+        return
+
+    # cumul[k] = distance (km) du sommet 0 au sommet k
+    cumul = distances_cumulees_m(pts) / 1000
+    seuil_km = autonomie_km * seuil_pourcent
+
+    origine = pts[0]
+    i = 1
+
+    while i < len(pts):
+        # Distance parcourue depuis l'origine (départ ou dernière borne) pour chaque sommet k >= i
+        premier = float(haversine_m(origine[0], origine[1], pts[i, 0], pts[i, 1])) / 1000
+        parcouru = premier + (cumul[i:] - cumul[i])
+
+        k = i + indice_seuil(parcouru, autonomie_km - seuil_km)
+        if k >= len(pts):
+            break
+
+        # On cherche une borne au sommet k, sinon aux suivants, TAILLE_LOT sommets à la fois
+        borne = None
+        while borne is None and k < len(pts):
+            lot = pts[k : k + TAILLE_LOT]
+            resultats = chercher_lot(lot.tolist(), RAYON_RECHERCHE_M)
+
+            for decalage, data in enumerate(resultats):
+                if not data.get("error") and data.get("stations"):
+                    borne = min(data["stations"], key=lambda s: s["distance_m"])
+                    k += decalage
+                    break
+            else:
+                k += len(lot)
+
+        if borne is None:
+            break
+
+        yield _borne_choisie(borne, capacite_kwh, seuil_pourcent)
+        origine = np.array([borne["latitude"], borne["longitude"]], dtype=float)
+        i = k + 1
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Choix des bornes (temps total minimal) ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _puissance_nulle(borne):
+    """Borne annoncée à 0 kW ou moins : écartée de la recherche optimale (d'autres bornes existent)."""
+    try:
+        return float(borne.get("puiss_max")) <= 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _elaguer(bornes):
+    """
+    Bornes utiles au calcul : dans chaque tronçon de PAS_ELAGAGE_M, une borne moins puissante
+    et plus éloignée de l'itinéraire qu'une autre ne peut pas améliorer le trajet (à la longueur
+    du tronçon près). Réduit fortement le graphe sur les axes très équipés.
+    """
+    troncons = {}
+    for b in bornes:
+        troncons.setdefault(int(b["position_m"] // PAS_ELAGAGE_M), []).append(b)
+
+    gardees = []
+    for groupe in troncons.values():
+        # Puissance décroissante, puis détour croissant : front de Pareto en une passe
+        groupe.sort(key=lambda b: (-puissance_borne(b.get("puiss_max")), b["ecart_m"]))
+        ecart_min = np.inf
+        for b in groupe:
+            if b["ecart_m"] < ecart_min:
+                gardees.append(b)
+                ecart_min = b["ecart_m"]
+
+    return sorted(gardees, key=lambda b: b["position_m"])
+
+
+def choisir_bornes_optimal(
+    latlngs, duree_s, autonomie_km, capacite_kwh, seuil_pourcent, chercher_couloir
+):
+    """
+    Suite d'arrêts minimisant le temps total du trajet (conduite + détours + recharges).
+
+    Les bornes du couloir (chercher_couloir(latlngs, largeur_m), voir couloir.stations_couloir)
+    sont les nœuds d'un graphe orienté (départ -> bornes -> arrivée, dans l'ordre de l'itinéraire). Un arc i -> j existe si la batterie arrive en j au-dessus du seuil ;
+    son poids est le temps de conduite (vitesse moyenne de l'itinéraire, plus le détour) et le
+    temps pour recharger en j jusqu'à NIVEAU_CIBLE à la puissance de la borne. Le graphe est
+    acyclique : une programmation dynamique dans l'ordre des positions donne l'optimum,
+    avec les arcs sortants de chaque nœud évalués d'un coup en NumPy.
+
+    Retourne None si aucune suite d'arrêts ne permet d'arriver.
+    """
+    pts = np.asarray(latlngs, dtype=float)
+    if len(pts) < 2:
+        return []
+
+    longueur_m = float(distances_cumulees_m(pts)[-1])
+    autonomie_m = autonomie_km * 1000
+    if longueur_m <= (NIVEAU_DEPART - seuil_pourcent) * autonomie_m:
+        return []
+
+    # Les puissances passent par puissance_borne (jamais nulles) : pas de coût infini dans le graphe
+    bornes = _elaguer(
+        [b for b in chercher_couloir(pts, LARGEUR_COULOIR_M) if not _puissance_nulle(b)]
+    )
+
+    # Nœuds : 0 = départ, 1..n = bornes, n + 1 = arrivée
+    n = len(bornes)
+    position = np.array([0.0] + [b["position_m"] for b in bornes] + [longueur_m])
+    ecart = np.array([0.0] + [b["ecart_m"] for b in bornes] + [0.0])
+    puissance = np.array(
+        [np.inf] + [puissance_borne(b.get("puiss_max")) for b in bornes] + [np.inf]
+    )
+    depart = np.full(n + 2, NIVEAU_CIBLE)
+    depart[0] = NIVEAU_DEPART
+
+    secondes_par_m = duree_s / longueur_m if longueur_m else 0.0
+    secondes_par_m_detour = 3.6 / VITESSE_DETOUR_KMH
+
+    meilleur = np.full(n + 2, np.inf)
+    meilleur[0] = 0.0
+    precedent = np.full(n + 2, -1)
+    arrivee = np.zeros(n + 2)
+
+    for i in range(n + 1):
+        if not np.isfinite(meilleur[i]):
+            continue
+
+        # Nœuds atteignables depuis i (le détour ne fait que réduire cette fenêtre)
+        portee = position[i] + (depart[i] - seuil_pourcent) * autonomie_m
+        fin = int(np.searchsorted(position, portee, side="right"))
+        j = np.arange(i + 1, fin)
+        if j.size == 0:
+            continue
+
+        detour = ecart[i] + ecart[j]
+        niveau = depart[i] - (position[j] - position[i] + detour) / autonomie_m
+        ok = niveau >= seuil_pourcent
+        j, detour, niveau = j[ok], detour[ok], niveau[ok]
+
+        conduite = (position[j] - position[i]) * secondes_par_m + detour * secondes_par_m_detour
+        energie = np.clip(NIVEAU_CIBLE - niveau, 0.0, None) * capacite_kwh
+        recharge = np.where(
+            j <= n, energie / puissance[j] * 3600 + TEMPS_ARRET_S, 0.0
+        )
+
+        total = meilleur[i] + conduite + recharge
+        mieux = total < meilleur[j]
+        meilleur[j[mieux]] = total[mieux]
+        precedent[j[mieux]] = i
+        arrivee[j[mieux]] = niveau[mieux]
+
+    if not np.isfinite(meilleur[n + 1]):
+        return None
+
+    arrets = []
+    k = int(precedent[n + 1])
+    while k > 0:
+        borne = dict(bornes[k - 1], distance_m=float(ecart[k]))
+        arrets.append(_borne_choisie(borne, capacite_kwh, min(float(arrivee[k]), NIVEAU_CIBLE)))
+        k = int(precedent[k])
+
+    return arrets[::-1]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
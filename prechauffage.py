@@ -0,0 +1,415 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import amont
+import metriques
+from cache import CACHE_DIR, connexion
+
+# flock n'existe que sous Unix : ailleurs chaque processus préchauffe pour lui-même
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# PRECHAUFFAGE=0 : pas de thread de préchauffage dans les workers (par exemple quand il tourne
+# à part avec `python prechauffage.py`). Le suivi de popularité reste actif.
+PRECHAUFFAGE = os.getenv("PRECHAUFFAGE", "1") != "0"
+
+# Un cycle toutes les PRECHAUFFAGE_INTERVALLE secondes, sur les PRECHAUFFAGE_TOP entrées les plus demandées par type
+PRECHAUFFAGE_INTERVALLE_S = float(os.getenv("PRECHAUFFAGE_INTERVALLE", "60"))
+PRECHAUFFAGE_TOP = int(os.getenv("PRECHAUFFAGE_TOP", "200"))
+
+# Une entrée est rafraîchie quand il lui reste moins de PRECHAUFFAGE_AVANCE x TTL du cache
+# (et au minimum deux cycles) : elle n'expire jamais tant qu'elle reste populaire
+PRECHAUFFAGE_AVANCE = float(os.getenv("PRECHAUFFAGE_AVANCE", "0.05"))
+
+# Rafraîchissements simultanés, et débit maximal par API amont (requêtes / seconde)
+PRECHAUFFAGE_CONCURRENCE = int(os.getenv("PRECHAUFFAGE_CONCURRENCE", "2"))
+PRECHAUFFAGE_DEBITS = os.getenv("PRECHAUFFAGE_DEBITS", "ors=1,opendatasoft=2,chargetrip=0.5")
+
+# Popularité : score décroissant de moitié toutes les PRECHAUFFAGE_DEMI_VIE secondes,
+# compteurs des workers écrits en base au plus toutes les POPULARITE_FLUSH secondes
+PRECHAUFFAGE_DEMI_VIE_S = float(os.getenv("PRECHAUFFAGE_DEMI_VIE", str(24 * 3600)))
+POPULARITE_FLUSH_S = float(os.getenv("POPULARITE_FLUSH", "10"))
+POPULARITE_MAX_ENTREES = int(os.getenv("POPULARITE_MAX_ENTREES", "20000"))
+
+FICHIER_VERROU = os.path.join(CACHE_DIR, "prechauffage.lock")
+
+journal = logging.getLogger("prechauffage")
+
+prechauffages = metriques.Compteur(
+    "cache_prewarm_total", "Entrées rafraîchies en arrière-plan par le préchauffage", ("type", "issue")
+)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Types d'entrées préchauffables ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class Source:
+    """
+    Un type d'entrée suivi par le préchauffage : le cache qui la stocke, la fonction qui la
+    recalcule (rafraichir(cle, params), en ignorant le cache) et l'API amont qu'elle appelle.
+    """
+
+    def __init__(self, type, cache, rafraichir, amont=None):
+        self.type = type
+        self.cache = cache
+        self.rafraichir = rafraichir
+        self.amont = amont
+
+
+SOURCES = {}
+
+
+def enregistrer(type, cache, rafraichir, amont=None):
+    """Déclare un type d'entrée (appelé par le module propriétaire du cache)."""
+    SOURCES[type] = Source(type, cache, rafraichir, amont)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Suivi de popularité –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Compteurs du worker en attente d'écriture : (type, clé) -> [nombre, params]
+_en_attente = {}
+_verrou_attente = threading.Lock()
+_derniere_ecriture = time.monotonic()
+
+# Liste où recopier les demandes notées pendant le calcul d'une réponse (voir cache_http), None sinon
+_capture = contextvars.ContextVar("capture_popularite", default=None)
+
+
+def _table(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS popularite "
+        "(type TEXT, cle TEXT, params TEXT, score REAL, vu REAL, PRIMARY KEY (type, cle))"
+    )
+    return conn
+
+
+def noter(type, cle, params):
+    """
+    Compte une demande de l'entrée (type, cle). params : arguments JSON de sa fonction de
+    rafraîchissement. Ne coûte qu'une addition en mémoire ; l'écriture en base est groupée.
+    """
+    global _derniere_ecriture
+
+    capture = _capture.get()
+    if capture is not None:
+        capture.append((type, cle, params))
+
+    with _verrou_attente:
+        entree = _en_attente.get((type, cle))
+        if entree is None:
+            _en_attente[(type, cle)] = [1, params]
+        else:
+            entree[0] += 1
+
+        maintenant = time.monotonic()
+        if maintenant - _derniere_ecriture < POPULARITE_FLUSH_S:
+            return
+        _derniere_ecriture = maintenant
+        lot = list(_en_attente.items())
+        _en_attente.clear()
+
+    _ecrire(lot)
+
+
+def capturer(fonction, *args, **kwargs):
+    """
+    (résultat de fonction(*args), demandes notées pendant l'appel). Sert à rejouer la popularité
+    d'une réponse resservie sans exécuter la vue (cache_http) ; suit les appels de la passerelle.
+    """
+    notes = []
+    jeton = _capture.set(notes)
+    try:
+        return fonction(*args, **kwargs), notes
+    finally:
+        _capture.reset(jeton)
+
+
+def _ecrire(lot):
+    maintenant = time.time()
+    try:
+        _table(connexion()).executemany(
+            "INSERT INTO popularite (type, cle, params, score, vu) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (type, cle) DO UPDATE SET "
+            "score = score + excluded.score, vu = excluded.vu, params = excluded.params",
+            [
+                (type, cle, json.dumps(params), nombre, maintenant)
+                for (type, cle), (nombre, params) in lot
+            ],
+        )
+    except sqlite3.Error as e:
+        # La popularité n'est qu'une indication : on ne bloque jamais une requête pour elle
+        journal.warning("Écriture de la popularité impossible : %s", e)
+
+
+def vider():
+    """Écrit tout de suite les compteurs en attente (fin de processus, tests)."""
+    with _verrou_attente:
+        lot = list(_en_attente.items())
+        _en_attente.clear()
+    if lot:
+        _ecrire(lot)
+
+
+def plus_demandees(type, nombre):
+    """Les `nombre` entrées les plus populaires du type : [(cle, params, score)]."""
+    lignes = (
+        _table(connexion())
+        .execute(
+            "SELECT cle, params, score FROM popularite WHERE type = ? ORDER BY score DESC LIMIT ?",
+            (type, nombre),
+        )
+        .fetchall()
+    )
+    return [(cle, json.loads(params), score) for cle, params, score in lignes]
+
+
+def oublier(type, cle):
+    """Retire une entrée du suivi de popularité (elle y reviendra si elle est de nouveau demandée)."""
+    try:
+        _table(connexion()).execute("DELETE FROM popularite WHERE type = ? AND cle = ?", (type, cle))
+    except sqlite3.Error as e:
+        journal.warning("Suppression de la popularité impossible : %s", e)
+
+
+def vieillir(duree_s):
+    """Décroissance des scores après duree_s secondes, et purge des entrées oubliées."""
+    facteur = 0.5 ** (duree_s / PRECHAUFFAGE_DEMI_VIE_S)
+    conn = _table(connexion())
+    conn.execute("UPDATE popularite SET score = score * ?", (facteur,))
+    conn.execute("DELETE FROM popularite WHERE score < 0.01")
+    conn.execute(
+        "DELETE FROM popularite WHERE rowid IN ("
+        "SELECT rowid FROM popularite ORDER BY score DESC LIMIT -1 OFFSET ?)",
+        (POPULARITE_MAX_ENTREES,),
+    )
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Débit par API amont –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def lire_debits(texte):
+    """"ors=1,opendatasoft=2" -> {"ors": 1.0, "opendatasoft": 2.0}"""
+    debits = {}
+    for morceau in texte.split(","):
+        nom, _, valeur = morceau.partition("=")
+        if nom.strip() and valeur.strip():
+            debits[nom.strip()] = float(valeur)
+    return debits
+
+
+class Debit:
+    """Seau à jetons : au plus par_seconde appels par seconde, sans rafale au-delà d'un appel."""
+
+    def __init__(self, par_seconde):
+        self.intervalle_s = 1.0 / par_seconde if par_seconde > 0 else 0.0
+        self.prochain = 0.0
+        self._verrou = threading.Lock()
+
+    def attendre(self):
+        with self._verrou:
+            maintenant = time.monotonic()
+            depart = max(self.prochain, maintenant)
+            self.prochain = depart + self.intervalle_s
+        if depart > maintenant:
+            time.sleep(depart - maintenant)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Préchauffeur ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _en_erreur(resultat):
+    """Réponse au format {"error": True, ...}, seule ou en tête d'un tuple (résultat, complet)."""
+    if isinstance(resultat, tuple) and resultat:
+        resultat = resultat[0]
+    return isinstance(resultat, dict) and bool(resultat.get("error"))
+
+
+class Prechauffeur:
+    """
+    Boucle de préchauffage. Un seul préchauffeur travaille à la fois sur la machine (verrou
+    FICHIER_VERROU) ; les autres workers retentent de prendre la main à chaque intervalle,
+    ce qui assure la relève si le worker qui la tient s'arrête.
+
+    Chaque cycle parcourt les entrées les plus demandées de chaque type et rafraîchit celles
+    qui manquent (cache vide après un déploiement) ou qui expirent bientôt, les plus urgentes
+    d'abord, avec PRECHAUFFAGE_CONCURRENCE rafraîchissements au plus et le débit de chaque API amont.
+    """
+
+    def __init__(self):
+        self.debits = {nom: Debit(d) for nom, d in lire_debits(PRECHAUFFAGE_DEBITS).items()}
+        self._fd_verrou = None
+        self._dernier_cycle = None
+        self.cycles = 0
+        self.rafraichies = 0
+        self.echecs = 0
+
+    def prendre_la_main(self):
+        """Vrai si ce processus est (ou devient) le préchauffeur de la machine."""
+        if self._fd_verrou is not None or fcntl is None:
+            return True
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd = os.open(FICHIER_VERROU, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Verrou gardé jusqu'à la fin du processus
+        self._fd_verrou = fd
+        return True
+
+    def a_rafraichir(self):
+        """Entrées à rafraîchir pour ce cycle : [(urgence, source, cle, params)], les plus urgentes d'abord."""
+        maintenant = time.time()
+        taches = []
+        # Copie : des modules peuvent encore enregistrer leurs sources pendant le premier cycle
+        for source in list(SOURCES.values()):
+            avance_s = max(PRECHAUFFAGE_AVANCE * source.cache.ttl_s, 2 * PRECHAUFFAGE_INTERVALLE_S)
+            for cle, params, score in plus_demandees(source.type, PRECHAUFFAGE_TOP):
+                expire = source.cache.expiration(cle)
+                if expire is None:
+                    # Absente : à recalculer en premier (préchauffage après déploiement)
+                    taches.append(((0, -score), source, cle, params))
+                elif expire - maintenant < avance_s:
+                    taches.append(((1, expire), source, cle, params))
+        taches.sort(key=lambda t: t[0])
+        return taches
+
+    def rafraichir(self, source, cle, params, indisponibles):
+        if source.amont in indisponibles or (
+            source.amont and amont.client(source.amont).disjoncteur.ouvert()
+        ):
+            prechauffages.ajouter((source.type, "ignore"))
+            return
+
+        debit = self.debits.get(source.amont)
+        if debit is not None:
+            debit.attendre()
+
+        try:
+            resultat = source.rafraichir(cle, *params)
+        except Exception as e:
+            # API en difficulté : on la laisse tranquille jusqu'au cycle suivant
+            if source.amont:
+                indisponibles.add(source.amont)
+            self.echecs += 1
+            prechauffages.ajouter((source.type, "echec"))
+            journal.warning("Préchauffage %s %s impossible : %s", source.type, cle, e)
+            return
+
+        if _en_erreur(resultat):
+            # Réponse {"error": True, ...} (aucune borne, pas d'itinéraire...) : rien n'a été réécrit.
+            # La clé sort du suivi, sinon une entrée absente serait redemandée à chaque cycle.
+            self.echecs += 1
+            prechauffages.ajouter((source.type, "echec"))
+            journal.info("Préchauffage %s %s sans résultat exploitable, clé oubliée", source.type, cle)
+            oublier(source.type, cle)
+            return
+
+        self.rafraichies += 1
+        prechauffages.ajouter((source.type, "ok"))
+
+    def cycle(self):
+        """Un passage complet : vieillissement des scores puis rafraîchissements."""
+        maintenant = time.monotonic()
+        if self._dernier_cycle is not None:
+            vieillir(maintenant - self._dernier_cycle)
+        self._dernier_cycle = maintenant
+
+        taches = self.a_rafraichir()
+        indisponibles = set()
+        with ThreadPoolExecutor(max_workers=PRECHAUFFAGE_CONCURRENCE) as executor:
+            for _, source, cle, params in taches:
+                executor.submit(self.rafraichir, source, cle, params, indisponibles)
+
+        self.cycles += 1
+        metriques.publier(forcer=True)
+        return len(taches)
+
+    def boucle(self, arret=None):
+        """Cycles jusqu'à arret.set() ; le premier part dès que ce processus prend la main."""
+        arret = arret or threading.Event()
+        while not arret.is_set():
+            if self.prendre_la_main():
+                try:
+                    self.cycle()
+                except Exception:
+                    journal.exception("Cycle de préchauffage interrompu")
+            arret.wait(PRECHAUFFAGE_INTERVALLE_S)
+
+    def stats(self):
+        return {
+            "actif": self._fd_verrou is not None or fcntl is None,
+            "cycles": self.cycles,
+            "rafraichies": self.rafraichies,
+            "echecs": self.echecs,
+        }
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Thread d'arrière-plan –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+prechauffeur = None
+_pid_thread = None
+_verrou_thread = threading.Lock()
+
+
+def demarrer():
+    """
+    Lance le thread de préchauffage du worker (une fois par processus, après le fork de gunicorn :
+    hook post_worker_init de gunicorn.conf.py, ou création de l'application hors gunicorn).
+    """
+    global prechauffeur, _pid_thread
+
+    if not PRECHAUFFAGE or _pid_thread == os.getpid():
+        return
+
+    with _verrou_thread:
+        if _pid_thread == os.getpid():
+            return
+        _pid_thread = os.getpid()
+        prechauffeur = Prechauffeur()
+        threading.Thread(target=prechauffeur.boucle, name="prechauffage", daemon=True).start()
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Processus séparé ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# python prechauffage.py : préchauffeur seul (mêmes variables d'environnement et même CACHE_DIR que
+# l'application), à utiliser avec PRECHAUFFAGE=0 côté gunicorn.
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    # L'import de l'application enregistre les types d'entrées et leurs fonctions de rafraîchissement
+    # (dans le module prechauffage, distinct de ce __main__). Il ne doit pas lancer en plus le
+    # thread de préchauffage : la boucle tourne ici, au premier plan.
+    os.environ["PRECHAUFFAGE"] = "0"
+    import app  # noqa: F401
+    import prechauffage
+
+    try:
+        prechauffage.Prechauffeur().boucle()
+    except KeyboardInterrupt:
+        pass
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,513 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import heapq
+import json
+import math
+import os
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import amont
+import metriques
+from geometrie import decoder_polyline, haversine_m, vers_geojson
+from irve_index import METRES_PAR_DEGRE
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# "ors" (défaut) : API OpenRouteService driving-car
+# "local" : graphe routier prétraité (voir convertir_osm), sans réseau
+ROUTAGE_BACKEND = os.getenv("ROUTAGE_BACKEND", "ors").lower()
+
+# Dossier du graphe local (fichiers .npy produits par convertir_osm)
+ROUTAGE_GRAPHE = os.getenv("ROUTAGE_GRAPHE", "graphe")
+
+# Distance maximale entre un point demandé et le nœud du graphe le plus proche
+ROUTAGE_ACCROCHE_MAX_M = float(os.getenv("ROUTAGE_ACCROCHE_MAX_M", "5000"))
+
+ORS_DIRECTIONS_URL = f"{amont.ORS_BASE_URL}/v2/directions/driving-car"
+ORS_MATRIX_URL = f"{amont.ORS_BASE_URL}/v2/matrix/driving-car"
+
+# Limites d'une requête matrice ORS (éléments = sources x destinations, lieux = sources + destinations)
+ORS_MATRIX_MAX_ELEMENTS = int(os.getenv("ORS_MATRIX_MAX_ELEMENTS", "3500"))
+ORS_MATRIX_MAX_LOCATIONS = int(os.getenv("ORS_MATRIX_MAX_LOCATIONS", "50"))
+ORS_MATRIX_EN_PARALLELE = int(os.getenv("ORS_MATRIX_EN_PARALLELE", "4"))
+
+# Conversion des maxspeed exprimés en miles par heure
+KM_PAR_MILLE = 1.609344
+
+# Grille de recherche du nœud le plus proche
+CELLULE_DEG = 0.01
+
+# Vitesses par défaut (km/h) des types de voies retenus lors de la conversion OSM
+VITESSES_KMH = {
+    "motorway": 120,
+    "motorway_link": 70,
+    "trunk": 100,
+    "trunk_link": 60,
+    "primary": 80,
+    "primary_link": 50,
+    "secondary": 70,
+    "secondary_link": 50,
+    "tertiary": 60,
+    "tertiary_link": 40,
+    "unclassified": 50,
+    "residential": 30,
+    "living_street": 10,
+    "service": 20,
+}
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Interface des backends ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class BackendRoutage:
+    """
+    Calcul d'itinéraire voiture passant par une liste de points [[lat, lon], ...].
+
+    itineraire(points) retourne {"distance_m", "duration_s", "geometry"} (LineString GeoJSON),
+    ou {"error": True, "message": ...} si aucun itinéraire n'est trouvé.
+    """
+
+    nom = None
+
+    def itineraire(self, points):
+        raise NotImplementedError
+
+    def matrice(self, sources, destinations):
+        """
+        Distances (m) et durées (s) de chaque source vers chaque destination, en deux tableaux
+        numpy (sources x destinations), NaN quand aucun itinéraire n'existe.
+        Par défaut un itinéraire par couple ; les backends qui savent mieux faire la redéfinissent.
+        """
+        distances = np.full((len(sources), len(destinations)), np.nan)
+        durees = np.full((len(sources), len(destinations)), np.nan)
+        for i, source in enumerate(sources):
+            for j, destination in enumerate(destinations):
+                resultat = self.itineraire([source, destination])
+                if not resultat.get("error"):
+                    distances[i, j] = resultat["distance_m"]
+                    durees[i, j] = resultat["duration_s"]
+        return distances, durees
+
+    def cle_cache(self, cle):
+        """Clé du cache des itinéraires : les résultats de deux backends ne se mélangent pas."""
+        return cle if self.nom == "ors" else f"{self.nom}|{cle}"
+
+
+class BackendORS(BackendRoutage):
+    """Itinéraires via l'API OpenRouteService (comportement historique)."""
+
+    nom = "ors"
+
+    def __init__(self, cle_api):
+        self.cle_api = cle_api
+
+    def itineraire(self, points):
+        body = {"coordinates": [[lon, lat] for lat, lon in points]}
+        headers = {
+            "Authorization": f"Bearer {self.cle_api}",
+            "Content-Type": "application/json",
+        }
+
+        r = amont.post("ors", ORS_DIRECTIONS_URL, json=body, headers=headers)
+        if r.status_code in (400, 404):
+            # Point non routable, trajet trop long... : ORS détaille la raison dans {"error": {...}}
+            try:
+                message = r.json()["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = f"ORS a refusé la demande (HTTP {r.status_code})."
+            return {"error": True, "message": message}
+        r.raise_for_status()
+        data = r.json()
+
+        if not data.get("routes"):
+            return {"error": True, "message": "ORS n’a retourné aucune route."}
+
+        route = data["routes"][0]
+        with metriques.chrono("decoder_polyline"):
+            latlngs = decoder_polyline(route["geometry"])
+        return {
+            "distance_m": route["summary"]["distance"],
+            "duration_s": route["summary"]["duration"],
+            # On reconvertit la chaîne pour pouvoir l'exploiter en Front-End.
+            "geometry": vers_geojson(latlngs),
+        }
+
+    def matrice(self, sources, destinations):
+        """
+        Matrice via l'endpoint /v2/matrix d'ORS, découpée en blocs qui respectent les limites
+        de l'API (ORS_MATRIX_MAX_ELEMENTS, ORS_MATRIX_MAX_LOCATIONS), envoyés en parallèle.
+        Lève une exception si un bloc échoue (erreur HTTP ou réseau).
+        """
+        n, m = len(sources), len(destinations)
+        distances = np.full((n, m), np.nan)
+        durees = np.full((n, m), np.nan)
+        if not n or not m:
+            return distances, durees
+
+        # Blocs équilibrés : au moins la moitié des lieux pour les destinations, plus s'il y a peu de sources
+        taille_dest = max(
+            1,
+            min(
+                m,
+                max(ORS_MATRIX_MAX_LOCATIONS // 2, ORS_MATRIX_MAX_LOCATIONS - n),
+                ORS_MATRIX_MAX_ELEMENTS,
+            ),
+        )
+        taille_src = max(
+            1,
+            min(n, ORS_MATRIX_MAX_LOCATIONS - taille_dest, ORS_MATRIX_MAX_ELEMENTS // taille_dest),
+        )
+        blocs = [
+            (i, j)
+            for i in range(0, n, taille_src)
+            for j in range(0, m, taille_dest)
+        ]
+
+        def bloc(debut):
+            i, j = debut
+            src = sources[i : i + taille_src]
+            dst = destinations[j : j + taille_dest]
+            body = {
+                "locations": [[lon, lat] for lat, lon in list(src) + list(dst)],
+                "sources": list(range(len(src))),
+                "destinations": list(range(len(src), len(src) + len(dst))),
+                "metrics": ["distance", "duration"],
+            }
+            headers = {
+                "Authorization": f"Bearer {self.cle_api}",
+                "Content-Type": "application/json",
+            }
+            r = amont.post("ors", ORS_MATRIX_URL, json=body, headers=headers)
+            r.raise_for_status()
+            data = r.json()
+            # null (aucun itinéraire) devient NaN
+            distances[i : i + len(src), j : j + len(dst)] = np.array(
+                data["distances"], dtype=float
+            )
+            durees[i : i + len(src), j : j + len(dst)] = np.array(data["durations"], dtype=float)
+
+        if len(blocs) == 1:
+            bloc(blocs[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(ORS_MATRIX_EN_PARALLELE, len(blocs))) as ex:
+                list(ex.map(bloc, blocs))
+
+        return distances, durees
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Graphe routier local ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class GrapheRoutier:
+    """
+    Graphe orienté au format CSR, chargé en memory-map (partagé entre workers par le cache disque) :
+    - noeuds.npy     (n, 2) float64 : [lat, lon] de chaque nœud
+    - offsets.npy    (n + 1) int64  : arcs sortants du nœud u = offsets[u] .. offsets[u + 1]
+    - cibles.npy     (m) int32      : nœud d'arrivée de chaque arc
+    - longueurs.npy  (m) float32    : longueur de l'arc (m)
+    - durees.npy     (m) float32    : durée de parcours de l'arc (s)
+    - meta.json                     : vitesse_max_kmh (heuristique A*)
+    """
+
+    def __init__(self, dossier):
+        def charger(nom):
+            return np.load(os.path.join(dossier, f"{nom}.npy"), mmap_mode="r")
+
+        self.noeuds = charger("noeuds")
+        self.offsets = charger("offsets")
+        self.cibles = charger("cibles")
+        self.longueurs = charger("longueurs")
+        self.durees = charger("durees")
+
+        with open(os.path.join(dossier, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        # Vitesse maximale du graphe : durée minimale possible pour une distance à vol d'oiseau
+        self.vitesse_max_ms = float(meta["vitesse_max_kmh"]) / 3.6
+
+        self._construire_grille()
+
+    # ––– Accroche des points au graphe –––
+    def _construire_grille(self):
+        i = np.floor(self.noeuds[:, 0] / CELLULE_DEG).astype(np.int64)
+        j = np.floor(self.noeuds[:, 1] / CELLULE_DEG).astype(np.int64)
+        cles = self._cle_cellule(i, j)
+
+        self._ordre = np.argsort(cles, kind="stable")
+        self._cles_triees = cles[self._ordre]
+
+    @staticmethod
+    def _cle_cellule(i, j):
+        return (i + 9000) * 40000 + (j + 18000)
+
+    def accrocher(self, lat, lon):
+        """Indice du nœud le plus proche de (lat, lon), ou None au-delà de ROUTAGE_ACCROCHE_MAX_M."""
+        i0 = math.floor(lat / CELLULE_DEG)
+        j0 = math.floor(lon / CELLULE_DEG)
+        # Largeur minimale d'une cellule (en longitude, elle rétrécit avec la latitude)
+        largeur_m = CELLULE_DEG * METRES_PAR_DEGRE * max(math.cos(math.radians(lat)), 0.01)
+
+        k = 0
+        while True:
+            di, dj = np.meshgrid(np.arange(-k, k + 1), np.arange(-k, k + 1))
+            cles = self._cle_cellule(i0 + di.ravel(), j0 + dj.ravel())
+            debuts = np.searchsorted(self._cles_triees, cles, side="left")
+            fins = np.searchsorted(self._cles_triees, cles, side="right")
+            candidats = np.concatenate(
+                [self._ordre[a:b] for a, b in zip(debuts, fins) if b > a] or [[]]
+            ).astype(np.int64)
+
+            if candidats.size:
+                coords = self.noeuds[candidats]
+                distances = haversine_m(lat, lon, coords[:, 0], coords[:, 1])
+                meilleur = int(np.argmin(distances))
+                # Aucun nœud hors du carré exploré ne peut être plus proche que k cellules
+                if distances[meilleur] <= k * largeur_m:
+                    if distances[meilleur] > ROUTAGE_ACCROCHE_MAX_M:
+                        return None
+                    return int(candidats[meilleur])
+
+            if k * largeur_m > ROUTAGE_ACCROCHE_MAX_M:
+                return None
+            k += 1
+
+    # ––– Plus court chemin –––
+    def plus_court_chemin(self, source, cible):
+        """
+        A* sur la durée de parcours, heuristique = distance à vol d'oiseau / vitesse maximale.
+        Retourne (liste des nœuds, distance_m, duree_s), ou None si la cible est inaccessible.
+        """
+        if source == cible:
+            return [source], 0.0, 0.0
+
+        lat_c, lon_c = (float(x) for x in self.noeuds[cible])
+        vitesse = self.vitesse_max_ms
+
+        duree = {source: 0.0}
+        longueur = {source: 0.0}
+        precedent = {source: -1}
+        fermes = set()
+        tas = [(0.0, 0.0, source)]
+
+        while tas:
+            _, g, u = heapq.heappop(tas)
+            if u == cible:
+                break
+            if u in fermes:
+                continue
+            fermes.add(u)
+
+            a, b = int(self.offsets[u]), int(self.offsets[u + 1])
+            if a == b:
+                continue
+
+            voisins = self.cibles[a:b]
+            coords = self.noeuds[voisins]
+            heuristiques = (
+                haversine_m(coords[:, 0], coords[:, 1], lat_c, lon_c) / vitesse
+            ).tolist()
+
+            for v, d, l, h in zip(
+                voisins.tolist(),
+                self.durees[a:b].tolist(),
+                self.longueurs[a:b].tolist(),
+                heuristiques,
+            ):
+                nouvelle = g + d
+                if nouvelle < duree.get(v, math.inf):
+                    duree[v] = nouvelle
+                    longueur[v] = longueur[u] + l
+                    precedent[v] = u
+                    heapq.heappush(tas, (nouvelle + h, nouvelle, v))
+        else:
+            return None
+
+        chemin = [cible]
+        while precedent[chemin[-1]] != -1:
+            chemin.append(precedent[chemin[-1]])
+        chemin.reverse()
+
+        return chemin, longueur[cible], duree[cible]
+
+
+class BackendLocal(BackendRoutage):
+    """Itinéraires calculés sur le graphe routier local, sans appel réseau."""
+
+    nom = "local"
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self._graphe = None
+        self._verrou = threading.Lock()
+
+    def graphe(self):
+        """Graphe chargé à la première utilisation (une seule fois par processus)."""
+        with self._verrou:
+            if self._graphe is None:
+                self._graphe = GrapheRoutier(self.dossier)
+            return self._graphe
+
+    def itineraire(self, points):
+        try:
+            graphe = self.graphe()
+        except (OSError, KeyError, ValueError) as e:
+            return {"error": True, "message": f"Graphe routier local indisponible : {e}"}
+
+        noeuds = []
+        for lat, lon in points:
+            noeud = graphe.accrocher(float(lat), float(lon))
+            if noeud is None:
+                return {"error": True, "message": "Point hors du graphe routier local."}
+            noeuds.append(noeud)
+
+        chemin_total = [noeuds[0]]
+        distance_m = duree_s = 0.0
+        for source, cible in zip(noeuds[:-1], noeuds[1:]):
+            resultat = graphe.plus_court_chemin(source, cible)
+            if resultat is None:
+                return {"error": True, "message": "Aucun itinéraire dans le graphe local."}
+
+            chemin, distance, duree = resultat
+            chemin_total.extend(chemin[1:])
+            distance_m += distance
+            duree_s += duree
+
+        # Une LineString a au moins deux points, même pour un trajet nul
+        if len(chemin_total) == 1:
+            chemin_total.append(chemin_total[0])
+
+        return {
+            "distance_m": round(distance_m, 1),
+            "duration_s": round(duree_s, 1),
+            "geometry": vers_geojson(graphe.noeuds[chemin_total]),
+        }
+
+
+def get_backend(cle_api_ors):
+    """Backend choisi par ROUTAGE_BACKEND."""
+    if ROUTAGE_BACKEND == "local":
+        return BackendLocal(ROUTAGE_GRAPHE)
+    return BackendORS(cle_api_ors)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Prétraitement d'un extrait OSM ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _vitesse_kmh(tags):
+    """
+    Vitesse d'une voie : maxspeed si lisible ("90", "90 km/h" ou "55 mph"),
+    sinon la valeur par défaut du type de voie.
+    """
+    maxspeed = tags.get("maxspeed", "").strip().lower()
+    facteur = 1.0
+    if maxspeed.endswith("mph"):
+        maxspeed, facteur = maxspeed[:-3], KM_PAR_MILLE
+    try:
+        return float(maxspeed.split()[0]) * facteur
+    except (IndexError, ValueError):
+        return VITESSES_KMH[tags["highway"]]
+
+
+def _sens(tags):
+    """(sens direct, sens inverse) autorisés sur une voie."""
+    oneway = tags.get("oneway", "")
+    if oneway == "-1":
+        return False, True
+    if oneway in ("yes", "1", "true"):
+        return True, False
+    if tags["highway"] == "motorway" or tags.get("junction") == "roundabout":
+        return oneway != "no", oneway == "no"
+    return True, True
+
+
+def convertir_osm(chemin_osm, dossier):
+    """
+    Convertit un extrait OSM XML (.osm) en graphe CSR (voir GrapheRoutier) dans dossier.
+    Seules les voies carrossables (VITESSES_KMH) sont conservées.
+    """
+    coords_osm = {}
+    aretes = []  # (id OSM départ, id OSM arrivée, vitesse km/h)
+
+    # Chaque élément de premier niveau est vidé puis détaché de la racine une fois lu :
+    # la mémoire reste bornée par coords_osm et aretes, pas par la taille de l'extrait.
+    contexte = ET.iterparse(chemin_osm, events=("start", "end"))
+    _, racine = next(contexte)
+    for evenement, elem in contexte:
+        if evenement != "end":
+            continue
+        if elem.tag == "node":
+            coords_osm[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+            racine.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if tags.get("highway") in VITESSES_KMH:
+                refs = [nd.get("ref") for nd in elem.iter("nd")]
+                vitesse = _vitesse_kmh(tags)
+                direct, inverse = _sens(tags)
+                for a, b in zip(refs[:-1], refs[1:]):
+                    if direct:
+                        aretes.append((a, b, vitesse))
+                    if inverse:
+                        aretes.append((b, a, vitesse))
+            elem.clear()
+            racine.clear()
+        elif elem.tag == "relation":
+            elem.clear()
+            racine.clear()
+
+    # Nœuds réellement utilisés par les voies, renumérotés de 0 à n - 1
+    aretes = [(a, b, v) for a, b, v in aretes if a in coords_osm and b in coords_osm]
+    indices = {}
+    for a, b, _ in aretes:
+        indices.setdefault(a, len(indices))
+        indices.setdefault(b, len(indices))
+
+    noeuds = np.array([coords_osm[ref] for ref in indices], dtype=np.float64).reshape(-1, 2)
+    sources = np.array([indices[a] for a, _, _ in aretes], dtype=np.int64)
+    cibles = np.array([indices[b] for _, b, _ in aretes], dtype=np.int64)
+    vitesses = np.array([v for _, _, v in aretes], dtype=np.float64)
+
+    longueurs = haversine_m(
+        noeuds[sources, 0], noeuds[sources, 1], noeuds[cibles, 0], noeuds[cibles, 1]
+    )
+    durees = longueurs / (vitesses / 3.6)
+
+    # Tri par nœud de départ -> format CSR
+    ordre = np.argsort(sources, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=len(noeuds)))))
+
+    os.makedirs(dossier, exist_ok=True)
+    np.save(os.path.join(dossier, "noeuds.npy"), noeuds)
+    np.save(os.path.join(dossier, "offsets.npy"), offsets.astype(np.int64))
+    np.save(os.path.join(dossier, "cibles.npy"), cibles[ordre].astype(np.int32))
+    np.save(os.path.join(dossier, "longueurs.npy"), longueurs[ordre].astype(np.float32))
+    np.save(os.path.join(dossier, "durees.npy"), durees[ordre].astype(np.float32))
+
+    with open(os.path.join(dossier, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "source": os.path.basename(chemin_osm),
+                "noeuds": len(noeuds),
+                "arcs": len(aretes),
+                "vitesse_max_kmh": float(vitesses.max()) if len(vitesses) else 1.0,
+            },
+            f,
+        )
+
+    return len(noeuds), len(aretes)
+
+
+if __name__ == "__main__":
+    # python routage.py extrait.osm graphe/
+    nb_noeuds, nb_arcs = convertir_osm(sys.argv[1], sys.argv[2])
+    print(f"{nb_noeuds} nœuds, {nb_arcs} arcs")
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -1,9 +1,12 @@
 # ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-from spyne import Application, rpc, ServiceBase, Float, Integer, ComplexModel
+import numpy as np
+from spyne import Application, rpc, ServiceBase, Float, Integer, ComplexModel, Array
+from spyne.error import ArgumentError
 from spyne.protocol.soap import Soap11
 from spyne.server.wsgi import WsgiApplication
-import requests
-import time
+from spyne.interface.wsdl import Wsdl11
+
+import metriques
 
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
@@ -24,128 +27,141 @@ class TrajetResult(ComplexModel):
     recharge_min_total = Float
 
 
-# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class TrajetDemande(ComplexModel):
+    """Paramètres d'un trajet, pour le calcul par lot (calcul_temps_trajet_lot)."""
 
+    distance_km = Float
+    autonomie_km = Float
+    temps_recharge_min = Float
+    nb_recharges = Integer
 
-# ––– Service SOAP ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-class TrajetService(ServiceBase):
-    """
-    Service SOAP exposant les méthodes métier
-    liées au calcul de trajet en véhicule électrique.
-    """
 
-    @rpc(Float, Float, Float, Integer, _returns=TrajetResult)
-    def calcul_temps_trajet(
-        ctx, distance_km, autonomie_km, temps_recharge_min, nb_recharges
-    ):
-        """
-        Calcule le temps total d'un trajet en tenant compte :
-        - de la distance à parcourir
-        - de l’autonomie du véhicule
-        - du temps moyen d’une recharge
-        - du nombre de recharges prévues
-        """
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
-        if autonomie_km <= 0:
-            raise ValueError("Autonomie invalide")
 
-        # La vitesse est définit en dure ici. Evolution possible : utilisé les données de temps de segments retournées par OpenRouteService
-        vitesse_moyenne = 100.0  # km/h
-        temps_conduite_h = distance_km / vitesse_moyenne
+# ––– Calcul métier –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Vitesse moyenne de conduite (km/h), commune au calcul unitaire et au calcul par matrice
+VITESSE_MOYENNE_KMH = 100.0
 
-        recharge_min_total = nb_recharges * temps_recharge_min
-        temps_recharge_h = recharge_min_total / 60.0
 
-        total_h = temps_conduite_h + temps_recharge_h
+def calculer_trajet(distance_km, autonomie_km, temps_recharge_min, nb_recharges):
+    """
+    Calcule le temps total d'un trajet en tenant compte :
+    - de la distance à parcourir
+    - de l’autonomie du véhicule
+    - du temps moyen d’une recharge
+    - du nombre de recharges prévues
 
-        return TrajetResult(
-            total_h=total_h,
-            nb_recharges=nb_recharges,
-            recharge_min_total=recharge_min_total,
-        )
+    Fonction pure, partagée par le service SOAP et les appels internes (sans XML).
+    """
 
+    if autonomie_km is None or autonomie_km <= 0:
+        raise ValueError("Autonomie invalide")
 
-# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+    # La vitesse est définit en dure ici. Evolution possible : utilisé les données de temps de segments retournées par OpenRouteService
+    vitesse_moyenne = VITESSE_MOYENNE_KMH
+    temps_conduite_h = distance_km / vitesse_moyenne
 
+    recharge_min_total = nb_recharges * temps_recharge_min
+    temps_recharge_h = recharge_min_total / 60.0
 
-# ––– Service SOAP ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-def get_stations_proche(latitude, longitude, rayon_m, max_rows=15):
-    """Récupère les bornes de recharge à proximité d’un point GPS en interrogeant l’API OpenDataSoft (bornes IRVE)."""
-    url = "https://odre.opendatasoft.com/api/records/1.0/search/"
-    params = {
-        "dataset": "bornes-irve",
-        "geofilter.distance": f"{latitude},{longitude},{rayon_m}",
-        "rows": max_rows,
-    }
+    total_h = temps_conduite_h + temps_recharge_h
 
-    try:
-        r = requests.get(url, params=params, timeout=5)
-        r.raise_for_status()
-        data = r.json()
+    return TrajetResult(
+        total_h=total_h,
+        nb_recharges=nb_recharges,
+        recharge_min_total=recharge_min_total,
+    )
 
-        if "records" not in data or not data["records"]:
-            return {"error": True, "message": "Aucune borne trouvée dans le rayon."}
 
-        stations = []
-        # Utilisation d'un set pour éviter les doublons
-        seen_coords = set()
+def calculer_trajets(
+    distance_km, autonomie_km, temps_recharge_min, nb_recharges=None, duree_conduite_h=None
+):
+    """
+    calculer_trajet appliqué d'un coup à un tableau de distances (matrice origines x destinations).
+    Sans nb_recharges, on le déduit de l'autonomie comme /calcul : ceil(distance / autonomie) - 1.
+    duree_conduite_h (durées réelles du routage, même forme) remplace l'estimation à
+    VITESSE_MOYENNE_KMH, pour que le total ne soit jamais plus court que la conduite seule.
+    Les distances NaN (pas d'itinéraire) donnent des résultats NaN.
+    Retourne un dict de tableaux : total_h, nb_recharges, recharge_min_total.
+    """
+    if autonomie_km is None or autonomie_km <= 0:
+        raise ValueError("Autonomie invalide")
 
-        for record in data["records"]:
-            fields = record.get("fields", {})
-            geometry = record.get("geometry", {})
+    distance_km = np.asarray(distance_km, dtype=float)
+    if nb_recharges is None:
+        nb_recharges = np.maximum(np.ceil(distance_km / autonomie_km) - 1, 0)
+    nb_recharges = np.where(np.isnan(distance_km), np.nan, nb_recharges)
 
-            coords = geometry.get("coordinates", [None, None])
-            lon, lat = coords[0], coords[1]
+    if duree_conduite_h is None:
+        duree_conduite_h = distance_km / VITESSE_MOYENNE_KMH
 
-            if lat is None or lon is None:
-                continue
+    recharge_min_total = nb_recharges * temps_recharge_min
+    total_h = np.asarray(duree_conduite_h, dtype=float) + recharge_min_total / 60.0
 
-            dist_raw = fields.get("dist")
-            if dist_raw is None:
-                continue
+    return {
+        "total_h": total_h,
+        "nb_recharges": nb_recharges,
+        "recharge_min_total": recharge_min_total,
+    }
 
-            try:
-                distance = float(dist_raw)
-            except:
-                continue
 
-            if distance > float(rayon_m):
-                continue
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
-            if (lat, lon) in seen_coords:
-                continue
-            seen_coords.add((lat, lon))
 
-            # NOUVELLES INFOS
-            acces = fields.get("acces_recharge")
-            puiss_max = fields.get("puiss_max")
+# ––– Service SOAP ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def calculer_trajet_soap(distance_km, autonomie_km, temps_recharge_min, nb_recharges, prefixe=""):
+    """
+    calculer_trajet pour les opérations SOAP : champ manquant ou valeur invalide -> Fault client
+    (Client.ArgumentError) qui nomme le problème, au lieu d'une erreur serveur opaque.
+    prefixe situe l'erreur dans un lot ("Demande 3 : ").
+    """
+    valeurs = {
+        "distance_km": distance_km,
+        "autonomie_km": autonomie_km,
+        "temps_recharge_min": temps_recharge_min,
+        "nb_recharges": nb_recharges,
+    }
+    manquants = [nom for nom, valeur in valeurs.items() if valeur is None]
+    if manquants:
+        raise ArgumentError(f"{prefixe}champ(s) manquant(s) : {', '.join(manquants)}")
 
-            # DEBUG CONSOLE
-            # print("----- BORNE IRVE -----")
-            # print("Station :", fields.get("ad_station") or fields.get("n_station"))
-            # print("Accès   :", acces)
-            # print("Puiss max :", puiss_max)
-            # print("----------------------")
+    try:
+        return calculer_trajet(distance_km, autonomie_km, temps_recharge_min, nb_recharges)
+    except ValueError as e:
+        raise ArgumentError(f"{prefixe}{e}")
 
-            station_info = {
-                "station": fields.get("ad_station") or fields.get("n_station"),
-                "acces_recharge": acces,
-                "puiss_max": puiss_max,
-                "latitude": lat,
-                "longitude": lon,
-                "distance_m": distance,
-            }
 
-            stations.append(station_info)
+class TrajetService(ServiceBase):
+    """
+    Service SOAP exposant les méthodes métier
+    liées au calcul de trajet en véhicule électrique.
+    """
 
-        return {
-            "error": False,
-            "count": len(stations),
-            "stations": sorted(stations, key=lambda x: x["distance_m"]),
-        }
+    @rpc(Float, Float, Float, Integer, _returns=TrajetResult)
+    def calcul_temps_trajet(
+        ctx, distance_km, autonomie_km, temps_recharge_min, nb_recharges
+    ):
+        """Calcule le temps total d'un trajet (voir calculer_trajet)."""
+        return calculer_trajet_soap(distance_km, autonomie_km, temps_recharge_min, nb_recharges)
 
-    except Exception as e:
-        return {"error": True, "message": str(e)}
+    @rpc(Array(TrajetDemande), _returns=Array(TrajetResult))
+    def calcul_temps_trajet_lot(ctx, demandes):
+        """
+        Calcule plusieurs trajets dans une seule enveloppe SOAP.
+        Une seule requête HTTP et un seul parsing XML pour tout le lot.
+        Une demande invalide fait échouer le lot avec un Fault client qui donne son indice.
+        """
+        return [
+            calculer_trajet_soap(
+                d.distance_km,
+                d.autonomie_km,
+                d.temps_recharge_min,
+                d.nb_recharges,
+                prefixe=f"Demande {i} : ",
+            )
+            for i, d in enumerate(demandes or [])
+        ]
 
 
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -160,8 +176,41 @@ application = Application(
     out_protocol=Soap11(),
 )
 
+# Même service sans revalidation lxml des enveloppes entrantes, réservé aux appelants de confiance
+# (services internes, traitements par lot) : le parsing reste fait par spyne, seule la validation
+# du schéma est sautée. Monté par app.py seulement avec SOAP_INTERNE_JETON, derrière ce jeton.
+application_interne = Application(
+    [TrajetService],
+    tns="spyne.trajet.service",
+    in_protocol=Soap11(validator=None),
+    out_protocol=Soap11(),
+)
+
 
 # Adaptation WSGI pour intégration dans Flask (fait éco au début du fichier app.py)
 wsgi_app = WsgiApplication(application)
+wsgi_app_interne = WsgiApplication(application_interne)
+
+
+def mesurer_operation(ctx):
+    """wsgi_close : durée de l'opération (lecture XML, appel, écriture de la réponse) dans /metrics."""
+    descripteur = getattr(ctx, "descriptor", None)
+    operation = descripteur.name if descripteur is not None else "inconnue"
+    issue = "erreur" if getattr(ctx, "out_error", None) is not None else "ok"
+    metriques.operations_soap.observer((operation, issue), ctx.call_end - ctx.call_start)
+
+
+for _wsgi in (wsgi_app, wsgi_app_interne):
+    _wsgi.event_manager.add_listener("wsgi_close", mesurer_operation)
+
+
+def document_wsdl(url):
+    """
+    WSDL du service généré localement, sans requête HTTP, avec url comme adresse du service.
+    Le contrat est celui du code déployé : le client zeep n'a plus besoin de télécharger ?wsdl.
+    """
+    wsdl = Wsdl11(application.interface)
+    wsdl.build_interface_document(url)
+    return wsdl.get_interface_document()
 
 # –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,19 @@
+# ––– Environnement des tests –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Les modules lisent leur configuration à l'import : tout est fixé ici, avant le premier import.
+# Cache dans un dossier temporaire, pas de thread de préchauffage, API amont injoignables
+# (port 9 fermé : échec immédiat, aucun appel réseau réel).
+import os
+import tempfile
+
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="etrs013_tests_")
+os.environ["PRECHAUFFAGE"] = "0"
+os.environ.setdefault("secret_flask", "tests")
+os.environ.setdefault("ORS_API_KEY", "tests")
+os.environ.setdefault("CHARGETRIP_CLIENT_ID", "tests")
+os.environ.setdefault("CHARGETRIP_APP_ID", "tests")
+os.environ["CHARGETRIP_URL"] = "http://127.0.0.1:9/chargetrip"
+os.environ["ORS_BASE_URL"] = "http://127.0.0.1:9/ors"
+os.environ["OPENDATASOFT_BASE_URL"] = "http://127.0.0.1:9/opendatasoft"
+os.environ.pop("IRVE_DATASET", None)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,86 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import amont
+from amont import CircuitOuvert, ClientAmont
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Serveur amont local –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class _Amont(BaseHTTPRequestHandler):
+    """/lent : répond après 3 s ; /503 : toujours indisponible ; sinon 200."""
+
+    appels = {}
+
+    def do_GET(self):
+        _Amont.appels[self.path] = _Amont.appels.get(self.path, 0) + 1
+        if self.path == "/lent":
+            time.sleep(3)
+        statut = 503 if self.path == "/503" else 200
+        self.send_response(statut)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def url():
+    serveur = ThreadingHTTPServer(("127.0.0.1", 0), _Amont)
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{serveur.server_address[1]}"
+    serveur.shutdown()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(amont, "BACKOFF_BASE_S", 0.01)
+    monkeypatch.setattr(amont, "TENTATIVE_MIN_S", 0.1)
+    _Amont.appels.clear()
+    client = ClientAmont("tests")
+    client.config = {"connect_timeout": 1.0, "read_timeout": 10.0, "retries": 3, "budget": 1.0}
+    return client
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Tentatives et budget ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_reponse_directe(client, url):
+    assert client.requete("GET", f"{url}/ok").status_code == 200
+
+
+def test_timeouts_plafonnes_par_le_budget(client, url):
+    # read_timeout de 10 s, mais le budget de 1 s s'impose à chaque tentative
+    debut = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.requete("GET", f"{url}/lent")
+    assert time.monotonic() - debut < 1.5
+
+
+def test_nouvelles_tentatives_sur_503(client, url):
+    r = client.requete("GET", f"{url}/503")
+    assert r.status_code == 503
+    assert _Amont.appels["/503"] == 4
+
+
+def test_disjoncteur_ouvert_apres_des_echecs(client, url, monkeypatch):
+    monkeypatch.setattr(amont, "DISJONCTEUR_ECHECS", 2)
+    # Le circuit s'ouvre dès le deuxième échec : les tentatives restantes ne partent pas
+    with pytest.raises(CircuitOuvert):
+        client.requete("GET", f"{url}/503")
+    assert _Amont.appels["/503"] == 2
+
+    assert client.disjoncteur.ouvert()
+    with pytest.raises(CircuitOuvert):
+        client.requete("GET", f"{url}/ok")
+    assert "/ok" not in _Amont.appels
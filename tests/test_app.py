@@ -0,0 +1,124 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import pytest
+
+import irve_index
+from app import app
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Index IRVE local de test ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+EXPORT = """ad_station;acces_recharge;puiss_max;geo_point_borne
+Grenoble Gare;Accès libre;22;45.1915, 5.7146
+Grenoble Gare;Accès libre;50;45.1915, 5.7146
+Échirolles;Accès libre;0;45.1450, 5.7200
+Voreppe;Réservé;150;45.2950, 5.6350
+"""
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def index_local(tmp_path, monkeypatch):
+    chemin = tmp_path / "irve.csv"
+    chemin.write_text(EXPORT, encoding="utf-8")
+    monkeypatch.setattr(irve_index, "IRVE_DATASET", str(chemin))
+    monkeypatch.setattr(irve_index, "_index", None)
+    monkeypatch.setattr(irve_index, "_signature", None)
+    return irve_index.get_index()
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– /station ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.mark.parametrize("rayon", ["-1", "0", "abc", "nan", "inf", "1e9"])
+def test_station_rayon_invalide(client, rayon):
+    reponse = client.get(f"/station?lat=45.19&lon=5.71&rayon={rayon}")
+    assert reponse.status_code == 400
+    assert reponse.get_json()["error"] is True
+
+
+def test_station_index_local(client, index_local):
+    data = client.get("/station?lat=45.19&lon=5.71&rayon=1000").get_json()
+    assert [s["station"] for s in data["stations"]] == ["Grenoble Gare"]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– /stations/tiles –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_tiles_sans_index_local(client):
+    assert client.get("/stations/tiles?bbox=5.6,45.1,5.8,45.3&zoom=10").status_code == 503
+
+
+def test_tiles_etag_304(client, index_local):
+    reponse = client.get("/stations/tiles?bbox=5.6,45.1,5.8,45.3&zoom=8")
+    assert reponse.status_code == 200
+    assert sum(g["count"] for t in reponse.get_json()["tuiles"] for g in t["groupes"]) == 3
+
+    reponse = client.get(
+        "/stations/tiles?bbox=5.6,45.1,5.8,45.3&zoom=8",
+        headers={"If-None-Match": reponse.headers["ETag"]},
+    )
+    assert reponse.status_code == 304
+
+
+@pytest.mark.parametrize(
+    "parametres",
+    [
+        "bbox=a&zoom=3",
+        "bbox=5,45,6,nan&zoom=3",
+        "bbox=6,45,5,46&zoom=3",
+        "bbox=-180,-85,180,85&zoom=16",
+    ],
+)
+def test_tiles_requete_invalide(client, index_local, parametres):
+    assert client.get(f"/stations/tiles?{parametres}").status_code == 400
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– /stations/corridor ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_corridor_geometrie(client, index_local):
+    geometrie = {
+        "type": "LineString",
+        "coordinates": [[5.72, 45.10], [5.71, 45.20], [5.63, 45.30]],
+    }
+    corps = {"geometry": geometrie, "largeur_m": 1500}
+    data = client.post("/stations/corridor", json=corps).get_json()
+
+    assert data["error"] is False
+    assert [s["station"] for s in data["stations"]] == ["Échirolles", "Grenoble Gare", "Voreppe"]
+
+
+@pytest.mark.parametrize(
+    "corps",
+    [
+        {},
+        {"polyline": "_p~iF~ps|U", "largeur_m": 0},
+        {"polyline": "_p~iF~ps|U", "largeur_m": 1e6},
+        # ~9 000 km : au-delà de COULOIR_LONGUEUR_MAX_M
+        {
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[-9.0, 38.7], [21.0, 52.2], [-9.0, 38.8], [21.0, 52.1]],
+            }
+        },
+    ],
+)
+def test_corridor_requete_invalide(client, index_local, corps):
+    assert client.post("/stations/corridor", json=corps).status_code == 400
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– /vehicules ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.mark.parametrize("parametres", ["page=-1", "size=0", "page=abc"])
+def test_vehicules_pagination_invalide(client, parametres):
+    assert client.get(f"/vehicules?{parametres}").status_code == 400
@@ -0,0 +1,32 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import time
+
+from cache import CachePersistant
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Cache à deux niveaux ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_set_get_memoire_puis_disque():
+    cache = CachePersistant("tests_niveaux", ttl_s=60, taille_memoire=1)
+    cache.set("a", {"valeur": 1})
+    cache.set("b", [1, 2])
+
+    # "a" a quitté le LRU mémoire (taille 1) mais reste sur disque
+    assert cache.get("b") == [1, 2]
+    assert cache.get("a") == {"valeur": 1}
+    assert cache.get("absente") is None
+
+    stats = cache.stats()
+    assert (stats["hits_memoire"], stats["hits_disque"], stats["misses"]) == (1, 1, 1)
+
+
+def test_expiration():
+    cache = CachePersistant("tests_ttl", ttl_s=60)
+    avant = time.time()
+    cache.set("longue", 1)
+    cache.set("courte", 2, ttl_s=-1)
+
+    assert cache.expiration("longue") >= avant + 60
+    assert cache.expiration("courte") is None
+    assert cache.get("courte") is None
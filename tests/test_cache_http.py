@@ -0,0 +1,94 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import gzip
+
+import pytest
+from flask import Flask, jsonify, request
+
+import prechauffage
+from cache import connexion
+from cache_http import cache_reponses, memoriser_variante, ne_pas_garder, reponse_en_cache
+from transport import compresser
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Application de test –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    appels = []
+
+    @app.route("/donnees")
+    @reponse_en_cache(60)
+    def donnees():
+        appels.append(request.args.get("q"))
+        prechauffage.noter("tests_http", request.args.get("q", ""), [])
+        return jsonify({"q": request.args.get("q"), "bourrage": "x" * 2000})
+
+    @app.route("/erreur")
+    @reponse_en_cache(60)
+    def erreur():
+        appels.append("erreur")
+        ne_pas_garder()
+        return jsonify({"error": True, "message": "Aucune borne"})
+
+    app.after_request(compresser)
+    app.after_request(memoriser_variante)
+
+    with cache_reponses._verrou:
+        cache_reponses._entrees.clear()
+        cache_reponses.octets = 0
+
+    client = app.test_client()
+    client.appels = appels
+    return client
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– ETag et réponses gardées ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_vue_executee_une_fois_par_cle(client):
+    premiere = client.get("/donnees?q=a")
+    seconde = client.get("/donnees?q=a")
+    client.get("/donnees?q=b")
+
+    assert premiere.get_data() == seconde.get_data()
+    assert client.appels == ["a", "b"]
+    assert premiere.headers["Cache-Control"] == "public, max-age=60"
+
+
+def test_if_none_match_304(client):
+    etag = client.get("/donnees?q=a").headers["ETag"]
+    assert etag.startswith('W/"')
+
+    reponse = client.get("/donnees?q=a", headers={"If-None-Match": etag})
+    assert reponse.status_code == 304
+    assert reponse.get_data() == b""
+    assert reponse.headers["ETag"] == etag
+
+
+def test_variante_compressee_gardee(client):
+    client.get("/donnees?q=a", headers={"Accept-Encoding": "gzip"})
+    reponse = client.get("/donnees?q=a", headers={"Accept-Encoding": "gzip"})
+
+    assert reponse.headers["Content-Encoding"] == "gzip"
+    assert b'"q":"a"' in gzip.decompress(reponse.get_data())
+    assert client.appels == ["a"]
+
+
+def test_ne_pas_garder(client):
+    client.get("/erreur")
+    client.get("/erreur")
+    assert client.appels == ["erreur", "erreur"]
+
+
+def test_popularite_rejouee_sur_un_hit(client):
+    prechauffage.vider()
+    prechauffage._table(connexion()).execute("DELETE FROM popularite")
+
+    for _ in range(3):
+        client.get("/donnees?q=a")
+    prechauffage.vider()
+
+    assert prechauffage.plus_demandees("tests_http", 10) == [("a", [], 3)]
@@ -0,0 +1,86 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import pytest
+
+from catalogue_vehicules import CatalogueVehicules, _tranche, libelle, normaliser_texte
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Outils ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_tranche():
+    liste = list(range(10))
+    assert _tranche(liste, 0, 4) == [0, 1, 2, 3]
+    assert _tranche(liste, 2, 4) == [8, 9]
+    assert _tranche(liste, 3, 4) == []
+
+
+def test_tranche_page_ou_taille_negative():
+    liste = list(range(10))
+    assert _tranche(liste, -1, 4) == [0, 1, 2, 3]
+    assert _tranche(liste, 0, -5) == []
+
+
+def test_normaliser_texte_et_libelle():
+    assert normaliser_texte("  Škoda   ÉNYAQ ") == "skoda enyaq"
+    assert libelle({"naming": {"make": "Tesla", "model": "Model 3", "version": None}}) == "Tesla Model 3"
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Miroir local ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+VEHICULES = [
+    {"id": "1", "naming": {"make": "Renault", "model": "Zoé", "version": "R135"}},
+    {"id": "2", "naming": {"make": "Renault", "model": "Mégane E-Tech", "version": "EV60"}},
+    {"id": "3", "naming": {"make": "Tesla", "model": "Model 3", "version": "Long Range"}},
+]
+
+
+def _charger_page(vehicules):
+    def charger_page(page, size):
+        return {"data": {"vehicleList": vehicules[page * size : (page + 1) * size]}}
+
+    return charger_page
+
+
+@pytest.fixture
+def catalogue():
+    catalogue = CatalogueVehicules(_charger_page(VEHICULES))
+    conn = catalogue._conn()
+    conn.execute("DELETE FROM catalogue_vehicules")
+    conn.execute("DELETE FROM catalogue_meta")
+    catalogue.rafraichir(conn)
+    catalogue._charger_memoire(conn)
+    return catalogue
+
+
+def test_catalogue_page_dans_l_ordre_de_chargetrip(catalogue):
+    assert [v["id"] for v in catalogue.page(0, 2)] == ["1", "2"]
+    assert [v["id"] for v in catalogue.page(1, 2)] == ["3"]
+    assert catalogue.vehicule(3)["naming"]["make"] == "Tesla"
+    assert catalogue.vehicule("inconnu") is None
+
+
+def test_catalogue_recherche(catalogue):
+    assert [v["id"] for v in catalogue.rechercher("renault")] == ["1", "2"]
+    assert [v["id"] for v in catalogue.rechercher("megane etech")] == []
+    assert [v["id"] for v in catalogue.rechercher("MEGANE e-tech")] == ["2"]
+    assert [v["id"] for v in catalogue.rechercher("zoe")] == ["1"]
+    assert [v["id"] for v in catalogue.rechercher("", page=0, size=1)] == ["1"]
+
+
+def test_catalogue_rafraichissement_incremental(catalogue):
+    conn = catalogue._conn()
+    version = catalogue.version
+
+    # Rien n'a changé : la version reste la même
+    catalogue.rafraichir(conn)
+    catalogue._charger_memoire(conn)
+    assert catalogue.version == version
+
+    # Un véhicule retiré : nouvelle version, rechargée en mémoire
+    catalogue.charger_page = _charger_page(VEHICULES[:2])
+    catalogue.rafraichir(conn)
+    catalogue._charger_memoire(conn)
+    assert catalogue.version != version
+    assert catalogue.vehicule("3") is None
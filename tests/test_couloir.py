@@ -0,0 +1,59 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import numpy as np
+import pytest
+
+import couloir
+from couloir import CouloirTropGrand, stations_couloir, tuiles_rectangles
+from irve_index import IndexIRVE
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Tuiles de l'API –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_tuiles_rectangles():
+    assert tuiles_rectangles([(45.05, 5.05, 45.15, 5.15)]) == {(225, 25)}
+    assert len(tuiles_rectangles([(45.05, 5.05, 45.25, 5.25)])) == 4
+
+
+def test_tuiles_rectangles_au_dela_du_maximum():
+    assert tuiles_rectangles([(40.0, 0.0, 50.0, 10.0)], maximum=600) is None
+    # Le budget vaut pour l'ensemble des rectangles, pas pour chacun
+    petits = [(45.0 + k, 5.05, 45.1 + k, 5.15) for k in range(5)]
+    assert tuiles_rectangles(petits, maximum=4) is None
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Couloir sur l'index local –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.fixture
+def index(monkeypatch):
+    stations = [
+        (45.5, 5.0, "Sur l'axe", "Public", 50.0),
+        (45.5, 5.0 + 1000 / 78000, "À 1 km", "Public", 22.0),
+        (45.5, 5.5, "Hors couloir", "Public", 22.0),
+        (45.2, 5.0, "Avant", "Public", 22.0),
+    ]
+    index = IndexIRVE(stations, source="tests")
+    monkeypatch.setattr(couloir, "get_index", lambda: index)
+    return index
+
+
+def test_stations_couloir_triees_par_position(index):
+    ligne = np.column_stack((np.linspace(45.0, 46.0, 50), np.full(50, 5.0)))
+    stations = stations_couloir(ligne, 2000)
+
+    assert [s["station"] for s in stations] == ["Avant", "Sur l'axe", "À 1 km"]
+    assert stations[1]["ecart_m"] == pytest.approx(0, abs=1)
+    assert stations[2]["ecart_m"] == pytest.approx(1000, rel=5e-2)
+
+
+def test_stations_couloir_itineraire_trop_long(index):
+    with pytest.raises(CouloirTropGrand):
+        stations_couloir([[36.0, -9.0], [60.0, 30.0], [36.0, -8.0]], 2000)
+
+
+def test_stations_couloir_au_dela_du_budget_de_cellules(index, monkeypatch):
+    monkeypatch.setattr(couloir, "COULOIR_CELLULES_MAX", 10)
+    with pytest.raises(CouloirTropGrand):
+        stations_couloir([[45.0, 5.0], [46.0, 5.0]], 20000)
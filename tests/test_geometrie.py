@@ -0,0 +1,96 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import numpy as np
+import pytest
+
+from geometrie import (
+    decoder_polyline,
+    decouper_couloir,
+    depuis_geojson,
+    distances_couloir,
+    distances_cumulees_m,
+    encoder_polyline,
+    haversine_m,
+    simplifier_budget,
+    vers_geojson,
+)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Polylignes encodées –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Exemple de la documentation de l'algorithme (Google Encoded Polyline)
+POLYLINE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+POINTS = [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+
+
+def test_decoder_polyline_exemple_de_reference():
+    np.testing.assert_allclose(decoder_polyline(POLYLINE), POINTS)
+
+
+def test_encoder_polyline_exemple_de_reference():
+    assert encoder_polyline(np.array(POINTS)) == POLYLINE
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_aller_retour_polyline(precision):
+    rng = np.random.default_rng(0)
+    pts = np.round(rng.uniform([42, -5], [51, 8], size=(200, 2)), precision)
+    np.testing.assert_allclose(
+        decoder_polyline(encoder_polyline(pts, precision), precision), pts, atol=10**-precision
+    )
+
+
+def test_geojson_inverse_lat_lon():
+    geometrie = vers_geojson(np.array(POINTS))
+    assert geometrie["coordinates"][0] == [-120.2, 38.5]
+    np.testing.assert_allclose(depuis_geojson(geometrie), POINTS)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Distances et simplification –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_haversine_un_degre_de_latitude():
+    assert haversine_m(45.0, 5.0, 46.0, 5.0) == pytest.approx(111195, rel=1e-3)
+
+
+def test_distances_cumulees():
+    cumul = distances_cumulees_m(np.array([[45.0, 5.0], [45.5, 5.0], [46.0, 5.0]]))
+    assert cumul[0] == 0
+    assert cumul[-1] == pytest.approx(2 * cumul[1])
+
+
+def test_simplifier_budget_garde_les_extremites():
+    lat = np.linspace(45, 46, 5000)
+    pts = np.column_stack((lat, 5 + 0.01 * np.sin(lat * 50)))
+    simplifie = simplifier_budget(pts, 100)
+    assert 2 <= len(simplifie) <= 100
+    np.testing.assert_array_equal(simplifie[0], pts[0])
+    np.testing.assert_array_equal(simplifie[-1], pts[-1])
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Couloir –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_decouper_couloir_redecoupe_les_longs_segments():
+    # Deux sommets à ~1 300 km : sans redécoupage, un seul rectangle de plusieurs degrés
+    morceaux = decouper_couloir(np.array([[43.3, -1.5], [50.6, 7.7]]), 2000)
+    assert len(morceaux) > 1
+    for sommets, cumul, (lat_min, lon_min, lat_max, lon_max) in morceaux:
+        assert lat_max - lat_min < 0.5
+        assert lon_max - lon_min < 0.5
+        assert np.all(np.diff(cumul) <= 2000 + 1e-6)
+
+
+def test_distances_couloir_position_et_ecart():
+    ligne = np.column_stack((np.linspace(45, 46, 50), np.full(50, 5.0)))
+    morceaux = decouper_couloir(ligne, 2000)
+    # Un point à ~1 km à l'est du milieu, un autre très loin
+    position, ecart = distances_couloir(morceaux, [[45.5, 5.0 + 1000 / 78000], [45.5, 7.0]])
+    assert position[0] == pytest.approx(55597, rel=1e-2)
+    assert ecart[0] == pytest.approx(1000, rel=5e-2)
+    assert np.isinf(ecart[1])
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
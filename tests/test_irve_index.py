@@ -0,0 +1,79 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import time
+
+import numpy as np
+import pytest
+
+from irve_index import RAYON_MAX_M, IndexIRVE, haversine_m
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Index de test –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _stations(nombre=2000, graine=0):
+    """Bornes aléatoires autour de Grenoble (lat, lon, station, acces_recharge, puiss_max)."""
+    rng = np.random.default_rng(graine)
+    lat = rng.uniform(44.5, 46.0, nombre)
+    lon = rng.uniform(5.0, 6.5, nombre)
+    return [(float(a), float(o), f"B{k}", "Public", 22.0) for k, (a, o) in enumerate(zip(lat, lon))]
+
+
+@pytest.fixture(scope="module")
+def stations():
+    return _stations()
+
+
+@pytest.fixture(scope="module")
+def index(stations):
+    return IndexIRVE(stations, source="tests", version="v1")
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Recherche par rayon –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.mark.parametrize("rayon", [500, 5000, 20000])
+def test_rechercher_identique_a_la_force_brute(index, stations, rayon):
+    lat, lon = 45.19, 5.72
+    attendues = sorted(
+        (haversine_m(lat, lon, s[0], s[1]), s[2]) for s in stations
+        if haversine_m(lat, lon, s[0], s[1]) <= rayon
+    )[:15]
+
+    trouvees = index.rechercher(lat, lon, rayon)
+    assert [s["station"] for s in trouvees] == [nom for _, nom in attendues]
+    assert all(s["distance_m"] <= rayon for s in trouvees)
+
+
+def test_rechercher_dedoublonne_par_coordonnees():
+    index = IndexIRVE([(45.0, 5.0, "A", "Public", 22.0), (45.0, 5.0, "A", "Public", 50.0)])
+    assert len(index.rechercher(45.0, 5.0, 100)) == 1
+
+
+def test_rechercher_plafonne_le_rayon(index):
+    # Un rayon de la taille de la Terre reste plafonné à RAYON_MAX_M
+    trouvees = index.rechercher(45.19, 5.72, 2e7, max_rows=10000)
+    assert trouvees
+    assert max(s["distance_m"] for s in trouvees) <= RAYON_MAX_M
+
+
+@pytest.mark.parametrize("latitude", [45.0, 89.99, -89.99])
+def test_rechercher_grand_rayon_reste_rapide(index, latitude):
+    debut = time.perf_counter()
+    index.rechercher(latitude, 5.0, 2e7)
+    assert time.perf_counter() - debut < 1.0
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Rectangles (couloirs) –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_dans_rectangles_prefiltre(index, stations):
+    rectangle = (45.0, 5.5, 45.2, 5.8)
+    attendues = {s for s in stations if 45.0 <= s[0] <= 45.2 and 5.5 <= s[1] <= 5.8}
+    assert attendues <= set(index.dans_rectangles([rectangle]))
+
+
+def test_dans_rectangles_au_dela_du_maximum(index):
+    assert index.dans_rectangles([(40.0, 0.0, 50.0, 10.0)], maximum=100) is None
+    assert index.dans_rectangles([(45.0, 5.5, 45.1, 5.6)], maximum=100) is not None
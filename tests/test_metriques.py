@@ -0,0 +1,52 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import os
+
+import pytest
+from flask import Flask
+
+import metriques
+from metriques import Compteur, Histogramme
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Compteurs et histogrammes –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_compteur():
+    compteur = Compteur("tests_total", "Compteur de test", ("issue",))
+    compteur.ajouter(("ok",))
+    compteur.ajouter(("ok",), 2)
+    compteur.ajouter(("echec",))
+    assert sorted(compteur.instantane()) == [[["echec"], 1], [["ok"], 3]]
+
+
+def test_histogramme():
+    histogramme = Histogramme("tests_seconds", "Histogramme de test", ("route",), bornes=(0.1, 1.0))
+    for duree in (0.05, 0.5, 0.5, 5.0):
+        histogramme.observer(("/x",), duree)
+
+    (etiquettes, (effectifs, somme, nombre)), = histogramme.instantane()
+    assert etiquettes == ["/x"]
+    assert effectifs == [1, 2, 1]
+    assert somme == pytest.approx(6.05)
+    assert nombre == 4
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Publication –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_fin_requete_n_ecrit_pas_sur_disque(monkeypatch, tmp_path):
+    monkeypatch.setattr(metriques, "DOSSIER_METRIQUES", str(tmp_path))
+    app = Flask(__name__)
+    app.before_request(metriques.debut_requete)
+    app.after_request(metriques.fin_requete)
+    app.add_url_rule("/ping", "ping", lambda: "pong")
+
+    assert app.test_client().get("/ping").status_code == 200
+    assert os.listdir(tmp_path) == []
+
+
+def test_publier_ecrit_l_instantane_du_worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(metriques, "DOSSIER_METRIQUES", str(tmp_path))
+    metriques.publier(forcer=True)
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
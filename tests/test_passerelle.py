@@ -0,0 +1,48 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import threading
+import time
+
+import pytest
+
+import passerelle
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Appels groupés ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.fixture(params=[False, True], ids=["sync", "threaded"])
+def mode_threads(request, monkeypatch):
+    monkeypatch.setattr(passerelle, "MODE_THREADS", request.param)
+    return request.param
+
+
+def test_executer_garde_l_ordre(mode_threads):
+    def lente(duree, valeur):
+        time.sleep(duree)
+        return valeur
+
+    resultats = passerelle.executer((lente, 0.05, "a"), (lente, 0.0, "b"), (str.upper, "c"))
+    assert resultats == ["a", "b", "C"]
+
+
+def test_executer_propage_l_exception(mode_threads):
+    def en_panne():
+        raise ValueError("amont")
+
+    with pytest.raises(ValueError):
+        passerelle.executer((str, 1), (en_panne,))
+
+
+def test_mode_threaded_en_parallele(monkeypatch):
+    monkeypatch.setattr(passerelle, "MODE_THREADS", True)
+    barriere = threading.Barrier(3, timeout=2)
+
+    # Trois appels qui s'attendent : ils ne se terminent que s'ils tournent ensemble
+    assert passerelle.executer(*[(barriere.wait,)] * 3) is not None
+
+
+def test_en_arriere_plan_sans_effet_en_mode_sync(monkeypatch):
+    monkeypatch.setattr(passerelle, "MODE_THREADS", False)
+    appels = []
+    passerelle.en_arriere_plan(appels.append, 1)
+    assert appels == []
@@ -0,0 +1,138 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import math
+import warnings
+
+import numpy as np
+import pytest
+
+from geometrie import haversine_m
+from planification import (
+    PUISSANCE_DEFAUT_KW,
+    PUISSANCE_MAX_KW,
+    choisir_bornes,
+    choisir_bornes_optimal,
+    puissance_borne,
+    recherche_couloir,
+    temps_recharge_min,
+)
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Puissance des bornes ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.mark.parametrize("puiss_max", [None, "", "abc", 0, 0.0, -7, math.nan, math.inf])
+def test_puissance_borne_invalide_vaut_la_valeur_par_defaut(puiss_max):
+    assert puissance_borne(puiss_max) == PUISSANCE_DEFAUT_KW
+
+
+def test_puissance_borne_plafonnee():
+    assert puissance_borne("50") == 50.0
+    assert puissance_borne(350) == PUISSANCE_MAX_KW
+
+
+def test_temps_recharge_fini_pour_une_borne_a_zero_kw():
+    assert temps_recharge_min(60, 0.2, puissance_borne(0)) == round(60 * 0.6 / PUISSANCE_DEFAUT_KW * 60)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Itinéraire de test : ligne droite de ~220 km vers le nord –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+LIGNE = np.column_stack((np.linspace(45.0, 47.0, 201), np.full(201, 5.0)))
+LONGUEUR_M = float(haversine_m(45.0, 5.0, 47.0, 5.0))
+
+
+def _bornes_couloir(puissances):
+    """Une borne tous les ~20 km sur l'itinéraire, au format de couloir.stations_couloir."""
+    bornes = []
+    for k, puiss_max in enumerate(puissances, start=1):
+        lat = 45.0 + 2.0 * k / (len(puissances) + 1)
+        bornes.append(
+            {
+                "station": f"B{k}",
+                "acces_recharge": "Public",
+                "puiss_max": puiss_max,
+                "latitude": lat,
+                "longitude": 5.0,
+                "position_m": float(haversine_m(45.0, 5.0, lat, 5.0)),
+                "ecart_m": 0.0,
+            }
+        )
+    return bornes
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Planification optimale ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_optimal_trajet_court_sans_arret():
+    assert choisir_bornes_optimal(LIGNE, 7200, 500, 60, 0.2, lambda pts, largeur: []) == []
+
+
+def test_optimal_sans_solution():
+    assert choisir_bornes_optimal(LIGNE, 7200, 100, 60, 0.2, lambda pts, largeur: []) is None
+
+
+def test_optimal_arrive_sous_contrainte_d_autonomie():
+    bornes = _bornes_couloir([50.0] * 10)
+    arrets = choisir_bornes_optimal(LIGNE, 7200, 100, 60, 0.2, lambda pts, largeur: bornes)
+
+    assert arrets
+    positions = [0.0] + [haversine_m(45.0, 5.0, a["latitude"], 5.0) for a in arrets] + [LONGUEUR_M]
+    # Départ à 100 %, puis 80 % après chaque recharge, jamais sous le seuil de 20 %
+    assert positions[1] <= 0.8 * 100000 + 1
+    assert max(np.diff(positions[1:])) <= 0.6 * 100000 + 1
+
+
+def test_optimal_prefere_les_bornes_puissantes():
+    bornes = _bornes_couloir([22.0, 150.0] * 5)
+    arrets = choisir_bornes_optimal(LIGNE, 7200, 100, 60, 0.2, lambda pts, largeur: bornes)
+    assert all(a["puissance_kw"] == 150.0 for a in arrets)
+
+
+def test_optimal_ecarte_les_bornes_a_zero_kw():
+    bornes = _bornes_couloir([0, 0.0, 50.0, -3, 50.0, 0, 50.0, 0, 50.0, 0])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        arrets = choisir_bornes_optimal(LIGNE, 7200, 100, 60, 0.2, lambda pts, largeur: bornes)
+
+    assert arrets
+    assert all(a["puissance_kw"] == 50.0 for a in arrets)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Planification gloutonne –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _par_point(bornes):
+    """chercher_lot de référence : une recherche par rayon pour chaque sommet."""
+
+    def chercher_lot(points, rayon_m):
+        resultats = []
+        for lat, lon in points:
+            proches = [
+                dict(b, distance_m=float(haversine_m(lat, lon, b["latitude"], b["longitude"])))
+                for b in bornes
+            ]
+            proches = [b for b in proches if b["distance_m"] <= rayon_m]
+            if not proches:
+                resultats.append({"error": True, "message": "Aucune borne trouvée dans le rayon."})
+            else:
+                resultats.append({"error": False, "count": len(proches), "stations": proches})
+        return resultats
+
+    return chercher_lot
+
+
+def test_recherche_couloir_identique_aux_recherches_par_point():
+    bornes = _bornes_couloir([50.0] * 10)
+    par_point = choisir_bornes(LIGNE, 100, 60, 0.2, _par_point(bornes))
+    couloir = choisir_bornes(LIGNE, 100, 60, 0.2, recherche_couloir(bornes))
+
+    assert par_point
+    assert [a["station"] for a in couloir] == [a["station"] for a in par_point]
+
+
+def test_recherche_couloir_sans_borne():
+    (resultat,) = recherche_couloir([])([[45.0, 5.0]], 2000)
+    assert resultat["error"] is True
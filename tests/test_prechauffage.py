@@ -0,0 +1,92 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import pytest
+
+import prechauffage
+from cache import CachePersistant, connexion
+from prechauffage import Prechauffeur, Source
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Popularité ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.fixture(autouse=True)
+def popularite_vide():
+    prechauffage.vider()
+    prechauffage._table(connexion()).execute("DELETE FROM popularite")
+
+
+def test_noter_puis_plus_demandees():
+    for _ in range(3):
+        prechauffage.noter("tests", "a", [1])
+    prechauffage.noter("tests", "b", [2])
+    prechauffage.vider()
+
+    assert prechauffage.plus_demandees("tests", 10) == [("a", [1], 3), ("b", [2], 1)]
+    assert prechauffage.plus_demandees("tests", 1) == [("a", [1], 3)]
+
+
+def test_capturer_garde_les_demandes_de_l_appel():
+    def vue():
+        prechauffage.noter("tests", "c", [3])
+        return "ok"
+
+    assert prechauffage.capturer(vue) == ("ok", [("tests", "c", [3])])
+
+
+def test_lire_debits():
+    assert prechauffage.lire_debits("ors=1, opendatasoft=2,,x=") == {"ors": 1.0, "opendatasoft": 2.0}
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Rafraîchissement ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_cle_sans_resultat_oubliee():
+    cache = CachePersistant("tests_prechauffage", ttl_s=60)
+    source = Source("tests", cache, lambda cle, x: {"error": True, "message": "Aucune borne"})
+    prechauffage.noter("tests", "vide", [0])
+    prechauffage.noter("tests", "pleine", [1])
+    prechauffage.vider()
+
+    prechauffeur = Prechauffeur()
+    prechauffeur.rafraichir(source, "vide", [0], set())
+
+    assert prechauffeur.echecs == 1
+    assert [cle for cle, _, _ in prechauffage.plus_demandees("tests", 10)] == ["pleine"]
+
+
+def test_exception_marque_l_amont_indisponible():
+    cache = CachePersistant("tests_prechauffage", ttl_s=60)
+    appels = []
+
+    def en_panne(cle, x):
+        appels.append(cle)
+        raise RuntimeError("amont indisponible")
+
+    source = Source("tests", cache, en_panne, amont="tests_amont")
+    prechauffeur = Prechauffeur()
+    indisponibles = set()
+    prechauffeur.rafraichir(source, "a", [0], indisponibles)
+    prechauffeur.rafraichir(source, "b", [0], indisponibles)
+
+    # Après le premier échec, l'amont n'est plus sollicité pendant le cycle
+    assert indisponibles == {"tests_amont"}
+    assert appels == ["a"]
+
+
+def test_a_rafraichir_pendant_un_enregistrement(monkeypatch):
+    # Le préchauffeur démarre pendant l'import de l'application : d'autres sources arrivent ensuite
+    cache = CachePersistant("tests_prechauffage", ttl_s=60)
+    monkeypatch.setattr(prechauffage, "SOURCES", {})
+    prechauffage.enregistrer("tests", cache, lambda cle: None)
+    prechauffage.noter("tests", "a", [])
+    prechauffage.vider()
+
+    appel = prechauffage.plus_demandees
+
+    def plus_demandees(type, nombre):
+        prechauffage.enregistrer("tests_tardive", cache, lambda cle: None)
+        return appel(type, nombre)
+
+    monkeypatch.setattr(prechauffage, "plus_demandees", plus_demandees)
+    assert [cle for _, _, cle, _ in Prechauffeur().a_rafraichir()] == ["a"]
@@ -0,0 +1,123 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import json
+
+import pytest
+import requests
+
+import routage
+from geometrie import haversine_m
+from routage import BackendLocal, BackendORS, _sens, _vitesse_kmh, convertir_osm
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Lecture des tags OSM ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@pytest.mark.parametrize(
+    "maxspeed, attendue",
+    [("90", 90.0), ("90 km/h", 90.0), ("55 mph", 55 * 1.609344), ("", 30), ("none", 30)],
+)
+def test_vitesse_kmh(maxspeed, attendue):
+    assert _vitesse_kmh({"highway": "residential", "maxspeed": maxspeed}) == pytest.approx(attendue)
+
+
+def test_sens():
+    assert _sens({"highway": "residential"}) == (True, True)
+    assert _sens({"highway": "residential", "oneway": "yes"}) == (True, False)
+    assert _sens({"highway": "residential", "oneway": "-1"}) == (False, True)
+    assert _sens({"highway": "motorway"}) == (True, False)
+    assert _sens({"highway": "primary", "junction": "roundabout"}) == (True, False)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Graphe local ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="45.0" lon="5.0"/>
+  <node id="2" lat="45.0" lon="5.01"/>
+  <node id="3" lat="45.0" lon="5.02"/>
+  <node id="4" lat="45.01" lon="5.02"/>
+  <node id="5" lat="46.0" lon="6.0"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="primary"/><tag k="oneway" v="yes"/><tag k="maxspeed" v="50"/>
+  </way>
+  <way id="12">
+    <nd ref="4"/><nd ref="5"/>
+    <tag k="highway" v="footway"/>
+  </way>
+</osm>
+"""
+
+
+@pytest.fixture(scope="module")
+def graphe(tmp_path_factory):
+    dossier = tmp_path_factory.mktemp("graphe")
+    chemin = dossier / "extrait.osm"
+    chemin.write_text(OSM, encoding="utf-8")
+    assert convertir_osm(str(chemin), str(dossier)) == (4, 5)
+    return str(dossier)
+
+
+def test_convertir_osm_ignore_les_voies_non_carrossables(graphe):
+    with open(f"{graphe}/meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    assert meta["noeuds"] == 4
+    assert meta["vitesse_max_kmh"] == 50.0
+
+
+def test_backend_local_itineraire(graphe):
+    route = BackendLocal(graphe).itineraire([(45.0, 5.0), (45.01, 5.02)])
+
+    attendue = haversine_m(45.0, 5.0, 45.0, 5.02) + haversine_m(45.0, 5.02, 45.01, 5.02)
+    assert route["distance_m"] == pytest.approx(attendue, rel=1e-3)
+    assert route["geometry"]["coordinates"][0] == [5.0, 45.0]
+
+
+def test_backend_local_sens_unique(graphe):
+    assert BackendLocal(graphe).itineraire([(45.01, 5.02), (45.0, 5.0)])["error"] is True
+
+
+def test_backend_local_point_hors_graphe(graphe):
+    assert BackendLocal(graphe).itineraire([(45.0, 5.0), (48.0, 2.0)])["error"] is True
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Backend ORS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _reponse(statut, corps):
+    reponse = requests.Response()
+    reponse.status_code = statut
+    reponse._content = json.dumps(corps).encode("utf-8")
+    return reponse
+
+
+def test_ors_refus_detaille(monkeypatch):
+    refus = _reponse(404, {"error": {"message": "Point non routable"}})
+    monkeypatch.setattr(routage.amont, "post", lambda *a, **k: refus)
+    assert BackendORS("cle").itineraire([(45.0, 5.0), (45.1, 5.1)]) == {
+        "error": True,
+        "message": "Point non routable",
+    }
+
+
+def test_ors_erreur_serveur_levee(monkeypatch):
+    monkeypatch.setattr(routage.amont, "post", lambda *a, **k: _reponse(500, {}))
+    with pytest.raises(requests.HTTPError):
+        BackendORS("cle").itineraire([(45.0, 5.0), (45.1, 5.1)])
+
+
+def test_ors_route_decodee(monkeypatch):
+    ors = {"geometry": "_p~iF~ps|U_ulLnnqC", "summary": {"distance": 1.0, "duration": 2.0}}
+    corps = {"routes": [ors]}
+    monkeypatch.setattr(routage.amont, "post", lambda *a, **k: _reponse(200, corps))
+
+    route = BackendORS("cle").itineraire([(38.5, -120.2), (40.7, -120.95)])
+    assert route["distance_m"] == 1.0
+    assert route["geometry"]["coordinates"] == [[-120.2, 38.5], [-120.95, 40.7]]
@@ -0,0 +1,77 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import gzip
+
+import numpy as np
+import pytest
+from flask import Flask, Response
+
+from geometrie import decoder_polyline, vers_geojson
+from transport import MIME_BINAIRE, TAILLE_MIN_COMPRESSION, compresser, format_demande, reponse_route
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Négociation du format –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+app = Flask(__name__)
+
+POINTS = np.column_stack((np.linspace(45.0, 46.0, 500), np.linspace(5.0, 6.0, 500)))
+ROUTE = {"distance_m": 1234.5, "duration_s": 60.0, "geometry": vers_geojson(POINTS)}
+
+
+@pytest.mark.parametrize(
+    "url, accept, attendu",
+    [
+        ("/route", "application/json", "geojson"),
+        ("/route?format=polyline", "application/json", "polyline"),
+        ("/route", MIME_BINAIRE, "f32"),
+        ("/route?format=inconnu", "*/*", "geojson"),
+    ],
+)
+def test_format_demande(url, accept, attendu):
+    with app.test_request_context(url, headers={"Accept": accept}):
+        assert format_demande() == attendu
+
+
+def test_reponse_route_f32():
+    with app.test_request_context("/route?format=f32"):
+        reponse = reponse_route(ROUTE)
+
+    assert reponse.mimetype == MIME_BINAIRE
+    assert reponse.headers["X-Route-Distance-M"] == "1234.5"
+    assert reponse.headers["X-Route-Points"] == "500"
+    np.testing.assert_allclose(
+        np.frombuffer(reponse.get_data(), dtype="<f4").reshape(-1, 2), POINTS, atol=1e-5
+    )
+
+
+def test_reponse_route_simplifiee():
+    with app.test_request_context("/route?format=simplifie&max_points=50&precision=4"):
+        data = reponse_route(ROUTE).get_json()
+
+    geometrie = data["geometry"]
+    assert geometrie["points"] <= 50
+    assert geometrie["precision"] == 4
+    assert len(decoder_polyline(geometrie["encoded"], 4)) == geometrie["points"]
+    assert data["distance_m"] == 1234.5
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Compression –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_compresser_gzip():
+    corps = b'{"a": "' + b"x" * TAILLE_MIN_COMPRESSION + b'"}'
+    with app.test_request_context("/", headers={"Accept-Encoding": "gzip"}):
+        reponse = compresser(Response(corps, mimetype="application/json"))
+
+    assert reponse.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(reponse.get_data()) == corps
+
+
+def test_compresser_ignore_les_petites_reponses_et_le_binaire():
+    with app.test_request_context("/", headers={"Accept-Encoding": "gzip"}):
+        petite = compresser(Response(b"{}", mimetype="application/json"))
+        binaire = compresser(Response(b"\0" * 4096, mimetype=MIME_BINAIRE))
+
+    assert "Content-Encoding" not in petite.headers
+    assert "Content-Encoding" not in binaire.headers
@@ -0,0 +1,72 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import pytest
+
+from tuiles_irve import ZOOM_MAX, AgregatsIRVE, mercator, tuiles_bbox
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Projection et tuiles ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_mercator_origine_et_bornes():
+    x, y = mercator(0.0, 0.0)
+    assert float(x) == pytest.approx(0.5)
+    assert float(y) == pytest.approx(0.5)
+
+    # Pôles et antiméridien restent dans [0, 1)
+    x, y = mercator([90.0, -90.0], [180.0, -180.0])
+    assert ((0 <= x) & (x < 1)).all()
+    assert ((0 <= y) & (y < 1)).all()
+
+
+def test_tuiles_bbox_monde_entier():
+    assert len(tuiles_bbox(-85, -180, 85, 180, 0)) == 1
+    assert len(tuiles_bbox(-85, -180, 85, 180, 2)) == 16
+
+
+def test_tuiles_bbox_au_dela_du_maximum():
+    # Le décompte se fait sans construire la liste (2^40 tuiles au zoom 20)
+    assert tuiles_bbox(-85, -180, 85, 180, 20, maximum=256) is None
+    assert tuiles_bbox(45.1, 5.7, 45.2, 5.8, 10, maximum=256) is not None
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Agrégats ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+STATIONS = [
+    (45.19, 5.72, "Grenoble A", "Public", 22.0),
+    (45.19, 5.72, "Grenoble A", "Public", 50.0),
+    (45.20, 5.73, "Grenoble B", "Public", None),
+    (48.85, 2.35, "Paris", "Public", 150.0),
+]
+
+
+@pytest.fixture(scope="module")
+def agregats():
+    return AgregatsIRVE(STATIONS, version="v1")
+
+
+def test_agregats_zoom_0_compte_les_bornes_dedoublonnees(agregats):
+    (groupe,) = agregats.tuile(0, 0, 0)
+    assert groupe["count"] == 3
+    assert groupe["puiss_max"] == 150.0
+
+
+def test_agregats_zoom_max_une_borne_par_groupe(agregats):
+    (x, y), = tuiles_bbox(45.19, 5.72, 45.19, 5.72, ZOOM_MAX)
+    (groupe,) = agregats.tuile(ZOOM_MAX, x, y)
+    assert groupe["count"] == 1
+    assert groupe["station"] == "Grenoble A"
+    assert groupe["puiss_max"] == 50.0
+
+
+def test_agregats_tuile_vide(agregats):
+    assert agregats.tuile(1, 0, 1) == []
+    assert agregats.tuile(ZOOM_MAX + 1, 0, 0) == []
+
+
+def test_etag_depend_de_la_version_et_des_tuiles(agregats):
+    autre = AgregatsIRVE(STATIONS, version="v2")
+    assert agregats.etag(3, [(4, 2)]) == agregats.etag(3, [(4, 2)])
+    assert agregats.etag(3, [(4, 2)]) != agregats.etag(3, [(4, 3)])
+    assert agregats.etag(3, [(4, 2)]) != autre.etag(3, [(4, 2)])
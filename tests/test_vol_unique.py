@@ -0,0 +1,50 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from vol_unique import VolUnique
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Appels regroupés ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def test_appels_concurrents_executes_une_fois():
+    vol = VolUnique("tests_concurrents")
+    depart = threading.Event()
+    appels = []
+
+    def lente(x):
+        appels.append(x)
+        depart.wait(5)
+        return x * 2
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futurs = [executor.submit(vol.executer, "cle", lente, 21) for _ in range(8)]
+        # Tous les appels attendent le premier avant qu'il ne se termine
+        while vol.stats()["appels"] < 8:
+            threading.Event().wait(0.01)
+        depart.set()
+        resultats = [f.result() for f in futurs]
+
+    assert resultats == [42] * 8
+    assert appels == [21]
+    assert vol.stats() == {"appels": 8, "partages": 7, "en_cours": 0}
+
+
+def test_exception_partagee_puis_nouvel_essai():
+    vol = VolUnique("tests_exception")
+
+    def en_panne():
+        raise RuntimeError("amont indisponible")
+
+    with pytest.raises(RuntimeError):
+        vol.executer("cle", en_panne)
+    # Le vol terminé est oublié : l'appel suivant s'exécute de nouveau
+    assert vol.executer("cle", lambda: "ok") == "ok"
+
+
+def test_entre_workers():
+    vol = VolUnique("tests_workers", entre_workers=True)
+    assert vol.executer("a|1", lambda x: x + 1, 1) == 2
@@ -0,0 +1,127 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import gzip
+import json
+
+from flask import Response, request
+
+from geometrie import depuis_geojson, encoder_polyline, simplifier_budget
+
+# Brotli est facultatif : s'il n'est pas installé, on se contente de gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Formats de géométrie ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# geojson    : LineString GeoJSON (format historique, par défaut)
+# polyline   : polyligne encodée (5 décimales, comme ORS)
+# simplifie  : polyligne encodée, simplifiée à max_points sommets et/ou precision décimales
+# f32        : tampon binaire Float32 little-endian [lat, lon, lat, lon, ...]
+FORMATS = ("geojson", "polyline", "simplifie", "f32")
+
+MIME_BINAIRE = "application/octet-stream"
+
+# Budget de sommets par défaut du format simplifié
+MAX_POINTS_DEFAUT = 1000
+
+# En dessous de cette taille, compresser coûte plus que ça ne rapporte
+TAILLE_MIN_COMPRESSION = 1024
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Négociation –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def format_demande():
+    """Format de géométrie demandé : ?format=..., sinon l'en-tête Accept, sinon geojson."""
+    fmt = (request.args.get("format") or "").lower()
+    if fmt in FORMATS:
+        return fmt
+
+    meilleur = request.accept_mimetypes.best_match(["application/json", MIME_BINAIRE])
+    if meilleur == MIME_BINAIRE:
+        return "f32"
+    return "geojson"
+
+
+def geometrie_json(geometry, fmt):
+    """Géométrie (LineString GeoJSON) convertie dans un format JSON (geojson, polyline, simplifie)."""
+    if fmt == "geojson":
+        return geometry
+
+    latlngs = depuis_geojson(geometry)
+    precision = 5
+
+    if fmt == "simplifie":
+        max_points = request.args.get("max_points", MAX_POINTS_DEFAUT, type=int)
+        precision = min(max(request.args.get("precision", 5, type=int), 1), 5)
+        latlngs = simplifier_budget(latlngs, max(max_points, 2))
+
+    return {
+        "type": "polyline",
+        "precision": precision,
+        "points": len(latlngs),
+        "encoded": encoder_polyline(latlngs, precision),
+    }
+
+
+def reponse_route(route):
+    """
+    Réponse HTTP d'un itinéraire dans le format négocié.
+    En f32, les autres champs (distance, durée...) passent dans des en-têtes X-Route-*.
+    """
+    fmt = format_demande()
+
+    if fmt != "f32":
+        data = dict(route, geometry=geometrie_json(route["geometry"], fmt))
+        corps = json.dumps(data, separators=(",", ":"))
+        return Response(corps, mimetype="application/json")
+
+    latlngs = depuis_geojson(route["geometry"])
+    reponse = Response(latlngs.astype("<f4").tobytes(), mimetype=MIME_BINAIRE)
+    for cle, valeur in route.items():
+        if cle != "geometry":
+            nom = "-".join(mot.capitalize() for mot in cle.split("_"))
+            reponse.headers[f"X-Route-{nom}"] = str(valeur)
+    reponse.headers["X-Route-Points"] = str(len(latlngs))
+    return reponse
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Compression –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def compresser(reponse):
+    """
+    after_request : compresse les réponses JSON / texte (brotli si disponible et accepté, sinon gzip).
+    Les réponses en streaming, déjà encodées ou trop petites sont laissées telles quelles.
+    """
+    if (
+        reponse.direct_passthrough
+        or reponse.is_streamed
+        or "Content-Encoding" in reponse.headers
+        or reponse.status_code < 200
+        or reponse.status_code in (204, 304)
+        or not (reponse.mimetype == "application/json" or reponse.mimetype.startswith("text/"))
+    ):
+        return reponse
+
+    reponse.vary.add("Accept-Encoding")
+    corps = reponse.get_data()
+    if len(corps) < TAILLE_MIN_COMPRESSION:
+        return reponse
+
+    encodages = request.accept_encodings
+    if brotli is not None and encodages["br"]:
+        reponse.set_data(brotli.compress(corps, quality=5))
+        reponse.headers["Content-Encoding"] = "br"
+    elif encodages["gzip"]:
+        reponse.set_data(gzip.compress(corps, compresslevel=5))
+        reponse.headers["Content-Encoding"] = "gzip"
+
+    return reponse
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
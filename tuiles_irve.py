@@ -0,0 +1,226 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import hashlib
+import math
+import os
+import threading
+
+import numpy as np
+
+from irve_index import get_index
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres des tuiles –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Tuiles « slippy map » (Web Mercator, comme Leaflet / OSM). Au-delà de TUILES_ZOOM_MAX on sert
+# les tuiles de TUILES_ZOOM_MAX (cellules d'une cinquantaine de mètres : bornes quasi individuelles).
+ZOOM_MAX = int(os.getenv("TUILES_ZOOM_MAX", "16"))
+
+# Chaque tuile est découpée en 2^DECALAGE x 2^DECALAGE cellules (8 x 8 : ~32 px pour des tuiles de 256 px)
+DECALAGE = 3
+
+# Nombre maximal de tuiles par requête (fenêtre trop grande pour le zoom demandé sinon)
+TUILES_MAX_PAR_REQUETE = int(os.getenv("TUILES_MAX_PAR_REQUETE", "256"))
+
+LATITUDE_MAX_MERCATOR = 85.05112878
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Projection ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def mercator(lat, lon):
+    """Coordonnées Web Mercator normalisées dans [0, 1) (x vers l'est, y vers le sud)."""
+    lat = np.clip(np.asarray(lat, dtype=float), -LATITUDE_MAX_MERCATOR, LATITUDE_MAX_MERCATOR)
+    phi = np.radians(lat)
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(phi) + 1.0 / np.cos(phi)) / math.pi) / 2.0
+    return np.clip(x, 0.0, np.nextafter(1.0, 0)), np.clip(y, 0.0, np.nextafter(1.0, 0))
+
+
+def plages_bbox(lat_min, lon_min, lat_max, lon_max, zoom):
+    """Plages (range) des x et des y des tuiles du zoom donné qui recouvrent le rectangle."""
+    n = 2**zoom
+    x0, y1 = mercator(lat_min, lon_min)
+    x1, y0 = mercator(lat_max, lon_max)
+    return range(int(x0 * n), int(x1 * n) + 1), range(int(y0 * n), int(y1 * n) + 1)
+
+
+def tuiles_bbox(lat_min, lon_min, lat_max, lon_max, zoom, maximum=None):
+    """
+    Tuiles (x, y) du zoom donné qui recouvrent le rectangle, ou None s'il y en a plus que
+    maximum (le nombre est calculé avant de construire la liste).
+    """
+    xs, ys = plages_bbox(lat_min, lon_min, lat_max, lon_max, zoom)
+    if maximum is not None and len(xs) * len(ys) > maximum:
+        return None
+    return [(x, y) for x in xs for y in ys]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Agrégats hiérarchiques ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class AgregatsIRVE:
+    """
+    Agrégats des bornes par cellule de grille, pour chaque zoom de 0 à ZOOM_MAX.
+
+    Les cellules du zoom z sont les cellules de niveau z + DECALAGE du quadrillage Web Mercator :
+    les 4 cellules filles d'une cellule sont au zoom z + 1. Le niveau le plus fin est calculé
+    depuis les bornes (dédoublonnées par coordonnées), chaque niveau supérieur depuis le précédent
+    (effectif et sommes additionnés, puissance maximale).
+
+    Par zoom, les cellules sont triées par tuile avec un tableau de débuts : une tuile se lit
+    par une recherche dichotomique puis une tranche contiguë, quel que soit le nombre de bornes.
+    """
+
+    def __init__(self, stations, version="0"):
+        self.version = version
+        self.niveaux = {}
+
+        # Bornes dédoublonnées par coordonnées (plusieurs points de charge par station)
+        uniques = {}
+        for lat, lon, nom, acces, puiss_max in stations:
+            existante = uniques.get((lat, lon))
+            if existante is None or (puiss_max or 0) > (existante[4] or 0):
+                uniques[(lat, lon)] = (lat, lon, nom, acces, puiss_max)
+        self.stations = list(uniques.values())
+
+        if not self.stations:
+            return
+
+        lat = np.array([s[0] for s in self.stations], dtype=float)
+        lon = np.array([s[1] for s in self.stations], dtype=float)
+        puiss = np.array(
+            [s[4] if s[4] is not None else np.nan for s in self.stations], dtype=float
+        )
+
+        x, y = mercator(lat, lon)
+        n = 2 ** (ZOOM_MAX + DECALAGE)
+        cx = (x * n).astype(np.int64)
+        cy = (y * n).astype(np.int64)
+
+        # Niveau le plus fin : une entrée par borne, regroupée ensuite par cellule
+        niveau = {
+            "cx": cx,
+            "cy": cy,
+            "nombre": np.ones(len(lat), dtype=np.int64),
+            "somme_lat": lat,
+            "somme_lon": lon,
+            "puiss_max": puiss,
+            "borne": np.arange(len(lat), dtype=np.int64),
+        }
+        for zoom in range(ZOOM_MAX, -1, -1):
+            niveau = self._regrouper(niveau)
+            self.niveaux[zoom] = self._ranger_par_tuile(niveau)
+            niveau = dict(niveau, cx=niveau["cx"] >> 1, cy=niveau["cy"] >> 1)
+
+    @staticmethod
+    def _regrouper(niveau):
+        """Fusionne les entrées de même cellule (cx, cy)."""
+        cle = (niveau["cx"] << 32) | niveau["cy"]
+        ordre = np.argsort(cle, kind="stable")
+        cle = cle[ordre]
+        debuts = np.flatnonzero(np.r_[True, cle[1:] != cle[:-1]])
+
+        def somme(t):
+            return np.add.reduceat(t[ordre], debuts)
+
+        nombre = somme(niveau["nombre"])
+        return {
+            "cx": cle[debuts] >> 32,
+            "cy": cle[debuts] & 0xFFFFFFFF,
+            "nombre": nombre,
+            "somme_lat": somme(niveau["somme_lat"]),
+            "somme_lon": somme(niveau["somme_lon"]),
+            "puiss_max": np.fmax.reduceat(niveau["puiss_max"][ordre], debuts),
+            # Borne seule de la cellule (pour l'afficher telle quelle), -1 sinon
+            "borne": np.where(nombre == 1, niveau["borne"][ordre][debuts], -1),
+        }
+
+    @staticmethod
+    def _ranger_par_tuile(niveau):
+        """Cellules triées par tuile, en tableaux compacts, avec l'index des tuiles."""
+        tuile = ((niveau["cx"] >> DECALAGE) << 32) | (niveau["cy"] >> DECALAGE)
+        ordre = np.argsort(tuile, kind="stable")
+        tuile = tuile[ordre]
+        tuiles, debuts = np.unique(tuile, return_index=True)
+        nombre = niveau["nombre"][ordre]
+        return {
+            "tuiles": tuiles,
+            "debuts": np.r_[debuts, len(tuile)],
+            "nombre": nombre.astype(np.int32),
+            "lat": (niveau["somme_lat"][ordre] / nombre).astype(np.float32),
+            "lon": (niveau["somme_lon"][ordre] / nombre).astype(np.float32),
+            "puiss_max": niveau["puiss_max"][ordre].astype(np.float32),
+            "borne": niveau["borne"][ordre].astype(np.int32),
+        }
+
+    def tuile(self, zoom, x, y):
+        """Groupes de bornes de la tuile (zoom, x, y) : position moyenne, nombre, puissance maximale."""
+        niveau = self.niveaux.get(zoom)
+        if niveau is None:
+            return []
+
+        cle = (x << 32) | y
+        k = int(np.searchsorted(niveau["tuiles"], cle))
+        if k >= len(niveau["tuiles"]) or niveau["tuiles"][k] != cle:
+            return []
+
+        groupes = []
+        for i in range(niveau["debuts"][k], niveau["debuts"][k + 1]):
+            puiss_max = float(niveau["puiss_max"][i])
+            groupe = {
+                "latitude": round(float(niveau["lat"][i]), 5),
+                "longitude": round(float(niveau["lon"][i]), 5),
+                "count": int(niveau["nombre"][i]),
+                "puiss_max": None if math.isnan(puiss_max) else puiss_max,
+            }
+            borne = int(niveau["borne"][i])
+            if borne >= 0:
+                lat, lon, nom, acces, _ = self.stations[borne]
+                groupe.update(
+                    latitude=lat, longitude=lon, station=nom, acces_recharge=acces
+                )
+            groupes.append(groupe)
+        return groupes
+
+    def etag(self, zoom, tuiles):
+        """ETag d'une réponse : version des données, zoom et ensemble des tuiles couvertes."""
+        empreinte = hashlib.sha1(
+            f"{self.version}|{zoom}|{sorted(tuiles)}".encode("utf-8")
+        ).hexdigest()
+        return empreinte[:24]
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Agrégats de l'index courant –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+_agregats = None
+_index_source = None
+_verrou = threading.Lock()
+
+
+def get_agregats():
+    """
+    Agrégats de l'index IRVE courant (None sans index local), reconstruits quand l'index
+    est rechargé. Calculés une fois par processus (ou dans le maître avec GUNICORN_PRELOAD).
+    """
+    global _agregats, _index_source
+
+    index = get_index()
+    if index is None:
+        return None
+
+    if index is _index_source:
+        return _agregats
+
+    with _verrou:
+        if index is not _index_source:
+            stations = (s for cellule in index.grille.values() for s in cellule)
+            _agregats = AgregatsIRVE(stations, version=index.version)
+            _index_source = index
+        return _agregats
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -0,0 +1,129 @@
+# ––– IMPORTS –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+from cache import CACHE_DIR
+
+# flock n'existe que sous Unix : ailleurs (poste de dev Windows) on regroupe seulement dans le processus
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Paramètres ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# Nombre de fichiers verrous par type d'appel (les clés sont réparties par hachage)
+NB_VERROUS = 1024
+
+DOSSIER_VERROUS = os.path.join(CACHE_DIR, "vols")
+
+# Registre des regroupements, pour /cache/stats
+VOLS = {}
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Verrou entre workers ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+@contextmanager
+def verrou_workers(nom, cle):
+    """
+    Verrou exclusif partagé par tous les workers pour (nom, cle) : flock sur un fichier de
+    DOSSIER_VERROUS. Deux clés peuvent tomber sur le même fichier : elles sont alors simplement
+    sérialisées, sans autre conséquence.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    os.makedirs(DOSSIER_VERROUS, exist_ok=True)
+    numero = zlib.crc32(cle.encode("utf-8")) % NB_VERROUS
+    fd = os.open(os.path.join(DOSSIER_VERROUS, f"{nom}-{numero}.lock"), os.O_RDWR | os.O_CREAT)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+
+# ––– Regroupement des appels identiques ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class _Vol:
+    """Un appel en cours : les suivants attendent fini puis lisent resultat (ou erreur)."""
+
+    def __init__(self):
+        self.fini = threading.Event()
+        self.resultat = None
+        self.erreur = None
+
+
+class VolUnique:
+    """
+    Appels concurrents identiques regroupés en un seul (single-flight).
+
+    Dans un worker, le premier appel pour une clé s'exécute et les suivants attendent son
+    résultat (ou son exception) au lieu d'appeler l'API amont à leur tour.
+    Avec entre_workers=True, le premier appel prend aussi un verrou partagé entre workers :
+    la fonction doit alors relire le cache partagé avant d'appeler l'API, pour profiter du
+    résultat qu'un autre worker vient d'y écrire.
+    """
+
+    def __init__(self, nom, entre_workers=False):
+        self.nom = nom
+        self.entre_workers = entre_workers and fcntl is not None
+
+        self._vols = {}
+        self._verrou = threading.Lock()
+
+        self.appels = 0
+        self.partages = 0
+
+        VOLS[nom] = self
+
+    def executer(self, cle, fonction, *args):
+        """Résultat de fonction(*args), partagé avec les appels concurrents de même clé."""
+        with self._verrou:
+            self.appels += 1
+            vol = self._vols.get(cle)
+            chef = vol is None
+            if chef:
+                vol = self._vols[cle] = _Vol()
+            else:
+                self.partages += 1
+
+        if not chef:
+            vol.fini.wait()
+            if vol.erreur is not None:
+                raise vol.erreur
+            return vol.resultat
+
+        try:
+            if self.entre_workers:
+                with verrou_workers(self.nom, cle):
+                    vol.resultat = fonction(*args)
+            else:
+                vol.resultat = fonction(*args)
+            return vol.resultat
+        except BaseException as e:
+            vol.erreur = e
+            raise
+        finally:
+            with self._verrou:
+                del self._vols[cle]
+            vol.fini.set()
+
+    def stats(self):
+        return {
+            "appels": self.appels,
+            "partages": self.partages,
+            "en_cours": len(self._vols),
+        }
+
+
+# –––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––